@@ -3,6 +3,8 @@ import pandas as pd
 import os
 
 from src.agent.engine import CustomerAgent
+from src.data.load import featured_view, load_featured_table
+from src.models.tree_export import ArrayChurnScorer, churn_export_dir
 
 # --------------------------------------------------
 # Page config
@@ -29,19 +31,43 @@ if "generated_packet" not in st.session_state:
 # --------------------------------------------------
 # Load dataset
 # --------------------------------------------------
-@st.cache_data(show_spinner=True)
-def load_featured():
-    file_path = "master_featured.csv"
+# Featured CSV written by the pipeline; the churn array export sits next to it.
+FEATURED_PATH = os.environ.get("FEATURED_PATH", "master_featured.csv")
 
-    if not os.path.exists(file_path):
-        st.error(f"Dataset not found: {file_path}")
-        st.stop()
 
-    df = pd.read_csv(file_path)
+# cache_resource (not cache_data): every session shares one read-only,
+# memory-mapped frame instead of unpickling its own copy on each rerun.
+# mtime is part of the cache key, so a rebuilt CSV is picked up.
+@st.cache_resource(show_spinner=True, max_entries=1)
+def load_featured(file_path, mtime):
+    df = featured_view(load_featured_table(file_path))
     return df, file_path
 
 
-df, used_path = load_featured()
+if not os.path.exists(FEATURED_PATH):
+    st.error(f"Dataset not found: {FEATURED_PATH}")
+    st.stop()
+
+df, used_path = load_featured(FEATURED_PATH, os.path.getmtime(FEATURED_PATH))
+
+
+# What-if inputs: model feature → (label, min value)
+WHAT_IF_INPUTS = {
+    "total_missed_payments": ("Missed payments", 0),
+    "complaint_count": ("Complaints", 0),
+    "days_until_lease_end": ("Days until lease end", None),
+}
+
+
+# Exported tree arrays (memory-mapped, no scikit-learn) for on-the-spot rescoring
+@st.cache_resource(show_spinner=False)
+def load_churn_scorer(export_dir):
+    if not os.path.exists(os.path.join(export_dir, "meta.json")):
+        return None
+    return ArrayChurnScorer.load(export_dir)
+
+
+churn_scorer = load_churn_scorer(churn_export_dir(used_path))
 
 st.info(f"📄 Loaded dataset from: `{os.path.abspath(used_path)}` | Rows: {len(df):,}")
 
@@ -136,17 +162,66 @@ if st.session_state.selected_customer_id:
         st.write(f"• Complaints: {selected_row.get('complaint_count', 0)}")
         st.write(f"• Avg service satisfaction: {selected_row.get('avg_service_satisfaction', 'N/A')}")
 
+        if churn_scorer is not None:
+            st.markdown("---")
+            st.subheader("🔁 What-if churn score")
+
+            # Only inputs the exported model reads; values as the scorer sees them today
+            as_of = pd.Timestamp.today().normalize()
+            current = churn_scorer.record_inputs(selected_row, as_of)
+            record = selected_row.to_dict()
+
+            for feature, (label, min_value) in WHAT_IF_INPUTS.items():
+                if feature not in current:
+                    continue
+                value = current[feature]
+                default = 0 if value is None or pd.isna(value) else int(value)
+                new_value = st.number_input(label, min_value=min_value, value=default)
+                if new_value == default:
+                    continue  # untouched inputs keep their (possibly missing) value
+                if feature == "days_until_lease_end" and "lease_end" in record:
+                    # the scorer recomputes it from the lease end date
+                    record["lease_end"] = as_of + pd.Timedelta(days=new_value)
+                else:
+                    record[feature] = new_value
+
+            score = churn_scorer.score_record(record, as_of)
+            st.metric("Recomputed churn probability", f"{score:.2f}", f"{score - selected_row['churn_prob']:+.2f}")
+
     # ---------------- RIGHT: email ----------------
     with right:
         st.subheader("✉️ AI Email Draft")
 
+        stream_draft = st.checkbox("Stream draft while it is written", value=True)
+
         if st.button("🧠 Generate / Regenerate Email"):
-            packet = agent.build_action_packet(selected_row)
+            # First click may reuse a cached draft; clicking again regenerates.
+            regenerate = st.session_state.generated_packet is not None
+
+            if stream_draft:
+                placeholder = st.empty()
+                streamed = []
+
+                def show_piece(piece):
+                    streamed.append(piece)
+                    placeholder.markdown("".join(streamed) + " ▌")
+
+                packet = agent.build_action_packet(selected_row, regenerate=regenerate, on_token=show_piece)
+                placeholder.empty()
+            else:
+                with st.spinner("Writing draft..."):
+                    packet = agent.build_action_packet(selected_row, regenerate=regenerate)
+
             st.session_state.generated_packet = packet
 
         if st.session_state.generated_packet:
             packet = st.session_state.generated_packet
 
+            st.caption(
+                f"⏱ First token {packet.get('draft_ttft_s', 0):.2f}s · "
+                f"full draft {packet.get('draft_latency_s', 0):.2f}s"
+            )
+
             email_text = st.text_area(
                 "Email body (editable):",
                 value=packet["email_to_sales"],
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pandas as pd
+from src.data.load import load_and_clean_datasets
+from src.features.backfill import iter_point_in_time_snapshots
+
+BASE_PATH = "src/data/full_realistic_dataset"
+CACHE_DIR = os.path.join(BASE_PATH, ".dataset_cache")
+OUT_DIR = os.path.join(BASE_PATH, "snapshots")
+
+
+def main():
+    # Usage: python -m scripts.backfill_snapshots [START] [END]
+    end = pd.Timestamp(sys.argv[2]) if len(sys.argv) > 2 else pd.Timestamp.today().normalize()
+    start = pd.Timestamp(sys.argv[1]) if len(sys.argv) > 1 else end - pd.Timedelta(days=364)
+    dates = pd.date_range(start, end, freq="D")
+
+    print(f"🔹 Backfilling {len(dates)} as-of dates ({start.date()} → {end.date()})...")
+    tables = load_and_clean_datasets(BASE_PATH, cache_dir=CACHE_DIR)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    rows = 0
+    for i, frame in enumerate(iter_point_in_time_snapshots(tables, dates)):
+        frame.to_parquet(os.path.join(OUT_DIR, f"part-{i:04d}.parquet"), index=False)
+        rows += len(frame)
+
+    print(f"✅ Wrote {rows:,} snapshot rows to {OUT_DIR}")
+
+if __name__ == "__main__":
+    main()
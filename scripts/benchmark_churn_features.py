@@ -0,0 +1,42 @@
+"""
+Benchmark: vectorized add_churn_and_lease_features at growing row counts.
+Time per row should stay flat (linear scaling).
+
+Usage:
+    python -m scripts.benchmark_churn_features [rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.features.churn_features import add_churn_and_lease_features
+
+AS_OF = pd.Timestamp("2025-01-01")
+
+
+def make_frame(n, seed=7):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D")
+    return pd.DataFrame({
+        "lease_start": start,
+        "lease_end": start + pd.to_timedelta(rng.integers(365, 1460, n), unit="D"),
+        "churn_prob": rng.random(n),
+    })
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [100_000, 500_000, 1_000_000, 2_000_000, 4_000_000]
+
+    print(f"{'rows':>12} {'seconds':>10} {'ns/row':>10}")
+    for n in sizes:
+        df = make_frame(n)
+        start = time.perf_counter()
+        add_churn_and_lease_features(df, as_of=AS_OF)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>12,} {elapsed:>10.3f} {elapsed / n * 1e9:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: sequential vs concurrent high-risk draft generation.
+
+Runs CustomerAgent.create_sales_draft_packets against the local fake
+OpenAI server (no API key needed) at several max_workers settings, with
+a requests/tokens-per-minute limiter and a small share of 429 errors to
+exercise the retries.
+
+Usage:
+    python -m scripts.benchmark_draft_concurrency [customers] [latency_s]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.agent.concurrency import RateLimiter
+from src.agent.engine import CustomerAgent
+from src.agent.llm_email_writer import LLMEmailWriter
+from src.llm.gateway import configure
+from src.utils.fake_openai_server import FakeOpenAIServer
+
+WORKERS = (1, 4, 16, 32)
+REQUESTS_PER_MINUTE = 3_000
+TOKENS_PER_MINUTE = 2_000_000
+ERROR_RATE = 0.03
+
+
+def make_high_risk(n, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer_id": [f"HR-{i:05d}" for i in range(n)],
+        "name": rng.choice(["Ahmed Saleh", "Priya Singh", "John Smith"], n),
+        "car_model": rng.choice(["Audi Q5", "BMW X3", "Toyota Camry"], n),
+        "nationality": rng.choice(["UAE", "India", "UK"], n),
+        "segment": rng.choice(["Premium", "Retail"], n),
+        "churn_prob": rng.uniform(0.7, 1.0, n),
+        "churn_risk_bucket": "High",
+        "days_until_lease_end": rng.integers(1, 90, n),
+        "total_missed_payments": rng.integers(0, 3, n),
+        "complaint_count": rng.integers(0, 2, n),
+        "avg_service_satisfaction": rng.uniform(1, 5, n),
+    })
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    df = make_high_risk(n)
+
+    with FakeOpenAIServer(latency=latency, error_rate=ERROR_RATE) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # CustomerMemoryDB writes customer_memory.db to the cwd
+        gateway = configure(base_url=server.base_url, api_key="fake")
+
+        print(f"🧪 {n} drafts, fake latency {latency}s, {ERROR_RATE:.0%} 429s")
+        print(f"{'workers':>8} {'seconds':>9} {'drafts/s':>9} {'failed':>7} {'ordered':>8}")
+        for workers in WORKERS:
+            writer = LLMEmailWriter(
+                limiter=RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE),
+                max_retries=5,
+                cache=False,  # measure API throughput, not cache hits
+            )
+            agent = CustomerAgent(df, llm=writer)
+
+            start = time.perf_counter()
+            packets = agent.create_sales_draft_packets(max_workers=workers)
+            elapsed = time.perf_counter() - start
+
+            failed = sum(p["status"] != "DRAFT_CREATED" for p in packets)
+            ordered = [p["customer_id"] for p in packets] == list(df["customer_id"])
+            print(f"{workers:>8} {elapsed:>9.2f} {n / elapsed:>9.1f} {failed:>7} {str(ordered):>8}")
+
+        print(f"Server stats: {server.stats}")
+        gateway.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,98 @@
+import os
+import sys
+
 import pandas as pd
-from src.data.load import load_datasets
+from src.data.chunked import STREAMABLE_TABLES, read_table_chunks
+from src.data.load import TABLE_SCHEMAS, featured_arrow_path, load_datasets, write_featured_arrow
+from src.data.optimize import compact_dtypes, print_memory_report
+from src.features.backfill import SNAPSHOT_INPUTS
 from src.features.build_master_dataset import build_master_dataset
-from src.features.churn_features import add_churn_and_lease_features
+from src.features.churn_features import add_churn_and_lease_features, resolve_as_of
+from src.features.event_index import EVENT_DATE_COLUMNS
+from src.features.window_features import WINDOW_TABLES, add_window_features, window_event_rows
+from src.models.churn_model import load_or_train_churn_model
+from src.models.tree_export import EXPORT_DIRNAME, churn_export_dir
+
+BASE_PATH = "src/data/full_realistic_dataset"
+CACHE_DIR = os.path.join(BASE_PATH, ".dataset_cache")
+
+
+def read_streamed_inputs(base_path, as_of):
+    """
+    One chunked pass over each streamed table, keeping only what the churn
+    model and the window features read from it:
+        • model: the snapshot columns (key, date, SNAPSHOT_INPUTS)
+        • windows: the rows of the widest window (window_event_rows)
+    Returns (model_tables, window_tables).
+    """
+    model_tables, window_tables = {}, {}
+    for name in STREAMABLE_TABLES:
+        narrow, recent = [], []
+        columns = ["customer_id", EVENT_DATE_COLUMNS[name], *SNAPSHOT_INPUTS.get(name, [])]
+        for chunk in read_table_chunks(base_path, name):
+            if name in SNAPSHOT_INPUTS:
+                narrow.append(chunk[[c for c in columns if c in chunk.columns]])
+            if name in WINDOW_TABLES:
+                rows = window_event_rows(name, chunk, as_of)
+                if rows is not None:
+                    recent.append(rows)
+        if narrow:
+            model_tables[name] = pd.concat(narrow, ignore_index=True)
+        if recent:
+            window_tables[name] = window_event_rows(name, pd.concat(recent, ignore_index=True), as_of)
+    return model_tables, window_tables
+
 
 def main():
     print("🔹 Loading all CSVs from full_realistic_dataset...")
 
-    raw = load_datasets("src/data/full_realistic_dataset")
+    # Pass --rebuild-cache to ignore cached Parquet copies.
+    # Pass --stream to aggregate payments / service / calls from disk in chunks.
+    # Pass --retrain-model to retrain the saved churn model.
+    stream = "--stream" in sys.argv
+    tables = [t for t in TABLE_SCHEMAS if not (stream and t in STREAMABLE_TABLES)]
+
+    raw = load_datasets(
+        BASE_PATH,
+        cache_dir=CACHE_DIR,
+        force_rebuild="--rebuild-cache" in sys.argv,
+        tables=tables,
+    )
     print("Loaded datasets.")
 
     print("🔹 Building master dataset...")
-    master = build_master_dataset(raw)
+    master = build_master_dataset(raw, stream_dir=BASE_PATH if stream else None)
     print("Master shape:", master.shape)
 
-    print("🔹 Adding churn & lease features...")
-    featured = add_churn_and_lease_features(master)
+    out_path = os.path.join(BASE_PATH, "master_featured.csv")
+
+    # The model and the window features still need the streamed tables:
+    # read only the columns / rows they use instead of whole tables.
+    as_of = resolve_as_of()
+    model_tables = window_tables = raw
+    if stream:
+        print("🔹 Reading model and window inputs from the streamed tables...")
+        streamed_model, streamed_windows = read_streamed_inputs(BASE_PATH, as_of)
+        model_tables = {**raw, **streamed_model}
+        window_tables = {**raw, **streamed_windows}
+
+    print("🔹 Scoring churn & adding lease features...")
+    model = load_or_train_churn_model(
+        os.path.join(BASE_PATH, "churn_model.joblib"), model_tables, as_of,
+        retrain="--retrain-model" in sys.argv, export_dir=churn_export_dir(out_path),
+    )
+    featured = add_churn_and_lease_features(master, as_of, model=model)
+    print("🔹 Adding rolling window features...")
+    featured = add_window_features(featured, window_tables, as_of)
     print("Featured dataset shape:", featured.shape)
 
-    # Save
-    featured.to_csv("src/data/full_realistic_dataset/master_featured.csv", index=False)
-    print("✅ Saved to master_featured.csv")
+    # Save (+ memory-mappable Arrow copy shared by the dashboard)
+    featured.to_csv(out_path, index=False)
+
+    compact, report = compact_dtypes(featured, return_report=True)
+    print_memory_report(report)
+    write_featured_arrow(compact, featured_arrow_path(out_path))
+    print(f"✅ Saved to master_featured.csv (+ master_featured.arrow, {EXPORT_DIRNAME}/)")
 
 if __name__ == "__main__":
     main()
@@ -1,29 +1,35 @@
-import pandas as pd
-from src.features.persona_discovery import LLMPersonaDiscovery
+import json
+import os
+import sys
 
+from src.features.persona_discovery import LLMPersonaDiscovery
 
-def main():
-    print("🔹 Loading master_featured.csv ...")
-    df = pd.read_csv("src/data/full_realistic_dataset/master_featured.csv")
+DATA_PATH = "src/data/full_realistic_dataset/master_featured.csv"
+# Centroid records; discovered_personas.json keeps the summary-mode persona list
+CLUSTERS_JSON = "src/features/discovered_persona_clusters.json"
 
-    print("Dataset shape:", df.shape)
 
-    # To reduce cost, sample subset
-    sample_df = df.sample(n=min(400, len(df)))
+def main():
+    # Every customer is clustered (streamed in chunks); no pre-sampling
+    path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    n_clusters = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    out_dir = os.path.dirname(os.path.abspath(path))
 
-    print("🔹 Running LLM Persona Discovery...")
+    print(f"🔹 Clustering all customers in {path} ...")
     discovery = LLMPersonaDiscovery()
+    assignments, centroids = discovery.discover_persona_clusters(path, n_clusters=n_clusters)
 
-    personas_json = discovery.discover_personas(sample_df)
-
-    print("\n✅ Personas Discovered:")
-    print(personas_json)
+    print(f"\n✅ {len(centroids)} personas over {len(assignments):,} customers:")
+    print(centroids[["cluster", "size", "share", "persona_name"]].to_string(index=False))
 
     # Save
-    with open("src/features/discovered_personas.json", "w", encoding="utf-8") as f:
-        f.write(personas_json)
+    assignments.to_csv(os.path.join(out_dir, "persona_assignments.csv"), index=False)
+    centroids.to_csv(os.path.join(out_dir, "persona_centroids.csv"), index=False)
+    with open(CLUSTERS_JSON, "w", encoding="utf-8") as f:
+        json.dump(json.loads(centroids.to_json(orient="records")), f, indent=2, ensure_ascii=False)
 
-    print("\n📁 Saved to src/features/discovered_personas.json")
+    print(f"\n📁 Saved persona_assignments.csv / persona_centroids.csv to {out_dir}")
+    print(f"📁 Saved to {CLUSTERS_JSON}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Batch tone extraction from call-center transcripts into CustomerMemoryDB.
+
+    python -m scripts.extract_tone_batch <base_path> [--force]
+
+--fake [customers] runs against synthetic call-center data and the local
+fake OpenAI server (no API key) twice, to show that the second run skips
+every unchanged transcript.
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+from src.agent.concurrency import RateLimiter
+from src.data.load import load_and_clean_datasets
+from src.features.tone_extractor import BatchToneExtractor, build_transcripts
+from src.llm.gateway import configure, get_gateway
+from src.memory.customer_memory_db import CustomerMemoryDB
+from src.utils.fake_openai_server import FakeOpenAIServer, fake_completion
+from src.utils.synthetic_data import make_synthetic_tables
+
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 400_000
+
+
+def fake_tone_answer(request, n):
+    """Fake server payload answering a packed tone request with valid JSON."""
+    prompt = request["messages"][-1]["content"]
+    ids = re.findall(r"^### (.+)$", prompt, flags=re.M)
+    results = [
+        {
+            "customer_id": cid,
+            "preferred_language": "ar" if i % 3 == 0 else "en",
+            "preferred_tone": "apologetic_recovery" if i % 2 else "warm_consultative",
+            "frustration_level": "medium",
+            "price_sensitivity": "high",
+            "emotional_style": "Calm but wants quick answers.",
+            "closure_preference": "direct",
+            "notes": "Fake analysis.",
+        }
+        for i, cid in enumerate(ids)
+    ]
+    payload = fake_completion(request, n)
+    payload["choices"][0]["message"]["content"] = json.dumps({"results": results})
+    return payload
+
+
+def run(transcripts, memory, force=False):
+    extractor = BatchToneExtractor(memory, limiter=RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE))
+    start = time.perf_counter()
+    summary = extractor.run(transcripts, force=force)
+    print(f"⏱ {time.perf_counter() - start:.2f}s — {summary}")
+    return summary
+
+
+def main_fake(n_customers):
+    tables = make_synthetic_tables(n_customers, events_per_customer={"call_center": 3})
+    transcripts = build_transcripts(tables["call_center"])
+
+    with FakeOpenAIServer(latency=0.2, respond=fake_tone_answer) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        configure(base_url=server.base_url, api_key="fake")
+        memory = CustomerMemoryDB(os.path.join(tmp, "customer_memory.db"))
+
+        print("🔹 First run (everything new)...")
+        run(transcripts, memory)
+        print("🔹 Second run (nothing changed)...")
+        run(transcripts, memory)
+
+        sample = transcripts.index[0]
+        print(f"Memory for {sample}: {memory.load_tone(sample)}")
+        get_gateway().print_stats()
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+
+    if args[0] == "--fake":
+        main_fake(int(args[1]) if len(args) > 1 else 2_000)
+        return
+
+    clean = load_and_clean_datasets(args[0], tables=["call_center"])
+    transcripts = build_transcripts(clean["call_center"])
+    run(transcripts, CustomerMemoryDB(), force="--force" in args)
+    get_gateway().print_stats()
+
+
+if __name__ == "__main__":
+    main()
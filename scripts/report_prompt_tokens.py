@@ -0,0 +1,236 @@
+"""
+Prompt size report: average input tokens per draft before and after the
+static-prefix prompt templates (src.llm.prompts).
+
+"before" renders the previous inline prompts (kept below verbatim for
+comparison); "after" renders the templates and also shows how much of
+each request is the shared system prefix (and whether it is long enough
+for provider-side prefix caching). Token counts use
+tiktoken when installed, else the chars/4 estimate.
+
+Usage:
+    python -m scripts.report_prompt_tokens [customers]
+"""
+import os
+import sys
+import tempfile
+
+from scripts.benchmark_draft_concurrency import make_high_risk
+from src.agent.engine import CustomerAgent
+from src.agent.llm_email_writer import LLMEmailWriter
+from src.features.llm_email_writer import LLMEmailWriter as PersonaEmailWriter
+from src.llm.prompts import PREFIX_CACHE_MIN_TOKENS, count_message_tokens, tiktoken
+
+LEGACY_SALES_SYSTEM = "You are a professional automotive retention email writer who explains offers clearly and tactfully."
+LEGACY_PERSONA_SYSTEM = (
+    "You are a highly skilled automotive retention strategist who writes human, persuasive, "
+    "persona-tailored emails."
+)
+
+
+# ============================================================
+# Previous inline prompts
+# ============================================================
+def legacy_sales_prompt(customer_info, reason, offer, language, tone, offer_explanation):
+    """
+    Converts customer + persona context into an instruction suitable for the LLM.
+    """
+
+    name = customer_info["name"]
+    car = customer_info["car_model"]
+    days = customer_info["days_until_lease_end"]
+    churn = customer_info["churn_risk_bucket"]
+    score = customer_info["churn_risk_score"]
+
+    # Language rules
+    if language == "ar":
+        lang_instruction = "Write the entire email in professional Arabic."
+    elif language == "en":
+        lang_instruction = "Write the entire email in professional English."
+    else:
+        lang_instruction = (
+            "If the customer's nationality is from GCC (UAE, KSA, Oman, Qatar, Bahrain, Kuwait, Jordan, Egypt), "
+            "prefer Arabic. Otherwise write in professional English."
+        )
+
+    # Tone styles
+    tone_map = {
+        "direct": "short, clear, and urgency-focused",
+        "warm": "friendly, reassuring, and human",
+        "warm_consultative": "empathetic, advisory, and relationship-focused",
+        "informative": "clear, factual, benefit-driven",
+        "reassuring": "soft, supportive, calming, trust-building",
+        "neutral": "professional, simple, polite"
+    }
+
+    tone_style = tone_map.get(tone, "professional and friendly")
+
+    return f"""
+You are writing a renewal email from an automotive sales team to a customer.
+
+### CUSTOMER DETAILS
+- Name: {name}
+- Car Model: {car}
+- Days until lease end: {days}
+- Churn risk: {churn} (score {score:.2f})
+
+### REASON FOR CONTACT
+{reason}
+
+### OFFER SELECTED
+{offer}
+
+### WHY THIS OFFER (EXPLANATION FOR YOU TO USE)
+{offer_explanation}
+Explain the offer benefits naturally in the email without sounding robotic.
+Do NOT mention that this reasoning comes from the system.
+
+### INSTRUCTIONS
+- Tone style: {tone_style}
+- {lang_instruction}
+- Highlight why the offer is valuable *based directly on the customer situation*.
+- Do NOT add fake financial numbers or unrealistic claims.
+- Keep the email concise, warm, and aligned with the persona.
+- End with a friendly invitation to contact the salesperson.
+
+Write the full email now.
+"""
+
+
+def legacy_persona_prompt(customer_info, reason, offer, language, tone):
+    """
+    Builds a rich persona-aware prompt.
+    """
+
+    name = customer_info["name"]
+    car = customer_info["car_model"]
+    days = customer_info["days_until_lease_end"]
+    churn = customer_info["churn_risk_bucket"]
+    score = customer_info["churn_risk_score"]
+    nationality = customer_info.get("nationality", "Unknown")
+
+    persona_name = customer_info.get("persona_name", "General Customer")
+    persona_emoji = customer_info.get("persona_emoji", "")
+    persona_style = customer_info.get(
+        "persona_style",
+        "No behavior data available. Use a professional but warm style."
+    )
+
+    # -------------------------------
+    # LANGUAGE LOGIC
+    # -------------------------------
+    if language == "ar":
+        lang_instruction = "Write the entire email in professional Arabic."
+    elif language == "en":
+        lang_instruction = "Write the entire email in natural-sounding professional English."
+    else:
+        lang_instruction = (
+            "If the customer nationality is from GCC, Egypt, Levant, Sudan, or Iraq, "
+            "prefer Arabic. Otherwise use English. Ensure translation quality is flawless."
+        )
+
+    # -------------------------------
+    # TONE STYLES (persona overrides may adjust this)
+    # -------------------------------
+    tone_map = {
+        "direct": "concise, action-driven, and urgent",
+        "warm": "friendly, emotional, and human",
+        "warm_consultative": "empathetic, advisory, patient, and trust-building",
+        "informative": "clear, factual, structured, and helpful",
+        "reassuring": "supportive, calming, and positive",
+        "neutral": "simple, polite, and professional",
+    }
+
+    tone_style = tone_map.get(tone, "professional and friendly")
+
+    # -------------------------------
+    # FINAL PROMPT
+    # -------------------------------
+    return f"""
+Write a renewal email *fully tailored* to the customer's persona, culture, and situation.
+
+### CUSTOMER PROFILE
+- Name: {name}
+- Nationality: {nationality}
+- Car Model: {car}
+- Days until lease end: {days}
+- Churn Risk: {churn} (score {score:.2f})
+- Reason for contact: {reason}
+
+### PERSONA DETAILS
+- Persona Type: {persona_name} {persona_emoji}
+- Behavioral Traits: {persona_style}
+- Adapt the writing style, tone, emotional intensity, structure, and negotiation strategy to this persona.
+
+### OFFER TO INCLUDE
+{offer}
+
+### EMAIL REQUIREMENTS
+1. Tone style to follow: **{tone_style}**
+2. {lang_instruction}
+3. Make the email STRUCTURE different depending on the persona:
+   - High-Urgency personas → strong opening, bold CTA, short message
+   - Analytical personas → structured bullets, logic, clarity
+   - Price-sensitive personas → value justification, savings emphasis
+   - Relationship personas → empathy, reassurance, human warmth
+   - Busy Executive personas → extremely concise, no fluff
+4. Reference the reason for contact naturally and in the persona’s preferred communication style.
+5. Do NOT repeat the reason text word-for-word; reinterpret it.
+6. Make the offer sound tailored — explain *why this customer* is receiving it.
+7. Close with a CTA appropriate for the persona (assertive, soft, detailed, or minimal).
+8. DO NOT invent financial details or numbers.
+
+Write the email now.
+"""
+
+
+# ============================================================
+# Report
+# ============================================================
+def legacy_messages(system, prompt):
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+
+def report(label, before, template):
+    after = template.mean_tokens()
+    prefix = template.prefix_tokens()
+    mean_before = sum(before) / len(before)
+    print(f"\n=== {label} ({len(before)} drafts) ===")
+    print(f"before: {mean_before:8.1f} prompt tokens / draft")
+    print(f"after:  {after:8.1f} prompt tokens / draft ({after / mean_before - 1:+.0%})")
+    cached = "cacheable" if prefix >= PREFIX_CACHE_MIN_TOKENS else f"below the {PREFIX_CACHE_MIN_TOKENS}-token cache minimum"
+    print(f"        {prefix:8d} of them in the static system prefix ({cached})")
+    print(f"        {after - prefix:8.1f} per-customer tokens")
+    print(f"        max {template.stats['max_tokens']} / budget {template.budget}, trimmed {template.stats['trimmed']}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    df = make_high_risk(n)
+    print(f"🔢 Token counter: {'tiktoken' if tiktoken else 'chars/4 estimate'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # CustomerMemoryDB writes customer_memory.db to the cwd
+        writer = LLMEmailWriter(cache=False)
+        persona_writer = PersonaEmailWriter(cache=False)
+        agent = CustomerAgent(df, llm=writer)
+
+        sales_before, persona_before = [], []
+        for _, row in df.iterrows():
+            inputs = agent.email_inputs(row, agent._build_reason_text(row))
+            explanation = writer._explain_offer(inputs["reason"], inputs["offer"])
+
+            old = legacy_sales_prompt(offer_explanation=explanation, **inputs)
+            sales_before.append(count_message_tokens(legacy_messages(LEGACY_SALES_SYSTEM, old)))
+            writer.build_messages(**inputs)
+
+            old = legacy_persona_prompt(**inputs)
+            persona_before.append(count_message_tokens(legacy_messages(LEGACY_PERSONA_SYSTEM, old)))
+            persona_writer.template.render(persona_writer._facts(**inputs))
+
+        report("agent sales email", sales_before, writer.template)
+        report("persona email", persona_before, persona_writer.template)
+
+
+if __name__ == "__main__":
+    main()
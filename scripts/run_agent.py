@@ -1,33 +1,115 @@
 import pandas as pd
-from src.data.load import load_datasets
-from src.data.clean import clean_dataset
-from src.data.transform import build_master_dataset
+from src.data.load import load_and_clean_datasets
+from src.data.optimize import compact_dtypes, print_memory_report
+from src.data.incremental import IncrementalMasterBuilder
+from src.data.transform import FILL_ZERO, MASTER_AGGS, build_master_dataset
+from src.data.validate import FEATURED_CONTRACT, print_report, validate_contract, validate_tables
 from src.features.churn_features import add_churn_and_lease_features
+from src.features.window_features import WINDOWS, add_window_features
+from src.models.churn_model import ChurnModel, load_or_train_churn_model
+from src.models.tree_export import churn_export_dir
 from src.agent.engine import CustomerAgent
 import os
 
-def run_daily_agent(base_path, output_folder="output/actions"):
+def churn_model_path(base_path):
+    return os.path.join(base_path, "churn_model.joblib")
+
+
+def featured_path(base_path):
+    return os.path.join(base_path, "master_featured.csv")
+
+
+def load_churn_model(base_path, retrain=False):
     """
-    Runs the full agent pipeline and exports a CSV of recommended actions.
+    Saved churn model, refit with outcomes resolved since its last run;
+    trained (and saved) when there is none yet or retrain=True. The
+    dashboard's array export is refreshed whenever the model changes.
     """
+    path = churn_model_path(base_path)
+    export_dir = churn_export_dir(featured_path(base_path))
+    if os.path.exists(path) and not retrain:
+        model = ChurnModel.load(path)
+        if model.has_window() and model.has_input_layout() and not model.needs_update() \
+                and os.path.exists(export_dir):
+            return model
 
-    print("🔥 Starting Customer Intelligence Agent Pipeline...")
+    clean = load_and_clean_datasets(base_path, cache_dir=os.path.join(base_path, ".dataset_cache"))
+    return load_or_train_churn_model(path, clean, retrain=retrain, export_dir=export_dir)
 
-    # 1. Load
-    print("📥 Loading datasets...")
-    raw = load_datasets(base_path)
 
-    # 2. Clean
-    print("🧹 Cleaning datasets...")
-    clean = clean_dataset(raw)
+def build_featured(base_path, force_rebuild=False, retrain_model=False):
+    """Full rebuild: load + clean, master dataset, churn scoring & lease features."""
+
+    # 1-2. Load + clean (pipelined, one worker per table)
+    print("📥 Loading and cleaning datasets...")
+    clean = load_and_clean_datasets(
+        base_path,
+        cache_dir=os.path.join(base_path, ".dataset_cache"),
+        force_rebuild=force_rebuild,
+    )
+
+    # 2b. Contract validation of every cleaned table
+    for report in validate_tables(clean).values():
+        if not report["passed"]:
+            print_report(report)
 
     # 3. Master dataset
     print("🔗 Building master dataset...")
     master = build_master_dataset(clean)
 
-    # 4. Feature engineering
+    # 4. Feature engineering (churn_prob scored in one batch by the saved model)
+    model = load_or_train_churn_model(
+        churn_model_path(base_path), clean, retrain=retrain_model,
+        export_dir=churn_export_dir(featured_path(base_path)),
+    )
     print("🧠 Adding churn & lease features...")
-    featured = add_churn_and_lease_features(master)
+    featured = add_churn_and_lease_features(master, model=model)
+
+    # Rolling 30/90/180/365-day behaviour windows
+    print("🪟 Adding rolling window features...")
+    return add_window_features(featured, clean)
+
+
+def run_daily_agent(base_path, output_folder="output/actions", force_rebuild=False, incremental=False,
+                    retrain_model=False):
+    """
+    Runs the full agent pipeline and exports a CSV of recommended actions.
+
+    Cleaned tables are cached under <base_path>/.dataset_cache;
+    force_rebuild=True ignores the cache. retrain_model=True retrains the
+    churn model from scratch (it is trained anyway when none is saved).
+
+    incremental=True only folds in rows not seen by the last run and
+    recomputes the affected customers (state under <base_path>/.incremental_state).
+    """
+
+    print("🔥 Starting Customer Intelligence Agent Pipeline...")
+
+    if incremental:
+        print("🔁 Incremental master + feature update...")
+        # Only customers whose model inputs changed are rescored; the new
+        # scores are also written back to the persisted featured dataset.
+        builder = IncrementalMasterBuilder(
+            os.path.join(base_path, ".incremental_state"), MASTER_AGGS, FILL_ZERO,
+            churn_model=load_churn_model(base_path, retrain=retrain_model),
+            publish_path=featured_path(base_path),
+            windows=WINDOWS,
+        )
+        featured, _ = builder.update(base_path, rescore_all=retrain_model)
+    else:
+        featured = build_featured(base_path, force_rebuild, retrain_model)
+
+    # 4a. Drop featured rows the agent cannot handle (instead of crashing mid-run)
+    report = validate_contract(featured, FEATURED_CONTRACT, "featured")
+    if not report["passed"]:
+        print_report(report)
+        featured = featured[~report["row_mask"]]
+        print(f"⚠ Excluded {int(report['row_mask'].sum())} featured rows that break the contract.")
+
+    # 4b. Compact dtypes before the agent holds the frame
+    print("📦 Compacting featured dataset dtypes...")
+    featured, report = compact_dtypes(featured, return_report=True)
+    print_memory_report(report)
 
     # 5. Run the agent
     print("🤖 Running agent decision engine...")
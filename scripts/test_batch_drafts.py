@@ -0,0 +1,106 @@
+"""
+Manual check of the nightly batch drafting mode against LocalBatchBackend.
+
+    1. submit + interrupted poll (simulated restart)
+    2. resume in the same work_dir → packets stitched by customer_id,
+       injected failures reported as DRAFT_FAILED
+    3. fresh work_dir → successful drafts served from the response cache,
+       only the failed ones are resubmitted
+    4. crash right after the batch was created → the next run finds it
+       by run id instead of submitting again
+    5. batch that ended "expired" → the next run resubmits it
+
+Usage:
+    python -m scripts.test_batch_drafts [customers]
+"""
+import os
+import sys
+import tempfile
+
+from scripts.benchmark_draft_concurrency import make_high_risk
+from src.agent.batch import LocalBatchBackend, _read_json, _write_json
+from src.agent.engine import CustomerAgent
+from src.agent.llm_email_writer import LLMEmailWriter
+from src.memory.llm_response_cache import LLMResponseCache
+from src.utils.fake_openai_server import fake_completion
+
+
+class CrashAfterSubmit(LocalBatchBackend):
+    """Creates the batch, then dies before the caller can record its id."""
+
+    def submit(self, input_path, run_id):
+        super().submit(input_path, run_id)
+        raise RuntimeError("simulated crash after submit")
+
+
+def make_agent(df, cache):
+    # The LLM gateway is never touched: everything goes through the batch backend
+    return CustomerAgent(df, llm=LLMEmailWriter(cache=cache))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    df = make_high_risk(n)
+    fail_ids = set(df["customer_id"].iloc[::10])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # CustomerMemoryDB writes customer_memory.db to the cwd
+        cache = LLMResponseCache(os.path.join(tmp, "llm_cache.db"))
+        backend = LocalBatchBackend(os.path.join(tmp, "batch_api"), fake_completion, fail_ids=fail_ids)
+        work_dir = os.path.join(tmp, "nightly")
+
+        print("🔹 Run 1: submit, then stop polling early...")
+        try:
+            make_agent(df, cache).create_sales_draft_packets_batch(work_dir, backend, poll_interval=0, max_wait=0)
+            print("❌ Expected the first run to time out.")
+        except TimeoutError as exc:
+            print(f"   interrupted: {exc}")
+
+        print("🔹 Run 2: resume in the same work_dir...")
+        packets = make_agent(df, cache).create_sales_draft_packets_batch(work_dir, backend, poll_interval=0)
+
+        ordered = [p["customer_id"] for p in packets] == list(df["customer_id"])
+        failed = {p["customer_id"] for p in packets if p["status"] == "DRAFT_FAILED"}
+        submissions = len([f for f in os.listdir(backend.root) if f.endswith(".json")])
+        print(f"   packets: {len(packets)}  ordered: {ordered}  submissions: {submissions}")
+        print(f"   failed as injected: {failed == fail_ids} ({len(failed)})")
+        print(f"   cached responses: {cache.size()}")
+
+        print("🔹 Run 3: fresh work_dir, same prompts...")
+        again = make_agent(df, cache).create_sales_draft_packets_batch(os.path.join(tmp, "nightly2"), backend, poll_interval=0)
+        same = [p.get("email_to_sales") for p in again if p["status"] == "DRAFT_CREATED"] == \
+               [p.get("email_to_sales") for p in packets if p["status"] == "DRAFT_CREATED"]
+        print(f"   reused drafts identical: {same}")
+
+        def count_batches(root):
+            return len([f for f in os.listdir(root) if f.endswith(".json")])
+
+        print("🔹 Run 4: crash between submit and state.json...")
+        fresh = LLMResponseCache(os.path.join(tmp, "llm_cache_fresh.db"))
+        crash_root = os.path.join(tmp, "batch_api_crash")
+        try:
+            make_agent(df, fresh).create_sales_draft_packets_batch(
+                os.path.join(tmp, "nightly3"), CrashAfterSubmit(crash_root, fake_completion), poll_interval=0)
+        except RuntimeError as exc:
+            print(f"   {exc}")
+        recovered = make_agent(df, fresh).create_sales_draft_packets_batch(
+            os.path.join(tmp, "nightly3"), LocalBatchBackend(crash_root, fake_completion), poll_interval=0)
+        print(f"   batches created: {count_batches(crash_root)} (expected 1), packets: {len(recovered)}")
+
+        print("🔹 Run 5: expired batch is resubmitted...")
+        state_path = os.path.join(tmp, "nightly3", "state.json")
+        state = _read_json(state_path)
+        state["status"] = "expired"
+        _write_json(state_path, state)
+        make_agent(df, LLMResponseCache(os.path.join(tmp, "llm_cache_other.db"))).create_sales_draft_packets_batch(
+            os.path.join(tmp, "nightly3"), LocalBatchBackend(crash_root, fake_completion), poll_interval=0)
+        print(f"   batches created: {count_batches(crash_root)} (expected 2)")
+
+        print("\n=== SAMPLE PACKET ===")
+        sample = next(p for p in packets if p["status"] == "DRAFT_CREATED")
+        print(sample["customer_id"], "-", sample["name"], "|", sample["reason"])
+        print(sample["email_to_sales"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
+import os
+import sys
+
 from src.data.load import load_datasets
 from src.data.clean import clean_dataset
 from src.data.transform import build_master_dataset
 from src.features.churn_features import add_churn_and_lease_features
 
 BASE_PATH = r"C:\Users\-adm.shima\Desktop\project_structure\src\data\full_realistic_dataset"
+CACHE_DIR = os.path.join(BASE_PATH, ".dataset_cache")
 
 def main():
     print("🔹 Loading datasets...")
-    raw = load_datasets(BASE_PATH)
+    # Pass --rebuild-cache to ignore cached Parquet copies
+    raw = load_datasets(BASE_PATH, cache_dir=CACHE_DIR, force_rebuild="--rebuild-cache" in sys.argv)
     for name, df in raw.items():
         print(f"{name}: {df.shape}")
 
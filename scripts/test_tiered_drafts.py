@@ -0,0 +1,74 @@
+"""
+Manual check of tiered drafting (template first, LLM within a budget)
+against the local fake OpenAI server.
+
+    1. fast provider   → LLM drafts within the budget
+    2. slow provider   → templates kept, run ends at the budget
+    3. failing provider → circuit breaker opens, later runs skip the LLM
+    4. cached drafts   → upgraded instantly even when the provider is slow
+
+Usage:
+    python -m scripts.test_tiered_drafts [customers] [budget_s]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from scripts.benchmark_draft_concurrency import make_high_risk
+from src.agent.concurrency import CircuitBreaker
+from src.agent.engine import CustomerAgent
+from src.agent.llm_email_writer import LLMEmailWriter
+from src.llm.gateway import configure
+from src.memory.llm_response_cache import LLMResponseCache
+from src.utils.fake_openai_server import FakeOpenAIServer
+
+
+def run(label, agent, budget):
+    start = time.perf_counter()
+    packets = agent.create_tiered_draft_packets(latency_budget=budget, max_workers=16)
+    elapsed = time.perf_counter() - start
+    sources = Counter(p["draft_source"] for p in packets)
+    reasons = Counter(p.get("fallback_reason", "").split(":")[0] for p in packets if p["draft_source"] == "template")
+    print(f"{label:<18} {elapsed:6.2f}s  llm={sources['llm']:<4} template={sources['template']:<4} {dict(reasons)}")
+    return packets
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+    df = make_high_risk(n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # CustomerMemoryDB writes customer_memory.db to the cwd
+        cache = LLMResponseCache(os.path.join(tmp, "llm_cache.db"))
+
+        def agent(breaker=None, use_cache=False):
+            return CustomerAgent(df, llm=LLMEmailWriter(cache=cache if use_cache else False), breaker=breaker)
+
+        print(f"🧪 {n} high-risk customers, latency budget {budget}s")
+
+        with FakeOpenAIServer(latency=0.2) as server:
+            configure(base_url=server.base_url, api_key="fake")
+            run("fast provider", agent(use_cache=True), budget)
+
+        with FakeOpenAIServer(latency=budget * 3) as server:
+            configure(base_url=server.base_url, api_key="fake")
+            run("slow provider", agent(), budget)
+            run("slow, cached", agent(use_cache=True), budget)
+
+        with FakeOpenAIServer(latency=0.05, error_rate=1.0) as server:
+            configure(base_url=server.base_url, api_key="fake")
+            breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60)
+            run("failing provider", agent(breaker), budget)
+            run("breaker open", agent(breaker), budget)
+            print(f"server requests while failing: {server.stats['requests']}")
+
+        sample = run("sample", agent(CircuitBreaker(), use_cache=False), 0.0)[0]
+        print("\n=== TEMPLATE DRAFT ===")
+        print(sample["email_to_sales"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Offline batch-API drafting for the nightly run.
+
+All high-risk prompts are rendered into one JSONL request file
+(OpenAI batch format), submitted once and polled until the batch is
+done; results are stitched back into action packets by customer_id.
+Batch requests are billed at a discount and have their own rate-limit
+pool, so this trades latency for throughput and cost.
+
+Everything lives under work_dir:
+    • requests.jsonl   one request per customer (custom_id = customer_id)
+    • contexts.json    reason / tone / language / persona per customer
+    • state.json       run id, batch id + last seen status (resume point)
+    • output.jsonl / errors.jsonl   downloaded results
+
+Re-running with the same work_dir never submits twice: state.json is
+written as "submitting" (with a run id sent as batch metadata) before the
+batch is created, so a crash right after submit finds the batch again by
+that id. A pending batch is polled again and a completed one is only
+re-stitched; a failed, expired or cancelled batch is resubmitted.
+
+Backends:
+    OpenAIBatchBackend  files.create + batches.create / retrieve / list + files.content
+    LocalBatchBackend   same protocol on the local filesystem (no API key),
+                        used by scripts/test_batch_drafts.py
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+
+from src.agent.llm_email_writer import EMAIL_TEMPERATURE
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+RESUBMIT_STATUSES = TERMINAL_STATUSES - {"completed"}
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_jsonl(text):
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def parse_result(result):
+    """(text, error) of one batch output / error line."""
+    if result.get("error"):
+        error = result["error"]
+        return None, f"{error.get('code')}: {error.get('message')}"
+
+    response = result.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code") != 200:
+        message = (body.get("error") or {}).get("message", "no response body")
+        return None, f"HTTP {response.get('status_code')}: {message}"
+
+    try:
+        return body["choices"][0]["message"]["content"].strip(), None
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return None, "Malformed completion in batch output"
+
+
+# ============================================================
+# Backends
+# ============================================================
+class OpenAIBatchBackend:
+    """OpenAI Batch API (client: an openai.OpenAI instance)."""
+
+    def __init__(self, client, completion_window=COMPLETION_WINDOW):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, input_path, run_id):
+        with open(input_path, "rb") as f:
+            upload = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata={"run_id": run_id},
+        )
+        return batch.id
+
+    def find(self, run_id, limit=100):
+        """Id of the most recent batch submitted with run_id, or None."""
+        for batch in self.client.batches.list(limit=limit).data:
+            if (batch.metadata or {}).get("run_id") == run_id:
+                return batch.id
+        return None
+
+    def status(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+        }
+
+    def download(self, file_id):
+        return self.client.files.content(file_id).text
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the Batch API.
+
+    Each status() call advances the batch one step
+    (validating → in_progress → finalizing → completed); on completion
+    every request is answered with respond(body, n) (a chat completion
+    payload, e.g. src.utils.fake_openai_server.fake_completion) and written
+    as output / error files in the OpenAI result format.
+    fail_ids: custom_ids answered with HTTP 500.
+    """
+
+    STEPS = ("validating", "in_progress", "finalizing", "completed")
+
+    def __init__(self, root, respond, fail_ids=()):
+        self.root = root
+        self.respond = respond
+        self.fail_ids = {str(i) for i in fail_ids}
+        os.makedirs(os.path.join(root, "files"), exist_ok=True)
+
+    def _file(self, file_id):
+        return os.path.join(self.root, "files", f"{file_id}.jsonl")
+
+    def _batch(self, batch_id):
+        return os.path.join(self.root, f"{batch_id}.json")
+
+    def submit(self, input_path, run_id):
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        shutil.copyfile(input_path, self._file(file_id))
+
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        _write_json(self._batch(batch_id), {
+            "id": batch_id,
+            "status": self.STEPS[0],
+            "input_file_id": file_id,
+            "output_file_id": None,
+            "error_file_id": None,
+            "metadata": {"run_id": run_id},
+            "created_at": time.time(),
+        })
+        return batch_id
+
+    def find(self, run_id):
+        found = []
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                batch = _read_json(os.path.join(self.root, name))
+                if batch.get("metadata", {}).get("run_id") == run_id:
+                    found.append(batch)
+        return max(found, key=lambda b: b["created_at"])["id"] if found else None
+
+    def status(self, batch_id):
+        batch = _read_json(self._batch(batch_id))
+        if batch["status"] not in TERMINAL_STATUSES:
+            batch["status"] = self.STEPS[self.STEPS.index(batch["status"]) + 1]
+            if batch["status"] == "completed":
+                self._process(batch)
+            _write_json(self._batch(batch_id), batch)
+
+        return {key: batch[key] for key in ("status", "output_file_id", "error_file_id")}
+
+    def _process(self, batch):
+        with open(self._file(batch["input_file_id"]), "r", encoding="utf-8") as f:
+            requests = _read_jsonl(f.read())
+
+        output, errors = [], []
+        for n, request in enumerate(requests, start=1):
+            result = {"id": f"batch_req_{n}", "custom_id": request["custom_id"], "error": None}
+            if request["custom_id"] in self.fail_ids:
+                result["response"] = {
+                    "status_code": 500,
+                    "request_id": f"req_{n}",
+                    "body": {"error": {"message": "Internal error (local batch)", "type": "server_error"}},
+                }
+                errors.append(result)
+            else:
+                result["response"] = {"status_code": 200, "request_id": f"req_{n}", "body": self.respond(request["body"], n)}
+                output.append(result)
+
+        for kind, rows in (("output_file_id", output), ("error_file_id", errors)):
+            if not rows:
+                continue
+            file_id = f"file-{uuid.uuid4().hex[:12]}"
+            with open(self._file(file_id), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            batch[kind] = file_id
+
+    def download(self, file_id):
+        with open(self._file(file_id), "r", encoding="utf-8") as f:
+            return f.read()
+
+
+# ============================================================
+# Batch draft run
+# ============================================================
+class BatchDraftRun:
+    """
+    One nightly batch of high-risk drafts for a CustomerAgent.
+
+    Prompts already in the agent's LLM response cache are not resubmitted;
+    batch results are written to the cache so the app reuses them.
+    """
+
+    def __init__(self, agent, work_dir, backend, poll_interval=60, max_wait=None):
+        self.agent = agent
+        self.work_dir = work_dir
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        os.makedirs(work_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.work_dir, name)
+
+    # --------------------------------------------------------
+    # Render + submit
+    # --------------------------------------------------------
+    def render(self, rows):
+        """Write requests.jsonl + contexts.json; returns the number of requests."""
+        llm = self.agent.llm
+        contexts = {}
+        n_requests = 0
+
+        with open(self._path("requests.jsonl"), "w", encoding="utf-8") as f:
+            for row in rows:
+                custom_id = str(row["customer_id"])
+                reason = self.agent._build_reason_text(row)
+                inputs = self.agent.email_inputs(row, reason)
+                messages = llm.build_messages(**inputs)
+                key = llm.request_key(messages, EMAIL_TEMPERATURE)
+
+                contexts[custom_id] = {
+                    "reason": reason,
+                    "tone": inputs["tone"],
+                    "language": inputs["language"],
+                    "persona_name": inputs["customer_info"]["persona_name"],
+                    "key": key,
+                }
+
+                cached = llm.cache.get(key) if llm.cache else None
+                if cached is not None:
+                    contexts[custom_id]["email"] = cached
+                    continue
+
+                f.write(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {"model": llm.model, "messages": messages, "temperature": EMAIL_TEMPERATURE},
+                }, ensure_ascii=False) + "\n")
+                n_requests += 1
+
+        _write_json(self._path("contexts.json"), contexts)
+        return n_requests
+
+    def _submit(self, rows):
+        n_requests = self.render(rows)
+        cached = len(rows) - n_requests
+        if cached:
+            print(f"💾 {cached} drafts served from the response cache.")
+
+        if not n_requests:
+            state = {"batch_id": None, "status": "completed", "downloaded": True}
+            _write_json(self._path("state.json"), state)
+            return state
+
+        # Recorded before the batch exists: a crash inside submit is resumed
+        # by looking the batch up by run_id instead of submitting again
+        state = {"run_id": uuid.uuid4().hex, "batch_id": None, "status": "submitting", "downloaded": False}
+        _write_json(self._path("state.json"), state)
+        return self._create(state, n_requests)
+
+    def _create(self, state, n_requests=None):
+        state["batch_id"] = self.backend.submit(self._path("requests.jsonl"), state["run_id"])
+        state.update(status="submitted", submitted_at=time.time())
+        _write_json(self._path("state.json"), state)
+        count = f" with {n_requests} requests" if n_requests is not None else ""
+        print(f"📤 Submitted batch {state['batch_id']}{count}.")
+        return state
+
+    def _recover(self, state):
+        """Resume a run interrupted while submitting."""
+        batch_id = self.backend.find(state["run_id"])
+        if batch_id is None:
+            print("🔁 Previous submit never reached the batch API — submitting again.")
+            return self._create(state)
+
+        print(f"🔁 Found batch {batch_id} from the interrupted submit.")
+        state.update(batch_id=batch_id, status="submitted")
+        _write_json(self._path("state.json"), state)
+        return state
+
+    # --------------------------------------------------------
+    # Poll + download
+    # --------------------------------------------------------
+    def _wait(self, state):
+        started = time.time()
+        while True:
+            info = self.backend.status(state["batch_id"])
+            state.update(info)
+            _write_json(self._path("state.json"), state)
+
+            if info["status"] in TERMINAL_STATUSES:
+                print(f"📬 Batch {state['batch_id']} {info['status']}.")
+                return state
+            if self.max_wait is not None and time.time() - started >= self.max_wait:
+                raise TimeoutError(
+                    f"Batch {state['batch_id']} still {info['status']}; re-run with the same work_dir to resume."
+                )
+
+            print(f"⏳ Batch {state['batch_id']} {info['status']}...")
+            time.sleep(self.poll_interval)
+
+    def _download(self, state):
+        for kind, name in (("output_file_id", "output.jsonl"), ("error_file_id", "errors.jsonl")):
+            text = self.backend.download(state[kind]) if state.get(kind) else ""
+            with open(self._path(name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+        state["downloaded"] = True
+        _write_json(self._path("state.json"), state)
+
+    # --------------------------------------------------------
+    # Stitch
+    # --------------------------------------------------------
+    def _results(self):
+        results = {}
+        for name in ("output.jsonl", "errors.jsonl"):
+            path = self._path(name)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for result in _read_jsonl(f.read()):
+                        results[str(result["custom_id"])] = parse_result(result)
+        return results
+
+    def stitch(self, rows, status):
+        contexts = _read_json(self._path("contexts.json"), {})
+        results = self._results()
+        llm = self.agent.llm
+        packets = []
+
+        for row in rows:
+            custom_id = str(row["customer_id"])
+            context = contexts.get(custom_id)
+            if context is None:
+                continue
+
+            text, error = context.get("email"), None
+            if text is None:
+                text, error = results.get(custom_id, (None, f"No batch result (batch {status})"))
+                if text is not None and llm.cache:
+                    llm.cache.put(context["key"], text, model=llm.model)
+
+            if text is None:
+                packets.append(self.agent.failed_packet(row, error))
+                continue
+
+            packets.append(self.agent.assemble_packet(
+                row, context["reason"], text, context["tone"], context["language"], context["persona_name"]
+            ))
+
+        missing = sum(1 for row in rows if str(row["customer_id"]) not in contexts)
+        if missing:
+            print(f"⚠ {missing} high-risk customers were not part of this batch.")
+        return packets
+
+    def run(self):
+        """Submit (or resume) the batch and return the action packets in row order."""
+        rows = self.agent.high_risk_rows()
+
+        state = _read_json(self._path("state.json"))
+        if state is not None and state["status"] in RESUBMIT_STATUSES:
+            print(f"🔁 Batch {state['batch_id']} {state['status']} — resubmitting.")
+            state = None
+
+        if state is None:
+            state = self._submit(rows)
+        else:
+            print(f"🔁 Resuming batch run in {self.work_dir} ({state['status']}).")
+            if state["status"] == "submitting":
+                state = self._recover(state)
+
+        if not state["downloaded"]:
+            if state["status"] not in TERMINAL_STATUSES:
+                state = self._wait(state)
+            self._download(state)
+
+        packets = self.stitch(rows, state["status"])
+        failed = sum(1 for p in packets if p["status"] == "DRAFT_FAILED")
+        print(f"✅ Batch drafts: {len(packets) - failed} created, {failed} failed.")
+        return packets
@@ -0,0 +1,174 @@
+"""
+Concurrency helpers for LLM calls.
+
+- TokenBucket / RateLimiter: block until a request (and its estimated
+  tokens) fits the requests-per-minute / tokens-per-minute budget.
+- retry_with_backoff: retry transient API errors with full-jitter
+  exponential backoff.
+- map_ordered: run a function over items on a bounded thread pool and
+  return results in input order.
+- CircuitBreaker: stop calling a failing / timing-out provider for a
+  while so callers fall back immediately.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# HTTP statuses worth retrying (timeouts, conflicts, rate limits, server errors)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+# --------------------------------------------------------
+# Rate limiting
+# --------------------------------------------------------
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute`."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` units are available, then take them."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits (either may be None)."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens=0):
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            self.tokens.acquire(tokens)
+
+
+# --------------------------------------------------------
+# Retries
+# --------------------------------------------------------
+def is_retryable(exc):
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if getattr(exc, "status_code", None) in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in RETRYABLE_ERRORS
+
+
+def retry_with_backoff(fn, max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY,
+                       max_delay=DEFAULT_MAX_DELAY, retryable=is_retryable):
+    """Call fn(); on a retryable error sleep U(0, min(max_delay, base * 2^attempt)) and retry."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt == max_retries or not retryable(exc):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"↻ {type(exc).__name__} — retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+# --------------------------------------------------------
+# Circuit breaker
+# --------------------------------------------------------
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed → open after failure_threshold consecutive failures; after
+    reset_timeout seconds one trial call is let through (half-open) and
+    its outcome closes or re-opens the circuit. Thread-safe.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        """True while calls are refused (does not consume the half-open trial)."""
+        with self.lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"⚡ Circuit open after {self.failures} failures — pausing calls for {self.reset_timeout:.0f}s")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def call(self, fn):
+        """fn() through the breaker; raises CircuitOpenError while open."""
+        if not self.allow():
+            raise CircuitOpenError("Circuit open")
+        try:
+            result = fn()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+# --------------------------------------------------------
+# Bounded, ordered fan-out
+# --------------------------------------------------------
+def map_ordered(fn, items, max_workers=8):
+    """[fn(item) for item in items] on up to max_workers threads, in input order."""
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
@@ -1,22 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import pandas as pd
 
+from src.agent.concurrency import CircuitBreaker, CircuitOpenError, map_ordered
 from src.agent.llm_email_writer import LLMEmailWriter
+from src.agent.templates.email_templates import sales_email_ar, sales_email_en, sales_email_manager
 from src.features.persona import choose_tone_when_no_data
 from src.memory.customer_memory_db import CustomerMemoryDB
 from src.features.persona_classifier import PersonaClassifier
 
+# Tiered drafting: seconds an LLM draft may take before the template is kept
+DEFAULT_LATENCY_BUDGET = 4.0
+
+# Manager escalation template for the most urgent cases
+ESCALATION_SCORE = 0.9
+ESCALATION_DAYS = 14
+
 
 class CustomerAgent:
     """
     SAFE demo-ready agent.
 
     Gmail is NOT initialized unless explicitly requested.
+
+    breaker: CircuitBreaker guarding LLM calls in tiered mode (shared
+    across runs, so a provider outage short-circuits to templates).
     """
 
-    def __init__(self, featured_df: pd.DataFrame):
+    def __init__(self, featured_df: pd.DataFrame, llm=None, breaker=None):
         self.df = featured_df
 
-        self.llm = LLMEmailWriter()
+        self.llm = llm or LLMEmailWriter()
+        self.breaker = breaker or CircuitBreaker()
         self.memory = CustomerMemoryDB()
         self.personas = PersonaClassifier()
 
@@ -29,11 +45,25 @@ class CustomerAgent:
     def _build_reason_text(self, row):
         reasons = []
 
-        if row.get("total_missed_payments", 0) > 0:
+        # Windowed features (window_features.py) separate recent behaviour
+        # from old history; fall back to lifetime totals when absent.
+        recent_missed = row.get("missed_payments_90d")
+        if recent_missed is not None and recent_missed > 0:
+            reasons.append("Missed payments in the last 90 days")
+        elif row.get("total_missed_payments", 0) > 0:
             reasons.append("Past missed payments")
 
-        if row.get("complaint_count", 0) > 0:
+        recent_complaints = row.get("complaints_90d")
+        if recent_complaints is None:
+            if row.get("complaint_count", 0) > 0:
+                reasons.append("Recent complaints")
+        elif recent_complaints > 0:
             reasons.append("Recent complaints")
+        elif row.get("complaint_count", 0) > 0:
+            reasons.append("Past complaints")
+
+        if row.get("calls_30d", 0) >= 2:
+            reasons.append("Several call-center contacts this month")
 
         if row.get("avg_service_satisfaction", 5) < 3:
             reasons.append("Low service satisfaction")
@@ -41,6 +71,12 @@ class CustomerAgent:
         if row.get("days_until_lease_end", 999) <= 30:
             reasons.append("Lease ending soon")
 
+        # NaN = never contacted (only when the windowed features are present)
+        if "days_since_last_sales_interaction" in row:
+            since = row["days_since_last_sales_interaction"]
+            if pd.isna(since) or since > 180:
+                reasons.append("No sales contact in 6+ months")
+
         if row.get("churn_risk_bucket") == "High":
             reasons.append("High churn risk")
 
@@ -67,26 +103,26 @@ class CustomerAgent:
     # PERSONA + TONE
     # ------------------------------------------------------------------
     def _determine_tone_and_language(self, row):
-        mem = self.memory.load_tone(row["customer_id"])
-        if mem:
-            return (
-                mem.get("preferred_tone", "warm_consultative"),
-                mem.get("preferred_language", "auto"),
-                mem.get("persona_name", "General Customer"),
-            )
-
+        """
+        Persona defaults, overridden field by field by customer memory.
+        Memory only stores tone / language (either may be NULL, e.g. when
+        the tone extractor validated one of them), so the persona always
+        comes from the classifier.
+        """
         persona = self.personas.predict_persona(row)
+        mem = self.memory.load_tone(row["customer_id"])
 
         return (
-            persona.get("tone", "warm_consultative"),
-            persona.get("language", "auto"),
+            mem.get("preferred_tone") or persona.get("tone", "warm_consultative"),
+            mem.get("preferred_language") or persona.get("language", "auto"),
             persona.get("name", "General Customer"),
         )
 
     # ------------------------------------------------------------------
     # EMAIL GENERATION
     # ------------------------------------------------------------------
-    def generate_sales_email(self, row, reason_text):
+    def email_inputs(self, row, reason_text):
+        """Keyword arguments for LLMEmailWriter.write_email / build_messages."""
         offer = self.suggest_offer(row)
         tone, language, persona_name = self._determine_tone_and_language(row)
 
@@ -102,23 +138,54 @@ class CustomerAgent:
             "preferred_language": language,
         }
 
-        email_text = self.llm.write_email(
-            customer_info=customer_info,
-            reason=reason_text,
-            offer=offer,
-            language=language,
-            tone=tone,
-        )
+        return {
+            "customer_info": customer_info,
+            "reason": reason_text,
+            "offer": offer,
+            "language": language,
+            "tone": tone,
+        }
 
-        return email_text, tone, language, persona_name
+    def generate_sales_email(self, row, reason_text, regenerate=False, on_token=None, stats=None):
+        """on_token(piece) switches to streaming and is called for every piece of the draft."""
+        inputs = self.email_inputs(row, reason_text)
+
+        if on_token is None:
+            email_text = self.llm.write_email(**inputs, regenerate=regenerate, stats=stats)
+        else:
+            parts = []
+            for piece in self.llm.stream_email(**inputs, regenerate=regenerate, stats=stats):
+                parts.append(piece)
+                on_token(piece)
+            email_text = "".join(parts).strip()
+
+        return (
+            email_text,
+            inputs["tone"],
+            inputs["language"],
+            inputs["customer_info"]["persona_name"],
+        )
 
     # ------------------------------------------------------------------
     # ACTION PACKET (UI-safe)
     # ------------------------------------------------------------------
-    def build_action_packet(self, row):
+    def build_action_packet(self, row, regenerate=False, on_token=None):
+        """
+        regenerate=True asks the LLM for a fresh draft instead of the cached one.
+        on_token(piece) streams the draft as it is written (e.g. into a UI placeholder).
+        The packet records time-to-first-token and total draft latency.
+        """
         reason_text = self._build_reason_text(row)
-        email_text, tone, lang, persona_name = self.generate_sales_email(row, reason_text)
+        stats = {}
+        email_text, tone, lang, persona_name = self.generate_sales_email(
+            row, reason_text, regenerate, on_token=on_token, stats=stats
+        )
+        packet = self.assemble_packet(row, reason_text, email_text, tone, lang, persona_name)
+        packet["draft_ttft_s"] = round(stats.get("ttft_s", 0.0), 3)
+        packet["draft_latency_s"] = round(stats.get("total_s", 0.0), 3)
+        return packet
 
+    def assemble_packet(self, row, reason_text, email_text, tone, lang, persona_name, draft_source="llm"):
         persona_emoji_map = {
             "High-Urgency Customer": "🔥",
             "Price-Sensitive Customer": "💰",
@@ -151,19 +218,157 @@ class CustomerAgent:
             "email_to_sales": email_text,
             "used_tone": tone,
             "used_language": lang,
+            "draft_source": draft_source,
             "status": "DRAFT_CREATED",
         }
 
+    # ------------------------------------------------------------------
+    # TIERED: template first, LLM upgrade within a latency budget
+    # ------------------------------------------------------------------
+    def render_template_email(self, inputs):
+        """Deterministic draft from src/agent/templates (no API call)."""
+        info = inputs["customer_info"]
+
+        if info["churn_risk_score"] >= ESCALATION_SCORE and info["days_until_lease_end"] <= ESCALATION_DAYS:
+            template = sales_email_manager
+        elif inputs["language"] == "ar":
+            template = sales_email_ar
+        else:
+            template = sales_email_en
+
+        return template(info, inputs["reason"], inputs["offer"]).strip()
+
+    def _llm_draft(self, inputs, deadline):
+        """One LLM draft whose request times out at the deadline (perf_counter)."""
+        timeout = deadline - time.perf_counter()
+        if timeout <= 0:
+            raise TimeoutError("Latency budget spent before the call started")
+        if not self.breaker.allow():
+            raise CircuitOpenError("Circuit open")
+        try:
+            text = self.llm.write_email(**inputs, timeout=timeout)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return text
+
+    def create_tiered_draft_packets(self, latency_budget=DEFAULT_LATENCY_BUDGET, max_workers=8, rows=None):
+        """
+        Every high-risk customer gets a template draft immediately; LLM
+        drafts replace them when they arrive within latency_budget seconds
+        of the start (cached drafts arrive at once). Timeouts, errors and
+        an open circuit breaker keep the template, so the run never waits
+        on the provider for longer than the budget.
+
+        Packets carry draft_source ("llm" / "template") and, for templates,
+        fallback_reason ("timeout", "circuit_open" or the error).
+        """
+        start = time.perf_counter()
+        deadline = start + latency_budget
+        rows = self.high_risk_rows() if rows is None else list(rows)
+
+        prepared, packets = [], []
+        for row in rows:
+            reason_text = self._build_reason_text(row)
+            inputs = self.email_inputs(row, reason_text)
+            persona_name = inputs["customer_info"]["persona_name"]
+            prepared.append((row, reason_text, inputs, persona_name))
+
+            packet = self.assemble_packet(
+                row, reason_text, self.render_template_email(inputs),
+                inputs["tone"], inputs["language"], persona_name, draft_source="template",
+            )
+            packet["fallback_reason"] = "timeout"
+            packets.append(packet)
+
+        if not packets or latency_budget <= 0:
+            return packets
+        if self.breaker.is_open():
+            for packet in packets:
+                packet["fallback_reason"] = "circuit_open"
+            print(f"⚡ LLM circuit open — {len(packets)} template drafts.")
+            return packets
+
+        pool = ThreadPoolExecutor(max_workers=min(max_workers, len(prepared)))
+        futures = {
+            pool.submit(self._llm_draft, inputs, deadline): i
+            for i, (_, _, inputs, _) in enumerate(prepared)
+        }
+        done, _ = wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+        # Queued calls are dropped; running ones time out at the deadline, so
+        # the non-daemon workers never hold up interpreter exit for long
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            i = futures[future]
+            exc = future.exception()
+            if exc is not None:
+                packets[i]["fallback_reason"] = (
+                    "circuit_open" if isinstance(exc, CircuitOpenError) else f"{type(exc).__name__}: {exc}"
+                )
+                continue
+            row, reason_text, inputs, persona_name = prepared[i]
+            packets[i] = self.assemble_packet(
+                row, reason_text, future.result(), inputs["tone"], inputs["language"], persona_name,
+            )
+
+        upgraded = sum(p["draft_source"] == "llm" for p in packets)
+        print(
+            f"⚡ Tiered drafts: {upgraded} LLM, {len(packets) - upgraded} template "
+            f"in {time.perf_counter() - start:.2f}s (budget {latency_budget:.1f}s)."
+        )
+        return packets
+
+    def build_tiered_packet(self, row, latency_budget=DEFAULT_LATENCY_BUDGET):
+        """Single-customer tiered draft (e.g. for the dashboard)."""
+        return self.create_tiered_draft_packets(latency_budget, max_workers=1, rows=[row])[0]
+
     # ------------------------------------------------------------------
     # HIGH-RISK ONLY (GRID SAFE)
     # ------------------------------------------------------------------
-    def create_sales_draft_packets(self):
-        high_risk_df = self.df[self.df["churn_risk_bucket"] == "High"]
+    def _safe_action_packet(self, row):
+        """build_action_packet, but a failed draft does not sink the whole run."""
+        try:
+            return self.build_action_packet(row)
+        except Exception as exc:
+            print(f"⚠ Draft failed for {row['customer_id']}: {type(exc).__name__}: {exc}")
+            return self.failed_packet(row, f"{type(exc).__name__}: {exc}")
+
+    @staticmethod
+    def failed_packet(row, error):
+        return {
+            "customer_id": row["customer_id"],
+            "name": row["name"],
+            "car_model": row["car_model"],
+            "status": "DRAFT_FAILED",
+            "error": error,
+        }
 
-        return [
-            self.build_action_packet(row)
-            for _, row in high_risk_df.iterrows()
-        ]
+    def high_risk_rows(self):
+        high_risk_df = self.df[self.df["churn_risk_bucket"] == "High"]
+        return [row for _, row in high_risk_df.iterrows()]
+
+    def create_sales_draft_packets(self, max_workers=1):
+        """
+        Draft packets for every high-risk customer, in row order.
+
+        max_workers > 1 drafts concurrently on a thread pool; rate limits
+        and retries are handled by the LLM writer (see its limiter).
+        """
+        return map_ordered(self._safe_action_packet, self.high_risk_rows(), max_workers)
+
+    def create_sales_draft_packets_batch(self, work_dir, backend=None, poll_interval=60, max_wait=None):
+        """
+        Nightly variant: all high-risk drafts go through the batch API in one
+        submission (see src.agent.batch). Re-running with the same work_dir
+        resumes the pending batch instead of submitting a new one.
+        """
+        from src.agent.batch import BatchDraftRun, OpenAIBatchBackend
+
+        backend = backend or OpenAIBatchBackend(self.llm.gateway.client)
+        run = BatchDraftRun(self, work_dir, backend, poll_interval=poll_interval, max_wait=max_wait)
+        return run.run()
 
     # ------------------------------------------------------------------
     # OPTIONAL: Gmail send (ONLY when button clicked)
@@ -1,31 +1,106 @@
-import os
-from openai import OpenAI
+import time
 
-client = OpenAI()
+from src.agent.concurrency import DEFAULT_MAX_RETRIES, estimate_tokens, retry_with_backoff
+from src.llm.gateway import get_gateway
+from src.llm.prompts import DEFAULT_PROMPT_BUDGET, TONE_STYLES, sales_email_template, tone_style
+from src.memory.llm_response_cache import LLMResponseCache, cache_key
+
+# Completion size assumed when charging the tokens-per-minute budget
+EXPECTED_EMAIL_TOKENS = 400
+
+EMAIL_TEMPERATURE = 0.3
 
 
 class LLMEmailWriter:
     """
     Generates tone-aware, persona-aware email drafts for salespeople.
+
+    gateway: LLMGateway to call (default: the shared src.llm gateway).
+    limiter: optional RateLimiter shared by concurrent callers.
+    cache: LLMResponseCache for identical prompts (default: a local SQLite
+    cache; pass False to disable).
+    prompt_budget: max input tokens per rendered prompt (see src.llm.prompts).
+    Transient API errors are retried with jittered backoff.
     """
 
-    def __init__(self, model: str = "gpt-4.1-mini"):
+    def __init__(self, model: str = "gpt-4.1-mini", gateway=None, limiter=None,
+                 max_retries=DEFAULT_MAX_RETRIES, cache=None, prompt_budget=DEFAULT_PROMPT_BUDGET):
         self.model = model
+        self.template = sales_email_template(prompt_budget, model)
+        self._gateway = gateway
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.cache = LLMResponseCache() if cache is None else cache
+
+    @property
+    def gateway(self):
+        return self._gateway or get_gateway()
+
+    def _acquire(self, messages):
+        if self.limiter is not None:
+            tokens = sum(estimate_tokens(m["content"]) for m in messages) + EXPECTED_EMAIL_TOKENS
+            self.limiter.acquire(tokens)
+
+    def _complete(self, messages, temperature, regenerate=False, timeout=None):
+        """
+        One chat completion, served from the response cache when the same
+        request was answered before; regenerate=True bypasses the lookup.
+        With a timeout the call is not retried, here or by the SDK: the
+        caller has a fallback.
+        """
+        def call():
+            self._acquire(messages)
+            kwargs = {"timeout": timeout, "max_retries": 0} if timeout is not None else {}
+            return self.gateway.chat_text(messages, self.model, temperature, tag="sales_email", **kwargs)
+
+        def create():
+            retries = 0 if timeout is not None else self.max_retries
+            return retry_with_backoff(call, max_retries=retries)
+
+        if not self.cache:
+            return create()
+
+        key = self.request_key(messages, temperature)
+        return self.cache.get_or_create(key, create, model=self.model, bypass=regenerate)
+
+    def _stream(self, messages, temperature, regenerate=False):
+        """
+        Streamed counterpart of _complete: yields text pieces. A cached
+        response is yielded in one piece; a fresh one is cached once the
+        stream has finished. Only opening the stream is retried.
+        """
+        key = self.request_key(messages, temperature) if self.cache else None
+        if key and not regenerate:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        def open_stream():
+            self._acquire(messages)
+            pieces = self.gateway.stream(messages, self.model, temperature, tag="sales_email")
+            return next(pieces, ""), pieces
+
+        first, pieces = retry_with_backoff(open_stream, max_retries=self.max_retries)
+        parts = [first]
+        yield first
+        for piece in pieces:
+            parts.append(piece)
+            yield piece
+
+        if key:
+            self.cache.put(key, "".join(parts).strip(), model=self.model)
 
     # ---------------------------------------------------------
     # Main Email Writer
     # ---------------------------------------------------------
-    def write_email(self, customer_info, reason, offer, language, tone):
-        """
-        customer_info: dict containing key customer attributes
-        reason: AI reason for contacting the customer
-        offer: AI-selected offer
-        """
+    def build_messages(self, customer_info, reason, offer, language, tone):
+        """Chat messages for one draft (also used to render batch requests)."""
 
         # Build “offer explanation” for the LLM
         offer_explanation = self._explain_offer(reason, offer)
 
-        prompt = self._build_prompt(
+        facts = self._facts(
             customer_info=customer_info,
             reason=reason,
             offer=offer,
@@ -33,18 +108,46 @@ class LLMEmailWriter:
             tone=tone,
             offer_explanation=offer_explanation
         )
+        return self.template.render(facts)
 
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system",
-                 "content": "You are a professional automotive retention email writer who explains offers clearly and tactfully."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
+    def request_key(self, messages, temperature=EMAIL_TEMPERATURE):
+        """Response-cache key of a rendered request."""
+        return cache_key(self.model, temperature, messages[0]["content"], messages[-1]["content"])
 
-        return response.choices[0].message.content.strip()
+    def write_email(self, customer_info, reason, offer, language, tone, regenerate=False, stats=None,
+                    timeout=None):
+        """
+        customer_info: dict containing key customer attributes
+        reason: AI reason for contacting the customer
+        offer: AI-selected offer
+        regenerate: skip the response cache and ask for a fresh draft
+        stats: optional dict filled with ttft_s / total_s (equal when not streamed)
+        timeout: per-request timeout in seconds (single attempt, no retries)
+        """
+        start = time.perf_counter()
+        messages = self.build_messages(customer_info, reason, offer, language, tone)
+        text = self._complete(messages, temperature=EMAIL_TEMPERATURE, regenerate=regenerate, timeout=timeout)
+
+        if stats is not None:
+            stats["total_s"] = stats["ttft_s"] = time.perf_counter() - start
+        return text
+
+    def stream_email(self, customer_info, reason, offer, language, tone, regenerate=False, stats=None):
+        """
+        write_email, but yields the draft piece by piece as tokens arrive.
+        stats: optional dict filled with ttft_s (first piece) and total_s.
+        """
+        start = time.perf_counter()
+        messages = self.build_messages(customer_info, reason, offer, language, tone)
+
+        for piece in self._stream(messages, EMAIL_TEMPERATURE, regenerate):
+            if stats is not None and "ttft_s" not in stats:
+                stats["ttft_s"] = time.perf_counter() - start
+            yield piece
+
+        if stats is not None:
+            stats.setdefault("ttft_s", time.perf_counter() - start)
+            stats["total_s"] = time.perf_counter() - start
 
     # ---------------------------------------------------------
     # OFFER EXPLANATION
@@ -96,69 +199,25 @@ class LLMEmailWriter:
         )
 
     # ---------------------------------------------------------
-    # Prompt Builder
+    # Prompt facts
     # ---------------------------------------------------------
-    def _build_prompt(self, customer_info, reason, offer, language, tone, offer_explanation):
+    def _facts(self, customer_info, reason, offer, language, tone, offer_explanation):
         """
-        Converts customer + persona context into an instruction suitable for the LLM.
+        Compact per-customer facts; all fixed instructions live in the
+        template's static system prefix (src.llm.prompts).
         """
-
-        name = customer_info["name"]
-        car = customer_info["car_model"]
-        days = customer_info["days_until_lease_end"]
         churn = customer_info["churn_risk_bucket"]
         score = customer_info["churn_risk_score"]
 
-        # Language rules
-        if language == "ar":
-            lang_instruction = "Write the entire email in professional Arabic."
-        elif language == "en":
-            lang_instruction = "Write the entire email in professional English."
-        else:
-            lang_instruction = (
-                "If the customer's nationality is from GCC (UAE, KSA, Oman, Qatar, Bahrain, Kuwait, Jordan, Egypt), "
-                "prefer Arabic. Otherwise write in professional English."
-            )
-
-        # Tone styles
-        tone_map = {
-            "direct": "short, clear, and urgency-focused",
-            "warm": "friendly, reassuring, and human",
-            "warm_consultative": "empathetic, advisory, and relationship-focused",
-            "informative": "clear, factual, benefit-driven",
-            "reassuring": "soft, supportive, calming, trust-building",
-            "neutral": "professional, simple, polite"
+        return {
+            "name": customer_info["name"],
+            "car": customer_info["car_model"],
+            "nationality": customer_info.get("nationality"),
+            "days_left": customer_info["days_until_lease_end"],
+            "churn": f"{churn} ({score:.2f})",
+            "reason": reason,
+            "offer": offer,
+            "why_offer": offer_explanation,
+            "tone": tone_style(tone, TONE_STYLES),
+            "language": language or "auto",
         }
-
-        tone_style = tone_map.get(tone, "professional and friendly")
-
-        return f"""
-You are writing a renewal email from an automotive sales team to a customer.
-
-### CUSTOMER DETAILS
-- Name: {name}
-- Car Model: {car}
-- Days until lease end: {days}
-- Churn risk: {churn} (score {score:.2f})
-
-### REASON FOR CONTACT
-{reason}
-
-### OFFER SELECTED
-{offer}
-
-### WHY THIS OFFER (EXPLANATION FOR YOU TO USE)
-{offer_explanation}
-Explain the offer benefits naturally in the email without sounding robotic.
-Do NOT mention that this reasoning comes from the system.
-
-### INSTRUCTIONS
-- Tone style: {tone_style}
-- {lang_instruction}
-- Highlight why the offer is valuable *based directly on the customer situation*.
-- Do NOT add fake financial numbers or unrealistic claims.
-- Keep the email concise, warm, and aligned with the persona.
-- End with a friendly invitation to contact the salesperson.
-
-Write the full email now.
-"""
@@ -0,0 +1,239 @@
+"""
+Declarative aggregation engine for the master customer table.
+
+An aggregation config maps each event table to its output columns:
+
+    {
+        "payments": {
+            "total_amount_paid": ("amount", "sum"),
+            "avg_late_days": ("late_days", "mean"),
+        },
+        "sales_interactions": {
+            "successful_sales_interactions": ("status", "count_eq", "Completed"),
+        },
+    }
+
+Supported kernels:
+    • sum       → sum of the column per customer
+    • count     → number of non-null values per customer
+    • mean      → sum / count of non-null values
+    • count_eq  → number of rows where column == value
+
+customer_id is encoded once as a categorical over the customer list
+(unsorted hash lookup). Every kernel is a single np.bincount over those
+codes, and the results are assembled by index alignment instead of a
+chain of merges. The same partial state (sums + counts) is used for
+in-memory tables and for chunked streaming from disk.
+"""
+import numpy as np
+import pandas as pd
+
+from src.data.chunked import DEFAULT_CHUNKSIZE, STREAMABLE_TABLES, read_table_chunks
+
+KERNELS = ("sum", "count", "mean", "count_eq")
+
+
+# ---------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------
+def customer_index(customers, key="customer_id"):
+    """Unique customer ids in first-seen order (no sorting)."""
+    return pd.Index(pd.unique(customers[key]), name=key)
+
+
+def encode_ids(values, index):
+    """Categorical codes of values against index (-1 for unknown ids)."""
+    return pd.Categorical(values, categories=index).codes.astype(np.int64)
+
+
+# ---------------------------------------------------------------------
+# Partial state: per-customer sums and counts
+# ---------------------------------------------------------------------
+def _kernel_inputs(df, col, how, value=None):
+    if how == "count_eq":
+        hits = (df[col] == value).to_numpy(dtype=bool, na_value=False)
+        return hits.astype(np.float64), np.ones(len(df), dtype=bool)
+
+    present = df[col].notna().to_numpy()
+    if how == "count":
+        return None, present
+
+    values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return values, present & ~np.isnan(values)
+
+
+def partial_state(df, aggs, index, key="customer_id"):
+    """
+    Reduce one table (or one chunk of it) to per-customer partial sums
+    and counts. Returns {column: ndarray} aligned with index.
+
+    "__rows" holds the number of rows per customer, so customers with no
+    rows at all can be told apart from customers with all-null values.
+    """
+    n = len(index)
+    codes = encode_ids(df[key], index)
+    known = codes >= 0
+    state = {"__rows": np.bincount(codes[known], minlength=n).astype(np.float64)}
+
+    for out, spec in aggs.items():
+        col, how = spec[0], spec[1]
+        if how not in KERNELS:
+            raise ValueError(f"Unsupported aggregate '{how}' for {out}")
+
+        values, valid = _kernel_inputs(df, col, how, *spec[2:])
+        mask = known & valid
+        state[f"{out}__n"] = np.bincount(codes[mask], minlength=n).astype(np.float64)
+
+        if values is not None:
+            state[f"{out}__sum"] = np.bincount(codes[mask], weights=values[mask], minlength=n)
+
+    return state
+
+
+def empty_state(aggs, n):
+    state = {"__rows": np.zeros(n)}
+    for out, spec in aggs.items():
+        state[f"{out}__n"] = np.zeros(n)
+        if spec[1] != "count":
+            state[f"{out}__sum"] = np.zeros(n)
+    return state
+
+
+def merge_states(left, right):
+    """Element-wise sum of two partial states (chunks, days, ...)."""
+    if left is None:
+        return right
+    return {col: left[col] + right[col] for col in left}
+
+
+def finalize_state(state, aggs):
+    """Turn partial sums / counts into the final aggregate columns."""
+    rows = state["__rows"]
+    no_rows = rows == 0
+    out = {}
+
+    for name, spec in aggs.items():
+        how = spec[1]
+        n = state[f"{name}__n"]
+
+        if how == "count":
+            values = n.copy()
+        elif how == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = state[f"{name}__sum"] / n
+            values[n == 0] = np.nan
+        else:  # sum, count_eq
+            values = state[f"{name}__sum"].copy()
+
+        values[no_rows] = np.nan
+        out[name] = values
+
+    return out
+
+
+def table_state(raw, name, aggs, index, stream_dir=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Partial state for one table, in memory or streamed in chunks."""
+    if stream_dir is not None and name in STREAMABLE_TABLES:
+        state = empty_state(aggs, len(index))
+        for chunk in read_table_chunks(stream_dir, name, chunksize):
+            state = merge_states(state, partial_state(chunk, aggs, index))
+        return state
+
+    return partial_state(raw[name], aggs, index)
+
+
+# ---------------------------------------------------------------------
+# Lease resolution: exactly one lease per customer
+# ---------------------------------------------------------------------
+def _as_datetime(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors="coerce")
+
+
+def select_current_leases(leases, as_of=None, key="customer_id"):
+    """
+    Pick one lease per customer: the lease active at as_of (latest
+    lease_end if several overlap), otherwise the most recent lease_end.
+
+    Scored and reduced with a single hash groupby (no sorting).
+    Also returns lease-history features per customer:
+        lease_count, first_lease_start
+    """
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    start = _as_datetime(leases["lease_start"])
+    end = _as_datetime(leases["lease_end"])
+
+    end_ns = end.to_numpy(dtype="datetime64[ns]").astype(np.int64)  # NaT → int64 min
+    active = ((start <= as_of) & (end >= as_of)).to_numpy(dtype=bool)
+    # active leases outrank every inactive one, then latest end wins
+    score = pd.Series(np.where(active, end_ns // 2 + (1 << 62), end_ns // 2), index=leases.index)
+
+    grouped = score.groupby(leases[key].to_numpy(), sort=False)
+    current = leases.loc[grouped.idxmax().to_numpy()].set_index(key)
+
+    history = pd.DataFrame({
+        "lease_count": leases.groupby(key, sort=False)[key].size(),
+        "first_lease_start": start.groupby(leases[key].to_numpy(), sort=False).min(),
+    })
+    return current, history
+
+
+def build_base(customers, leases, as_of=None, key="customer_id"):
+    """Customers (one row each) + their current lease + lease history."""
+    base = customers.drop_duplicates(key)
+    current, history = select_current_leases(leases, as_of, key)
+
+    base = base.join(current, on=key).join(history, on=key)
+    base["lease_count"] = base["lease_count"].fillna(0)
+    return base.reset_index(drop=True)
+
+
+# ---------------------------------------------------------------------
+# Master assembly
+# ---------------------------------------------------------------------
+def aggregate_customers(raw, config, index, stream_dir=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Run every aggregate in config. Returns a DataFrame indexed by
+    customer_id with one column per output, in config order.
+    """
+    columns = {}
+    for table, aggs in config.items():
+        state = table_state(raw, table, aggs, index, stream_dir, chunksize)
+        columns.update(finalize_state(state, aggs))
+
+    return pd.DataFrame(columns, index=index)
+
+
+def assemble_master(base, aggregates, fill_zero=(), key="customer_id"):
+    """Attach aggregate columns to base rows by index alignment."""
+    positions = aggregates.index.get_indexer(base[key])
+    block = aggregates.to_numpy()[positions] if len(aggregates.columns) else None
+
+    master = base.copy()
+    for i, col in enumerate(aggregates.columns):
+        values = block[:, i].copy()
+        values[positions < 0] = np.nan
+        master[col] = values
+
+    fill = {col: 0 for col in fill_zero if col in master.columns}
+    return master.fillna(fill) if fill else master
+
+
+def build_master(raw, config, fill_zero=(), stream_dir=None, chunksize=DEFAULT_CHUNKSIZE, as_of=None):
+    """
+    Build the master customer table from a declarative aggregation config.
+    One row per customer: only the current lease is joined (see
+    select_current_leases).
+
+    raw: dict of tables (customers + leases required; streamable tables
+         may be omitted when stream_dir is given).
+    as_of: date used to decide which lease is active (default: today).
+    """
+    customers = raw["customers"]
+    index = customer_index(customers)
+
+    base = build_base(customers, raw["leases"], as_of)
+    aggregates = aggregate_customers(raw, config, index, stream_dir, chunksize)
+
+    return assemble_master(base, aggregates, fill_zero)
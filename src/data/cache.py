@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (parquet engine)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# Bump whenever load/clean logic changes the shape or dtypes of a table,
+# so every cached entry built by older code becomes stale.
+CLEAN_SCHEMA_VERSION = 4
+
+
+class DatasetCache:
+    """
+    On-disk columnar cache for raw and cleaned CSV tables.
+
+    Each table is stored as Parquet next to a small JSON manifest holding
+    the source fingerprint (size, mtime, sha256) and the schema version.
+
+    Lookup order:
+        1. size + mtime match the manifest      → hit, no hashing needed
+        2. content hash matches (file touched)  → hit, manifest refreshed
+        3. anything else                        → rebuild, old entry evicted
+    """
+
+    def __init__(self, cache_dir, force_rebuild=False, schema_version=CLEAN_SCHEMA_VERSION):
+        self.cache_dir = cache_dir
+        self.force_rebuild = force_rebuild
+        self.schema_version = schema_version
+        self.enabled = HAS_PYARROW
+
+        if not self.enabled:
+            print("⚠ pyarrow not installed — dataset cache disabled.")
+
+    # --------------------------------------------------------
+    # Fingerprinting
+    # --------------------------------------------------------
+    @staticmethod
+    def file_hash(path, block_size=1 << 20):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_key(self, content_hash, stage):
+        raw = f"{content_hash}:{stage}:{self.schema_version}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _stage_dir(self, stage):
+        path = os.path.join(self.cache_dir, stage)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _manifest_path(self, stage, name):
+        return os.path.join(self._stage_dir(stage), f"{name}.json")
+
+    def _data_path(self, stage, name, key):
+        return os.path.join(self._stage_dir(stage), f"{name}-{key}.parquet")
+
+    # --------------------------------------------------------
+    # Manifest helpers
+    # --------------------------------------------------------
+    def _read_manifest(self, stage, name):
+        path = self._manifest_path(stage, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, stage, name, manifest):
+        with open(self._manifest_path(stage, name), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def _evict_stale(self, stage, name, keep_key):
+        """Remove every cached file for this table except the current entry."""
+        prefix = f"{name}-"
+        for fname in os.listdir(self._stage_dir(stage)):
+            if fname.startswith(prefix) and fname.endswith(".parquet") and fname != f"{name}-{keep_key}.parquet":
+                os.remove(os.path.join(self._stage_dir(stage), fname))
+
+    # --------------------------------------------------------
+    # Main entry point
+    # --------------------------------------------------------
+    def get_or_build(self, name, source_path, stage, build_fn):
+        """
+        Return the cached table for source_path, or call build_fn() and
+        cache its result. stage separates "raw" and "clean" entries.
+        """
+        if not self.enabled:
+            return build_fn()
+
+        stat = os.stat(source_path)
+        manifest = None if self.force_rebuild else self._read_manifest(stage, name)
+
+        if manifest and manifest.get("schema_version") == self.schema_version:
+            data_path = self._data_path(stage, name, manifest["key"])
+
+            if os.path.exists(data_path):
+                if manifest["size"] == stat.st_size and manifest["mtime_ns"] == stat.st_mtime_ns:
+                    return pd.read_parquet(data_path)
+
+                if manifest["size"] == stat.st_size and manifest["sha256"] == self.file_hash(source_path):
+                    manifest["mtime_ns"] = stat.st_mtime_ns
+                    self._write_manifest(stage, name, manifest)
+                    return pd.read_parquet(data_path)
+
+        # Miss → rebuild and replace the entry
+        df = build_fn()
+        content_hash = self.file_hash(source_path)
+        key = self._entry_key(content_hash, stage)
+
+        try:
+            df.to_parquet(self._data_path(stage, name, key), index=False)
+        except Exception as e:  # mixed-type object columns etc.
+            print(f"⚠ Could not cache {stage}/{name}: {e}")
+            return df
+
+        self._write_manifest(stage, name, {
+            "key": key,
+            "source": os.path.abspath(source_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": content_hash,
+            "schema_version": self.schema_version,
+        })
+        self._evict_stale(stage, name, key)
+
+        return df
@@ -0,0 +1,17 @@
+from src.data.clean import clean_table
+from src.data.load import DATE_FORMAT, read_table, table_path
+
+# Tables that can be aggregated straight from disk, chunk by chunk.
+STREAMABLE_TABLES = ("payments", "service_history", "call_center")
+
+DEFAULT_CHUNKSIZE = 250_000
+
+
+def read_table_chunks(base_path, name, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield cleaned chunks of a raw table without ever holding the whole
+    file in memory.
+    """
+    reader = read_table(table_path(base_path, name), name, chunksize=chunksize)
+    for chunk in reader:
+        yield clean_table(name, chunk, date_format=DATE_FORMAT)
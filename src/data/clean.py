@@ -1,10 +1,40 @@
+import re
+import unicodedata
+
 import pandas as pd
 import numpy as np
 
-def clean_dates(df, columns):
-    """Convert messy strings into datetime, force errors to NaT."""
+# Low-cardinality label columns stored as pandas categoricals after cleaning
+CATEGORICAL_COLUMNS = {
+    "nationality", "segment", "acquisition_source", "status", "interaction_type",
+}
+
+# Arabic harakat / superscript alef, tatweel, and invisible bidi / BOM marks
+ARABIC_DIACRITICS = re.compile("[\u064B-\u065F\u0670]")
+INVISIBLE_MARKS = re.compile("[\u200B\u200E\u200F\u202A-\u202E\u2066-\u2069\uFEFF]")
+ARABIC_LETTER_MAP = str.maketrans({
+    "\u0640": "",        # tatweel (kashida)
+    "\u06CC": "\u064A",  # Persian yeh → Arabic yeh
+    "\u06A9": "\u0643",  # Persian kaf → Arabic kaf
+})
+
+def clean_dates(df, columns, date_format=None):
+    """
+    Convert messy strings into datetime, force errors to NaT.
+
+    With an explicit date_format pandas skips format inference; values that
+    do not match it fall back to the inferring parser so nothing is lost.
+    """
     for col in columns:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
+        if date_format is None:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+            continue
+
+        parsed = pd.to_datetime(df[col], format=date_format, errors="coerce")
+        retry = parsed.isna() & df[col].notna()
+        if retry.any():
+            parsed[retry] = pd.to_datetime(df.loc[retry, col], errors="coerce")
+        df[col] = parsed
     return df
 
 
@@ -15,11 +45,53 @@ def clean_numeric(df, columns):
     return df
 
 
-def clean_text(df, columns):
-    """Strip whitespace, unify text formatting."""
+def normalize_arabic_name(value):
+    """
+    Arabic-aware normalization for person names: folds presentation forms
+    (NFKC), drops diacritics and tatweel, unifies Persian yeh/kaf.
+    Letter spelling (e.g. hamza on alef) is kept as written.
+    """
+    value = unicodedata.normalize("NFKC", value)
+    value = ARABIC_DIACRITICS.sub("", value)
+    return value.translate(ARABIC_LETTER_MAP)
+
+
+def _normalize_uniques(uniques, arabic=False):
+    values = pd.Series(uniques.astype(str), dtype=object)
+    values = values.str.replace(INVISIBLE_MARKS, "", regex=True)
+
+    if arabic:
+        values = values.map(normalize_arabic_name)
+
+    values = values.str.strip().str.replace(r"\s+", " ", regex=True)
+    # literal "nan" strings in the exports are treated as missing
+    return values.where(values != "nan")
+
+
+def clean_text(df, columns, arabic_columns=(), categorical_columns=CATEGORICAL_COLUMNS):
+    """
+    Strip whitespace, unify text formatting.
+
+    Work is done once per distinct value: factorize → normalize the
+    uniques → take back. Missing values stay missing. Columns listed in
+    categorical_columns come back as pandas categoricals.
+    """
     for col in columns:
-        df[col] = df[col].astype(str).str.strip().str.replace("\s+", " ", regex=True)
-        df[col] = df[col].replace("nan", np.nan)
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+        normalized = _normalize_uniques(uniques, arabic=col in arabic_columns)
+
+        # normalization can merge uniques ("Gold " / "Gold") → re-factorize
+        final_codes, labels = pd.factorize(normalized, use_na_sentinel=True)
+        codes = np.where(codes >= 0, final_codes[np.maximum(codes, 0)], -1)
+
+        if col in categorical_columns:
+            values = pd.Categorical.from_codes(codes, categories=labels)
+        else:
+            values = np.asarray(labels, dtype=object).take(np.maximum(codes, 0)) if len(labels) else \
+                np.full(len(codes), np.nan, dtype=object)
+            values[codes < 0] = np.nan
+
+        df[col] = pd.Series(values, index=df.index)
     return df
 
 
@@ -47,50 +119,62 @@ def normalize_car_models(df):
     return df
 
 
-def clean_dataset(datasets):
-    """Apply cleaning pipeline to all datasets."""
+# ---------------------------------------------------------------------
+# Per-table cleaners (each one can run on its own worker)
+# ---------------------------------------------------------------------
+def clean_customers(customers, date_format=None):
+    customers = clean_text(
+        customers, ["name", "nationality", "segment", "acquisition_source"], arabic_columns=["name"]
+    )
+    return remove_duplicates(customers, ["customer_id"])
 
-    # Customers
-    customers = datasets["customers"].copy()
-    customers = clean_text(customers, ["name", "nationality", "segment", "acquisition_source"])
-    customers = remove_duplicates(customers, ["customer_id"])
 
-    # Leases
-    leases = datasets["leases"].copy()
-    leases = clean_dates(leases, ["lease_start", "lease_end"])
+def clean_leases(leases, date_format=None):
+    leases = clean_dates(leases, ["lease_start", "lease_end"], date_format)
     leases = clean_numeric(leases, ["monthly_payment"])
-    leases = normalize_car_models(leases)
+    return normalize_car_models(leases)
+
 
-    # Service
-    service = datasets["service_history"].copy()
-    service = clean_dates(service, ["service_date"])
-    service = clean_numeric(service, ["amount_billed", "satisfaction_score"])
+def clean_service_history(service, date_format=None):
+    service = clean_dates(service, ["service_date"], date_format)
+    return clean_numeric(service, ["amount_billed", "satisfaction_score"])
 
-    # Payments
-    payments = datasets["payments"].copy()
-    payments = clean_dates(payments, ["payment_date"])
-    payments = clean_numeric(payments, ["amount", "late_days"])
 
-    # Complaints
-    complaints = datasets["complaints"].copy()
-    complaints = clean_text(complaints, ["issue", "status"])
+def clean_payments(payments, date_format=None):
+    payments = clean_dates(payments, ["payment_date"], date_format)
+    return clean_numeric(payments, ["amount", "late_days"])
 
-    # Call Center
-    call = datasets["call_center"].copy()
+
+def clean_complaints(complaints, date_format=None):
+    return clean_text(complaints, ["issue", "status"])
+
+
+def clean_call_center(call, date_format=None):
     call = clean_numeric(call, ["call_duration_min", "satisfaction_score"])
-    call = clean_text(call, ["issue", "resolution", "notes"])
-
-    # Sales
-    sales = datasets["sales_interactions"].copy()
-    sales = clean_dates(sales, ["interaction_date"])
-    sales = clean_text(sales, ["salesperson", "interaction_type"])
-
-    return {
-        "customers": customers,
-        "leases": leases,
-        "service_history": service,
-        "payments": payments,
-        "complaints": complaints,
-        "call_center": call,
-        "sales_interactions": sales
-    }
+    return clean_text(call, ["issue", "resolution", "notes"])
+
+
+def clean_sales_interactions(sales, date_format=None):
+    sales = clean_dates(sales, ["interaction_date"], date_format)
+    return clean_text(sales, ["salesperson", "interaction_type"])
+
+
+CLEANERS = {
+    "customers": clean_customers,
+    "leases": clean_leases,
+    "service_history": clean_service_history,
+    "payments": clean_payments,
+    "complaints": clean_complaints,
+    "call_center": clean_call_center,
+    "sales_interactions": clean_sales_interactions,
+}
+
+
+def clean_table(name, df, date_format=None):
+    """Clean a single raw table by name (works on a copy)."""
+    return CLEANERS[name](df.copy(), date_format=date_format)
+
+
+def clean_dataset(datasets):
+    """Apply cleaning pipeline to all datasets."""
+    return {name: clean_table(name, datasets[name]) for name in CLEANERS}
@@ -0,0 +1,464 @@
+"""
+Incremental master / featured rebuild from watermarked deltas.
+
+The first run does a full build and persists, under state_dir:
+    • state.parquet       per-customer partial sums / counts of every aggregate
+    • watermarks.json     latest date folded in per dated event table
+    • seen_<table>.parquet ids already folded in for id-keyed tables; for
+                          dated tables, content hashes (with counts) of the
+                          rows dated within late_days of the watermark
+    • base_hash.parquet   fingerprint of each customer's profile + lease rows
+    • master.parquet / featured.parquet / scores.parquet
+
+Every save writes a fresh generation directory and then atomically
+replaces manifest.json, which points at it: a crash mid-save leaves the
+previous run's state intact, never a mix of two runs.
+
+Later runs only fold in event rows not seen before: an unseen id, or for
+dated tables a row dated after watermark - late_days whose content hash
+was not folded in yet. Rows arriving a few days late are still counted
+(identical rows are tracked as a multiset); only rows in that overlap
+window are hashed, so the seen state stays bounded. Rows dated before it
+are taken as folded in. The aggregates and churn/lease features are then
+recomputed for the customer_ids those rows touch. Everybody else is
+copied over as-is.
+
+The churn/lease feature stage is pinned to an as-of date. When that date
+moves between runs, its vectorized output is refreshed for every stored
+master row (cheap); aggregates are still only recomputed for touched ids.
+
+With windows set, the rolling window features (src.features.window_features)
+are recomputed for every customer on each run, from the rows of the
+widest window collected during the same table scans, so incremental and
+full runs produce the same featured columns.
+"""
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import (
+    build_base,
+    customer_index,
+    empty_state,
+    finalize_state,
+    merge_states,
+    partial_state,
+)
+from src.data.chunked import DEFAULT_CHUNKSIZE, read_table_chunks
+from src.data.load import load_and_clean_datasets, update_featured_scores
+from src.features.churn_features import add_churn_and_lease_features, resolve_as_of
+from src.features.window_features import WINDOW_TABLES, add_window_features, window_event_rows
+from src.models.churn_model import CachedChurnScorer
+
+# table → ("date", column) or ("id", column)
+WATERMARKS = {
+    "payments": ("date", "payment_date"),
+    "service_history": ("date", "service_date"),
+    "sales_interactions": ("date", "interaction_date"),
+    "complaints": ("id", "ticket_id"),
+    "call_center": ("id", "call_id"),
+}
+
+# Dated rows may arrive up to this many days behind the newest row folded in
+DEFAULT_LATE_DAYS = 14
+
+# Bumped when the layout of the persisted state changes (forces a full build)
+STATE_VERSION = 2
+MANIFEST = "manifest.json"
+
+
+class IncrementalMasterBuilder:
+    """
+    Keeps the master + featured datasets up to date from daily deltas.
+
+    config / fill_zero: aggregation config of the master table
+    (e.g. src.data.transform.MASTER_AGGS / FILL_ZERO).
+    churn_model: optional ChurnModel; only customers whose model inputs
+    changed since the last run are rescored.
+    publish_path: optional persisted featured CSV (+ .arrow) that receives
+    the rescored churn_prob / churn_risk_bucket values.
+    late_days: overlap window behind each date watermark in which late
+    rows are still picked up.
+    windows: rolling window lengths in days (e.g. window_features.WINDOWS)
+    to add window features to the featured frame; None skips them.
+    """
+
+    def __init__(self, state_dir, config, fill_zero=(), chunksize=DEFAULT_CHUNKSIZE,
+                 churn_model=None, publish_path=None, late_days=DEFAULT_LATE_DAYS, windows=None):
+        missing = [table for table in config if table not in WATERMARKS]
+        if missing:
+            raise ValueError(f"No watermark defined for tables: {missing}")
+
+        self.state_dir = state_dir
+        self.config = config
+        self.fill_zero = list(fill_zero)
+        self.chunksize = chunksize
+        self.churn_model = churn_model
+        self.publish_path = publish_path
+        self.late_days = late_days
+        self.windows = tuple(windows) if windows else ()
+        os.makedirs(state_dir, exist_ok=True)
+        self.generation = self._read_manifest()
+
+    # --------------------------------------------------------
+    # Paths
+    # --------------------------------------------------------
+    def _read_manifest(self):
+        """Generation directory of the last complete save, or None."""
+        path = os.path.join(self.state_dir, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != STATE_VERSION:
+            return None
+        return manifest["generation"]
+
+    def _path(self, name, generation=None):
+        return os.path.join(self.state_dir, generation or self.generation, name)
+
+    def has_state(self):
+        return self.generation is not None and os.path.isdir(os.path.join(self.state_dir, self.generation))
+
+    # --------------------------------------------------------
+    # State (de)serialisation
+    # --------------------------------------------------------
+    def _state_to_frame(self, states, index):
+        columns = {
+            f"{table}:{col}": values
+            for table, state in states.items()
+            for col, values in state.items()
+        }
+        return pd.DataFrame(columns, index=index)
+
+    def _state_matches(self, frame):
+        """True when a stored state holds every column of the current config."""
+        expected = {
+            f"{table}:{col}"
+            for table, aggs in self.config.items()
+            for col in empty_state(aggs, 0)
+        }
+        return expected.issubset(frame.columns)
+
+    def _state_from_frame(self, frame, index):
+        frame = frame.reindex(index, fill_value=0.0)
+        states = {}
+        for table, aggs in self.config.items():
+            template = empty_state(aggs, len(index))
+            states[table] = {
+                col: frame[f"{table}:{col}"].to_numpy(dtype=np.float64).copy()
+                for col in template
+            }
+        return states
+
+    # --------------------------------------------------------
+    # Deltas
+    # --------------------------------------------------------
+    def _base_rows(self, clean, as_of):
+        return build_base(clean["customers"], clean["leases"], as_of)
+
+    @staticmethod
+    def _base_hash(base):
+        """One order-independent fingerprint per customer (xor of row hashes)."""
+        row_hash = pd.util.hash_pandas_object(base, index=False).to_numpy()
+        ids = base["customer_id"].to_numpy()
+        order = np.argsort(ids, kind="stable")
+        ids, row_hash = ids[order], row_hash[order]
+
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        return pd.Series(
+            np.bitwise_xor.reduceat(row_hash, starts) if len(starts) else row_hash,
+            index=pd.Index(ids[starts], name="customer_id"),
+            name="hash",
+        )
+
+    def _row_hashes(self, table, rows):
+        """Content hash of the columns a dated table contributes (key, date, aggregated columns)."""
+        _, col = WATERMARKS[table]
+        columns = ["customer_id", col] + [spec[0] for spec in self.config[table].values()]
+        columns = [c for c in dict.fromkeys(columns) if c in rows.columns]
+        return pd.Series(pd.util.hash_pandas_object(rows[columns], index=False).to_numpy())
+
+    @staticmethod
+    def _unseen(hashes, counts):
+        """
+        Mask of rows not folded in yet. The k-th copy of a row in this scan
+        is new when earlier runs counted fewer than k copies of it.
+        """
+        occurrence = hashes.groupby(hashes).cumcount().to_numpy()
+        return occurrence >= counts.reindex(hashes, fill_value=0).to_numpy(dtype=np.int64)
+
+    def _window_start(self, table, watermarks):
+        """Oldest date still checked against the seen hashes (None = no watermark yet)."""
+        mark = watermarks.get(table)
+        return None if mark is None else pd.Timestamp(mark) - pd.Timedelta(days=self.late_days)
+
+    def _collect_window_rows(self, table, chunk, as_of, recent):
+        """Keep the rows of a scanned chunk that the window features need."""
+        if not self.windows or table not in WINDOW_TABLES:
+            return
+        rows = window_event_rows(table, chunk, as_of, self.windows)
+        if rows is not None:
+            recent.setdefault(table, []).append(rows)
+
+    def _add_window_features(self, featured, customers, as_of, recent):
+        tables = {"customers": customers}
+        for table, parts in recent.items():
+            tables[table] = window_event_rows(table, pd.concat(parts, ignore_index=True), as_of, self.windows)
+        return add_window_features(featured, tables, as_of, self.windows)
+
+    def _new_rows(self, base_path, table, watermarks, seen, as_of=None, recent=None):
+        """Stream a table and keep only rows not folded in by earlier runs."""
+        kind, col = WATERMARKS[table]
+        start = self._window_start(table, watermarks) if kind == "date" else None
+        parts = []
+
+        for chunk in read_table_chunks(base_path, table, self.chunksize):
+            if recent is not None:
+                self._collect_window_rows(table, chunk, as_of, recent)
+            if col not in chunk.columns:
+                continue
+            if kind == "id":
+                keep = chunk[col].notna() & ~chunk[col].astype(str).isin(seen[table])
+            elif start is not None:
+                # undated rows are always checked (they are kept in the seen state for good)
+                keep = chunk[col].isna() | (chunk[col] >= start)
+            else:
+                keep = slice(None)
+            parts.append(chunk[keep])
+
+        if not parts:
+            return None
+        rows = pd.concat(parts, ignore_index=True)
+        if kind == "date":
+            # one dedup per run over the overlap window, not per chunk
+            rows = rows[self._unseen(self._row_hashes(table, rows), seen[table]["count"])]
+        return rows
+
+    def _advance_watermarks(self, table, rows, watermarks, seen):
+        kind, col = WATERMARKS[table]
+        if rows is None or col not in rows.columns or rows.empty:
+            return
+        if kind == "id":
+            seen[table] = seen[table].union(rows[col].astype(str))
+            return
+
+        latest = rows[col].max()
+        previous = watermarks.get(table)
+        if pd.notna(latest) and (previous is None or latest > pd.Timestamp(previous)):
+            watermarks[table] = latest.isoformat()
+
+        # only rows inside the overlap window need a hash
+        start = self._window_start(table, watermarks)
+        if start is not None:
+            rows = rows[rows[col].isna() | (rows[col] >= start)]
+        added = pd.DataFrame(
+            {"date": rows[col].to_numpy(), "count": np.ones(len(rows), dtype=np.int64)},
+            index=self._row_hashes(table, rows).to_numpy(),
+        )
+        merged = pd.concat([seen[table], added]).groupby(level=0).agg({"date": "first", "count": "sum"})
+        if start is not None:
+            merged = merged[merged["date"].isna() | (merged["date"] >= start)]
+        seen[table] = merged
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+    @staticmethod
+    def _empty_seen(kind):
+        if kind == "date":
+            return pd.DataFrame(
+                {"date": pd.Series(dtype="datetime64[ns]"), "count": pd.Series(dtype=np.int64)},
+                index=pd.Index([], dtype=np.uint64),
+            )
+        return pd.Index([], dtype=object)
+
+    def _load_seen(self):
+        seen = {}
+        for table, (kind, _) in WATERMARKS.items():
+            path = self._path(f"seen_{table}.parquet") if self.has_state() else None
+            if path is None or not os.path.exists(path):
+                seen[table] = self._empty_seen(kind)
+            elif kind == "date":
+                seen[table] = pd.read_parquet(path).set_index("hash").rename_axis(None)
+            else:
+                seen[table] = pd.Index(pd.read_parquet(path)["id"])
+        return seen
+
+    def _save(self, states, index, watermarks, seen, base_hash, master, featured, scores=None):
+        """Write a new generation, then switch manifest.json to it (atomic)."""
+        generation = f"run-{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.state_dir, generation))
+
+        def path(name):
+            return self._path(name, generation)
+
+        self._state_to_frame(states, index).to_parquet(path("state.parquet"))
+        base_hash.to_frame().to_parquet(path("base_hash.parquet"))
+        master.to_parquet(path("master.parquet"), index=False)
+        featured.to_parquet(path("featured.parquet"), index=False)
+        if scores is not None:
+            scores.to_parquet(path("scores.parquet"))
+
+        for table, values in seen.items():
+            if isinstance(values, pd.DataFrame):
+                frame = values.rename_axis("hash").reset_index()
+            else:
+                frame = pd.DataFrame({"id": values.astype(str)})
+            frame.to_parquet(path(f"seen_{table}.parquet"), index=False)
+
+        with open(path("watermarks.json"), "w", encoding="utf-8") as f:
+            json.dump(watermarks, f, indent=2)
+
+        manifest = os.path.join(self.state_dir, MANIFEST)
+        with open(manifest + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "generation": generation}, f)
+        os.replace(manifest + ".tmp", manifest)
+
+        self.generation = generation
+        # the previous generation, and any left behind by an interrupted save
+        for name in os.listdir(self.state_dir):
+            if name.startswith("run-") and name != generation:
+                shutil.rmtree(os.path.join(self.state_dir, name), ignore_errors=True)
+
+    # --------------------------------------------------------
+    # Build
+    # --------------------------------------------------------
+    def _assemble(self, base, states, index, ids):
+        """Master rows for the given customer ids only."""
+        positions = index.get_indexer(ids)
+        columns = {}
+        for table, aggs in self.config.items():
+            sub = {col: values[positions] for col, values in states[table].items()}
+            columns.update(finalize_state(sub, aggs))
+        aggregates = pd.DataFrame(columns, index=pd.Index(ids, name="customer_id"))
+
+        rows = base[base["customer_id"].isin(ids)]
+        master = rows.join(aggregates, on="customer_id")
+        fill = {col: 0 for col in self.fill_zero if col in master.columns}
+        return master.fillna(fill) if fill else master
+
+    def _scorer(self, full, rescore_all):
+        if self.churn_model is None:
+            return None
+        previous = None
+        if not (full or rescore_all) and os.path.exists(self._path("scores.parquet")):
+            previous = pd.read_parquet(self._path("scores.parquet"))
+        return CachedChurnScorer(self.churn_model, previous)
+
+    def _publish_scores(self, scorer, featured):
+        """Write rescored rows back to publish_path."""
+        ids = pd.Index(featured["customer_id"])
+        rescored = scorer.rescored_ids.intersection(ids)
+        print(f"🎯 Rescored churn for {len(rescored)} of {len(ids)} customers.")
+        if self.publish_path and os.path.exists(self.publish_path) and len(rescored):
+            scores = featured.set_index("customer_id").loc[rescored, ["churn_prob", "churn_risk_bucket"]]
+            updated = update_featured_scores(self.publish_path, scores)
+            print(f"💾 Wrote {updated} updated scores to {self.publish_path}")
+
+    def update(self, base_path, as_of=None, rescore_all=False):
+        """
+        Bring the persisted master / featured datasets up to date with the
+        CSVs in base_path. Returns (featured, touched_customer_ids).
+
+        as_of: reference date for lease selection and features (default today).
+        rescore_all: ignore stored feature hashes and rescore every customer
+        (e.g. after retraining the churn model from scratch).
+        """
+        as_of = resolve_as_of(as_of)
+        small = load_and_clean_datasets(base_path, tables=["customers", "leases"])
+        base = self._base_rows(small, as_of)
+        index = customer_index(small["customers"])
+        base_hash = self._base_hash(base)
+
+        full = not self.has_state()
+        watermarks = {}
+        seen = self._load_seen()
+
+        if not full:
+            frame = pd.read_parquet(self._path("state.parquet"))
+            if not self._state_matches(frame):
+                print("⚠ Aggregation config changed since the last run.")
+                full = True
+
+        if full:
+            print("🧱 No incremental state found — running full build...")
+            states = {table: empty_state(aggs, len(index)) for table, aggs in self.config.items()}
+            seen = {table: self._empty_seen(WATERMARKS[table][0]) for table in seen}
+        else:
+            with open(self._path("watermarks.json"), "r", encoding="utf-8") as f:
+                watermarks = json.load(f)
+            states = self._state_from_frame(frame, index)
+
+        scorer = self._scorer(full, rescore_all)
+        touched = set()
+        recent = {}  # table → rows the window features need
+
+        # 1. Fold new event rows into the per-customer state
+        for table, aggs in self.config.items():
+            if full:
+                for chunk in read_table_chunks(base_path, table, self.chunksize):
+                    states[table] = merge_states(states[table], partial_state(chunk, aggs, index))
+                    self._advance_watermarks(table, chunk, watermarks, seen)
+                    self._collect_window_rows(table, chunk, as_of, recent)
+                continue
+
+            rows = self._new_rows(base_path, table, watermarks, seen, as_of, recent)
+            if rows is None or rows.empty:
+                continue
+            states[table] = merge_states(states[table], partial_state(rows, aggs, index))
+            self._advance_watermarks(table, rows, watermarks, seen)
+            touched.update(rows["customer_id"].dropna().unique())
+            print(f"➕ {table}: {len(rows)} new rows")
+
+        # 2. Customers whose profile / lease rows changed (or are new)
+        if full:
+            touched = set(index)
+        else:
+            old_hash = pd.read_parquet(self._path("base_hash.parquet"))["hash"]
+            changed = base_hash.ne(old_hash.reindex(base_hash.index))
+            touched.update(base_hash.index[changed.to_numpy()])
+
+        touched_ids = [cid for cid in index if cid in touched]
+
+        # 3. Recompute master + features for touched customers only
+        master_rows = self._assemble(base, states, index, touched_ids)
+        featured_rows = add_churn_and_lease_features(master_rows, as_of, model=scorer) if len(master_rows) else master_rows
+
+        if full:
+            master, featured = master_rows, featured_rows
+        else:
+            keep = list(index)
+            old_master = pd.read_parquet(self._path("master.parquet"))
+            old_featured = pd.read_parquet(self._path("featured.parquet"))
+
+            def patch(old, new):
+                old = old[old["customer_id"].isin(keep) & ~old["customer_id"].isin(touched_ids)]
+                return pd.concat([old, new], ignore_index=True)
+
+            master = patch(old_master, master_rows)
+
+            if watermarks.get("__as_of") != as_of.isoformat():
+                print(f"📅 As-of date moved to {as_of.date()} — refreshing lease timing features.")
+                featured = add_churn_and_lease_features(master, as_of, model=scorer)
+            else:
+                featured = patch(old_featured, featured_rows)
+
+        if self.windows:
+            featured = self._add_window_features(featured, small["customers"], as_of, recent)
+
+        watermarks["__as_of"] = as_of.isoformat()
+
+        scores = None
+        if scorer is not None:
+            scores = scorer.scores[scorer.scores.index.isin(featured["customer_id"])]
+        self._save(states, index, watermarks, seen, base_hash, master, featured, scores)
+        if scorer is not None:
+            self._publish_scores(scorer, featured)
+        print(f"✅ Incremental update: {len(touched_ids)} of {len(index)} customers recomputed.")
+
+        return featured, touched_ids
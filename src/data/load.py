@@ -1,29 +1,343 @@
 import pandas as pd
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def load_datasets(base_path):
+from src.data.cache import DatasetCache
+from src.data.clean import clean_table
+from src.data.optimize import arrow_string_dtype, compact_dtypes
+
+# ---------------------------------------------------------------------
+# Raw table schemas
+# ---------------------------------------------------------------------
+# Explicit dtypes let read_csv skip type inference. Date columns are read
+# as plain strings and parsed once with DATE_FORMAT during cleaning.
+# Numeric columns are listed separately: exports sometimes contain junk
+# ("N/A", "-") in them, so they are only forced when the file is clean.
+DATE_FORMAT = "ISO8601"
+
+TABLE_SCHEMAS = {
+    "customers": {
+        "text": ["customer_id", "name", "nationality", "segment", "loyalty_tier",
+                 "email", "phone", "acquisition_source"],
+        "numeric": ["age"],
+        "dates": [],
+    },
+    "leases": {
+        "text": ["customer_id", "car_model"],
+        "numeric": ["monthly_payment"],
+        "dates": ["lease_start", "lease_end"],
+    },
+    "service_history": {
+        "text": ["customer_id", "service_type"],
+        "numeric": ["amount_billed", "warranty_claim", "satisfaction_score"],
+        "dates": ["service_date"],
+    },
+    "payments": {
+        "text": ["customer_id"],
+        "numeric": ["amount", "missed_payment", "late_days"],
+        "dates": ["payment_date"],
+    },
+    "complaints": {
+        "text": ["ticket_id", "customer_id", "issue", "status"],
+        "numeric": [],
+        "dates": [],
+    },
+    "call_center": {
+        "text": ["call_id", "customer_id", "issue", "resolution", "notes"],
+        "numeric": ["call_duration_min", "satisfaction_score"],
+        "dates": [],
+    },
+    "sales_interactions": {
+        "text": ["customer_id", "salesperson", "interaction_type", "status"],
+        "numeric": [],
+        "dates": ["interaction_date"],
+    },
+}
+
+
+def table_path(base_path, name):
+    return os.path.join(base_path, f"{name}.csv")
+
+
+def _coerce_numeric(df, columns):
+    """Numeric schema columns read as text → float, junk → NaN."""
+    for col in columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def _coerced_chunks(reader, columns):
+    with reader:
+        for chunk in reader:
+            yield _coerce_numeric(chunk, columns)
+
+
+def read_table(path, name, chunksize=None, **kwargs):
+    """
+    Read one raw CSV using its explicit schema.
+
+    Falls back to reading numeric columns as text and coercing them (junk
+    becomes NaN) when the file contains values that do not parse as numbers.
+
+    With chunksize, returns an iterator of chunks. A lazy reader only hits
+    bad values while iterating, so chunks always read numeric columns as
+    text and coerce them one chunk at a time.
+    """
+    schema = TABLE_SCHEMAS[name]
+    dtype = {col: "str" for col in schema["text"] + schema["dates"]}
+    numeric = {col: "float64" for col in schema["numeric"]}
+
+    if chunksize is not None:
+        reader = pd.read_csv(path, encoding="utf-8-sig", dtype=dtype, chunksize=chunksize, **kwargs)
+        return _coerced_chunks(reader, schema["numeric"])
+
+    try:
+        return pd.read_csv(path, encoding="utf-8-sig", dtype={**dtype, **numeric}, **kwargs)
+    except ValueError:
+        df = pd.read_csv(path, encoding="utf-8-sig", dtype=dtype, **kwargs)
+        return _coerce_numeric(df, schema["numeric"])
+
+
+def table_names(tables=None):
+    """Requested table names (default: all), validated against TABLE_SCHEMAS."""
+    names = list(tables or TABLE_SCHEMAS)
+    unknown = [name for name in names if name not in TABLE_SCHEMAS]
+    if unknown:
+        raise ValueError(f"Unknown tables: {unknown} (expected some of {list(TABLE_SCHEMAS)})")
+    return names
+
+
+def load_datasets(base_path, cache_dir=None, force_rebuild=False, tables=None):
     """
     Load all raw CSV datasets into memory (only used for full pipeline builds).
+    Tables are read with their TABLE_SCHEMAS dtypes, like load_and_clean_datasets.
+
+    cache_dir: optional folder for the Parquet cache (see DatasetCache).
+    force_rebuild: ignore cached entries and re-parse every CSV.
+    tables: optional subset of table names (e.g. when the large event
+            tables are streamed by build_master_dataset instead).
     """
+    cache = DatasetCache(cache_dir, force_rebuild) if cache_dir else None
     datasets = {}
 
-    datasets["customers"] = pd.read_csv(os.path.join(base_path, "customers.csv"), encoding="utf-8-sig")
-    datasets["leases"] = pd.read_csv(os.path.join(base_path, "leases.csv"), encoding="utf-8-sig")
-    datasets["service_history"] = pd.read_csv(os.path.join(base_path, "service_history.csv"), encoding="utf-8-sig")
-    datasets["payments"] = pd.read_csv(os.path.join(base_path, "payments.csv"), encoding="utf-8-sig")
-    datasets["complaints"] = pd.read_csv(os.path.join(base_path, "complaints.csv"), encoding="utf-8-sig")
-    datasets["call_center"] = pd.read_csv(os.path.join(base_path, "call_center.csv"), encoding="utf-8-sig")
-    datasets["sales_interactions"] = pd.read_csv(os.path.join(base_path, "sales_interactions.csv"), encoding="utf-8-sig")
+    for name in table_names(tables):
+        path = table_path(base_path, name)
+
+        def build(path=path, name=name):
+            return read_table(path, name)
+
+        datasets[name] = cache.get_or_build(name, path, "raw", build) if cache else build()
 
     return datasets
 
 
-def load_featured_dataset(base_path=None):
+def _load_and_clean_table(base_path, name, cache=None):
+    start = time.perf_counter()
+    path = table_path(base_path, name)
+    timing = {"cached": True, "read_s": 0.0, "clean_s": 0.0}
+
+    def build():
+        read_start = time.perf_counter()
+        df = read_table(path, name)
+        read_done = time.perf_counter()
+        df = clean_table(name, df, date_format=DATE_FORMAT)
+
+        timing["cached"] = False
+        timing["read_s"] = round(read_done - read_start, 4)
+        timing["clean_s"] = round(time.perf_counter() - read_done, 4)
+        return df
+
+    df = cache.get_or_build(name, path, "clean", build) if cache else build()
+
+    timing["rows"] = len(df)
+    timing["total_s"] = round(time.perf_counter() - start, 4)
+    return df, timing
+
+
+def load_and_clean_datasets(base_path, max_workers=None, use_processes=False,
+                            return_timings=False, cache_dir=None, force_rebuild=False,
+                            tables=None):
+    """
+    Pipelined ingestion: every table is read and cleaned on its own worker,
+    so cleaning one table overlaps with I/O on the others.
+
+    Threads are the default (no pickling of results). use_processes=True
+    parses on separate cores, which pays off for very large exports.
+
+    With cache_dir set, cleaned tables are served from the Parquet cache
+    when the source CSV is unchanged; force_rebuild=True re-parses all.
+
+    Returns the same dict shape as clean_dataset(load_datasets(base_path)).
+    tables: optional subset of table names (default: all).
+
+    With return_timings=True also returns
+    {table: {rows, cached, read_s, clean_s, total_s}}.
+    """
+    names = table_names(tables)
+    workers = max_workers or len(names)
+
+    executor = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    with executor(max_workers=workers) as pool:
+        cache = DatasetCache(cache_dir, force_rebuild) if cache_dir else None
+        futures = {name: pool.submit(_load_and_clean_table, base_path, name, cache) for name in names}
+        results = {name: futures[name].result() for name in names}
+
+    datasets = {name: results[name][0] for name in names}
+    timings = {name: results[name][1] for name in names}
+
+    for name, t in timings.items():
+        if t["cached"]:
+            print(f"⏱ {name}: {t['rows']} rows from cache in {t['total_s']}s")
+        else:
+            print(f"⏱ {name}: {t['rows']} rows | read {t['read_s']}s | clean {t['clean_s']}s")
+
+    if return_timings:
+        return datasets, timings
+    return datasets
+
+
+# ---------------------------------------------------------------------
+# Shared, memory-mapped featured dataset
+# ---------------------------------------------------------------------
+# One read-only Arrow table per file for the whole process. Every caller
+# (dashboard sessions, agents, scripts) gets a pandas view over the same
+# memory-mapped buffers instead of its own parsed copy of the CSV.
+_SHARED_TABLES = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def featured_arrow_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".arrow"
+
+
+def _replace_atomically(path, write):
+    """
+    write(tmp_path) into a unique temp file next to path, then swap it in,
+    so concurrent writers never share a temp file and readers never see a
+    partial one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def write_featured_arrow(df, arrow_path):
+    """Write a frame as an uncompressed Arrow IPC file (mmap friendly)."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    return _replace_atomically(arrow_path, write)
+
+
+def _ensure_arrow(csv_path):
+    """
+    (Re)build the .arrow sidecar when missing or older than the CSV.
+    Check and rebuild run under _SHARED_LOCK: one rebuild per process.
+    """
+    arrow_path = featured_arrow_path(csv_path)
+
+    with _SHARED_LOCK:
+        if not os.path.exists(arrow_path) or (
+            os.path.exists(csv_path) and os.path.getmtime(arrow_path) < os.path.getmtime(csv_path)
+        ):
+            df = pd.read_csv(csv_path)
+            df.columns = df.columns.str.strip().str.lower()
+            write_featured_arrow(compact_dtypes(df), arrow_path)
+
+    return arrow_path
+
+
+def update_featured_scores(csv_path, scores, key="customer_id"):
+    """
+    Write new per-customer values (e.g. churn_prob, churn_risk_bucket)
+    back into a persisted featured CSV and refresh its Arrow copy.
+
+    scores: DataFrame indexed by customer_id. Returns the rows updated.
+    """
+    df = pd.read_csv(csv_path)
+    df.columns = df.columns.str.strip().str.lower()
+
+    pos = scores.index.get_indexer(df[key])
+    hit = pos >= 0
+    for col in scores.columns:
+        values = scores[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(str)
+        values = values.to_numpy()
+        if col not in df.columns:
+            df[col] = None
+        df.loc[hit, col] = values[pos[hit]]
+
+    _replace_atomically(csv_path, lambda tmp_path: df.to_csv(tmp_path, index=False))
+    write_featured_arrow(compact_dtypes(df), featured_arrow_path(csv_path))
+    return int(hit.sum())
+
+
+def load_featured_table(csv_path):
+    """
+    Process-wide, read-only Arrow table for a featured CSV.
+
+    The CSV is converted once to an Arrow IPC file next to it; the file is
+    memory-mapped and shared by every caller until it changes on disk.
+    """
+    import pyarrow as pa
+
+    arrow_path = os.path.abspath(_ensure_arrow(csv_path))
+    mtime = os.path.getmtime(arrow_path)
+
+    with _SHARED_LOCK:
+        cached = _SHARED_TABLES.get(arrow_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        source = pa.memory_map(arrow_path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        _SHARED_TABLES[arrow_path] = (mtime, table)
+        return table
+
+
+def featured_view(table):
+    """
+    pandas view over a shared Arrow table.
+
+    Numeric columns without nulls and all string columns reference the
+    mapped buffers directly; treat the frame as read-only.
+    """
+    import pyarrow as pa
+
+    string_dtype = arrow_string_dtype()
+    mapping = {pa.string(): string_dtype, pa.large_string(): string_dtype}
+    return table.to_pandas(split_blocks=True, types_mapper=mapping.get)
+
+
+def load_featured_dataset(base_path=None, shared=True):
     """
     Loads FEATURED data (the one used by UI + Agent).
 
     For demo/testing:
         → We always load: data/featured_dataset.csv
+
+    shared=True serves a view over the process-wide memory-mapped Arrow
+    copy (see load_featured_table); shared=False re-reads the CSV.
     """
     # Force test dataset for stable demo
     if base_path is None:
@@ -37,6 +351,9 @@ def load_featured_dataset(base_path=None):
             f"Make sure your 3 injected TEST-HR customers exist here."
         )
 
+    if shared:
+        return featured_view(load_featured_table(file_path))
+
     df = pd.read_csv(file_path)
 
     # Normalize column names just in case
@@ -0,0 +1,114 @@
+"""
+Dtype compaction for the master / featured frames.
+
+    • integral numeric columns → smallest signed integer type
+    • low-cardinality labels   → pandas categoricals
+    • other text               → Arrow-backed strings (NaN semantics kept)
+
+Floats with fractions, datetimes and booleans are left untouched, and
+integral columns that still hold NaN stay float so missing values keep
+behaving like NaN downstream.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def arrow_string_dtype():
+    """Arrow-backed string dtype that still uses NaN for missing values."""
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:  # pandas < 2.3
+        return pd.StringDtype("pyarrow_numpy")
+
+
+def _is_text(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _compact_numeric(series):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy()
+        if len(values) and not np.isnan(values).any() and np.array_equal(values, np.floor(values)):
+            if np.abs(values).max() < 2 ** 62:
+                return pd.to_numeric(series.astype(np.int64), downcast="integer")
+
+    return series
+
+
+def _compact_text(series, category_max_ratio):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+
+    non_null = series.dropna()
+    if len(non_null) and not non_null.map(type).eq(str).all():
+        return series  # mixed python objects — leave alone
+
+    n_unique = non_null.nunique()
+    if len(series) and n_unique / len(series) <= category_max_ratio:
+        return series.astype("category")
+
+    if HAS_PYARROW:
+        return series.astype(arrow_string_dtype())
+    return series
+
+
+def compact_dtypes(df, category_max_ratio=0.5, return_report=False):
+    """
+    Return a compacted copy of df.
+
+    category_max_ratio: text columns whose distinct/total ratio is at or
+    below this become categoricals.
+    With return_report=True also returns a per-column memory report.
+    """
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series):
+            out[col] = _compact_numeric(series)
+        elif _is_text(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            out[col] = _compact_text(series, category_max_ratio)
+        else:
+            out[col] = series
+
+    compact = pd.DataFrame(out, index=df.index)
+
+    if return_report:
+        return compact, memory_report(df, compact)
+    return compact
+
+
+def memory_report(before, after):
+    """Per-column before/after memory usage (bytes, deep), plus a TOTAL row."""
+    mem_before = before.memory_usage(deep=True, index=False)
+    mem_after = after.memory_usage(deep=True, index=False)
+
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "bytes_before": mem_before,
+        "bytes_after": mem_after,
+    })
+    report.loc["TOTAL"] = ["", "", mem_before.sum(), mem_after.sum()]
+    report["reduction_x"] = (report["bytes_before"] / report["bytes_after"].clip(lower=1)).round(2)
+    return report
+
+
+def print_memory_report(report):
+    total = report.loc["TOTAL"]
+    print(report.to_string())
+    print(
+        f"\n📦 {total['bytes_before'] / 1e6:.1f} MB → {total['bytes_after'] / 1e6:.1f} MB "
+        f"({total['reduction_x']}x smaller)"
+    )
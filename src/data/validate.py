@@ -1,33 +1,217 @@
+import numpy as np
 import pandas as pd
 
+# ---------------------------------------------------------------------
+# Contracts
+# ---------------------------------------------------------------------
+# required:        columns that must exist
+# types:           column → "numeric" | "datetime" | "string"
+# ranges:          column → (min, max), either bound may be None (inclusive)
+# allowed:         column → set of allowed values
+# max_null_ratio:  column → highest tolerated share of nulls
+# unique:          columns whose values must not repeat
+# date_order:      (earlier, later) column pairs
+# references:      True → customer_id must exist in the customers table
+TABLE_CONTRACTS = {
+    "customers": {
+        "required": ["customer_id", "name"],
+        "types": {"customer_id": "string", "name": "string", "age": "numeric"},
+        "ranges": {"age": (16, 110)},
+        "max_null_ratio": {"customer_id": 0.0, "name": 0.05},
+        "unique": ["customer_id"],
+    },
+    "leases": {
+        "required": ["customer_id", "lease_start", "lease_end"],
+        "types": {"lease_start": "datetime", "lease_end": "datetime", "monthly_payment": "numeric"},
+        "ranges": {"monthly_payment": (0, None)},
+        "max_null_ratio": {"customer_id": 0.0, "lease_end": 0.05},
+        "date_order": [("lease_start", "lease_end")],
+        "references": True,
+    },
+    "service_history": {
+        "required": ["customer_id", "service_date"],
+        "types": {"service_date": "datetime", "amount_billed": "numeric", "satisfaction_score": "numeric"},
+        "ranges": {"satisfaction_score": (1, 5), "amount_billed": (0, None)},
+        "max_null_ratio": {"customer_id": 0.0, "satisfaction_score": 0.5},
+        "references": True,
+    },
+    "payments": {
+        "required": ["customer_id", "payment_date", "amount"],
+        "types": {"payment_date": "datetime", "amount": "numeric", "late_days": "numeric"},
+        "ranges": {"amount": (0, None), "late_days": (0, 365), "missed_payment": (0, 1)},
+        "max_null_ratio": {"customer_id": 0.0, "amount": 0.05},
+        "references": True,
+    },
+    "complaints": {
+        "required": ["ticket_id", "customer_id"],
+        "max_null_ratio": {"customer_id": 0.0},
+        "unique": ["ticket_id"],
+        "references": True,
+    },
+    "call_center": {
+        "required": ["customer_id"],
+        "types": {"call_duration_min": "numeric", "satisfaction_score": "numeric"},
+        "ranges": {"satisfaction_score": (1, 5), "call_duration_min": (0, 24 * 60)},
+        "max_null_ratio": {"customer_id": 0.0},
+        "references": True,
+    },
+    "sales_interactions": {
+        "required": ["customer_id", "interaction_date"],
+        "types": {"interaction_date": "datetime"},
+        "max_null_ratio": {"customer_id": 0.0},
+        "references": True,
+    },
+}
+
+FEATURED_CONTRACT = {
+    "required": ["customer_id", "name", "car_model", "churn_prob", "churn_risk_bucket", "days_until_lease_end"],
+    "types": {"churn_prob": "numeric", "days_until_lease_end": "numeric"},
+    "ranges": {"churn_prob": (0, 1), "avg_service_satisfaction": (0, 5)},
+    "allowed": {"churn_risk_bucket": {"High", "Medium", "Low"}},
+    "max_null_ratio": {"customer_id": 0.0, "churn_prob": 0.0, "name": 0.0},
+    "unique": ["customer_id"],
+}
+
+TYPE_CHECKS = {
+    "numeric": pd.api.types.is_numeric_dtype,
+    "datetime": pd.api.types.is_datetime64_any_dtype,
+    "string": lambda s: (
+        pd.api.types.is_object_dtype(s)
+        or pd.api.types.is_string_dtype(s)
+        or isinstance(s.dtype, pd.CategoricalDtype)
+    ),
+}
+
+
+# ---------------------------------------------------------------------
+# Contract runner
+# ---------------------------------------------------------------------
+def _check(report, check, column, mask=None, passed=None, detail=""):
+    failed = int(mask.sum()) if mask is not None else 0
+    report["checks"].append({
+        "check": check,
+        "column": column,
+        "failed_rows": failed,
+        "passed": (failed == 0) if passed is None else passed,
+        "detail": detail,
+    })
+    if mask is not None:
+        report["masks"][f"{check}:{column}"] = mask
+
+
+def validate_contract(df, contract, name="dataset", reference_ids=None):
+    """
+    Run one contract over a table in a single vectorized pass.
+
+    Returns a report dict:
+        name, rows, passed,
+        checks:   [{check, column, failed_rows, passed, detail}]
+        masks:    {"check:column": boolean Series of offending rows}
+        row_mask: rows that fail any row-level check
+    """
+    report = {"name": name, "rows": len(df), "checks": [], "masks": {}}
+
+    _check(report, "not_empty", "*", passed=not df.empty, detail=f"{len(df)} rows")
+
+    missing = [col for col in contract.get("required", []) if col not in df.columns]
+    _check(report, "required_columns", "*", passed=not missing, detail=f"missing: {missing}" if missing else "")
+
+    for col, kind in contract.get("types", {}).items():
+        if col in df.columns:
+            ok = TYPE_CHECKS[kind](df[col])
+            _check(report, "type", col, passed=ok, detail=f"expected {kind}, got {df[col].dtype}")
+
+    for col, (low, high) in contract.get("ranges", {}).items():
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            values = df[col]
+            bad = pd.Series(False, index=df.index)
+            if low is not None:
+                bad |= values < low
+            if high is not None:
+                bad |= values > high
+            _check(report, "range", col, bad, detail=f"[{low}, {high}]")
+
+    for col, allowed in contract.get("allowed", {}).items():
+        if col in df.columns:
+            bad = df[col].notna() & ~df[col].isin(list(allowed))
+            _check(report, "allowed_values", col, bad, detail=str(sorted(allowed)))
+
+    for col, max_ratio in contract.get("max_null_ratio", {}).items():
+        if col in df.columns:
+            nulls = df[col].isna()
+            ratio = float(nulls.mean()) if len(df) else 0.0
+            _check(report, "null_ratio", col, nulls if ratio > max_ratio else None,
+                   passed=ratio <= max_ratio, detail=f"{ratio:.2%} > {max_ratio:.2%}" if ratio > max_ratio else f"{ratio:.2%}")
+
+    for col in contract.get("unique", []):
+        if col in df.columns:
+            dup = df[col].duplicated(keep=False) & df[col].notna()
+            _check(report, "unique", col, dup)
+
+    for earlier, later in contract.get("date_order", []):
+        if earlier in df.columns and later in df.columns:
+            bad = df[earlier].notna() & df[later].notna() & (df[earlier] > df[later])
+            _check(report, "date_order", f"{earlier}<={later}", bad)
+
+    if contract.get("references") and reference_ids is not None and "customer_id" in df.columns:
+        # hash lookup against the unique customer index (much faster than isin)
+        unknown = reference_ids.get_indexer(df["customer_id"]) < 0
+        orphan = df["customer_id"].notna() & pd.Series(unknown, index=df.index)
+        _check(report, "referential_integrity", "customer_id", orphan)
+
+    masks = list(report["masks"].values())
+    combined = np.logical_or.reduce([m.to_numpy(dtype=bool) for m in masks]) if masks else False
+    report["row_mask"] = pd.Series(combined, index=df.index, dtype=bool)
+    report["passed"] = all(c["passed"] for c in report["checks"])
+    return report
+
+
+def validate_tables(tables, featured=None):
+    """
+    Validate all seven cleaned tables (and optionally the featured frame).
+    Returns {name: report}.
+    """
+    customer_ids = None
+    if "customers" in tables and "customer_id" in tables["customers"].columns:
+        customer_ids = pd.Index(tables["customers"]["customer_id"].dropna().unique())
+
+    reports = {
+        name: validate_contract(df, TABLE_CONTRACTS[name], name, customer_ids)
+        for name, df in tables.items()
+        if name in TABLE_CONTRACTS
+    }
+
+    if featured is not None:
+        reports["featured"] = validate_contract(featured, FEATURED_CONTRACT, "featured")
+
+    return reports
+
+
+def print_report(report):
+    print(f"\n🔍 Validating {report['name']} ({report['rows']} rows)...")
+    for c in report["checks"]:
+        mark = "✔" if c["passed"] else "❌"
+        rows = f" — {c['failed_rows']} rows" if c["failed_rows"] else ""
+        detail = f" ({c['detail']})" if c["detail"] else ""
+        print(f"{mark} {c['check']} [{c['column']}]{rows}{detail}")
+
+
+# ---------------------------------------------------------------------
+# Legacy entry point
+# ---------------------------------------------------------------------
 def validate_dataset(df, required_columns=None, name="dataset"):
     """
     Basic validation checks:
     - dataset is not empty
     - required columns exist
     - no duplicated customer_id (only for master tables)
-    """
-
-    print(f"\n🔍 Validating {name}...")
 
-    # 1. Check empty
-    if df.empty:
-        print(f"❌ ERROR: {name} is empty")
-    else:
-        print(f"✔ {name} loaded with {len(df)} rows.")
-
-    # 2. Check required columns
-    if required_columns:
-        missing = [col for col in required_columns if col not in df.columns]
-        if missing:
-            print(f"❌ Missing columns in {name}: {missing}")
-        else:
-            print(f"✔ All required columns present in {name}.")
-
-    # 3. Check duplicates (only for customer tables)
+    Prints the result and returns the structured report.
+    """
+    contract = {"required": required_columns or []}
     if "customer_id" in df.columns:
-        dup = df["customer_id"].duplicated().sum()
-        if dup > 0:
-            print(f"⚠ {dup} duplicate customer_id entries found in {name}.")
-        else:
-            print(f"✔ No duplicate customer_id in {name}.")
+        contract["unique"] = ["customer_id"]
+
+    report = validate_contract(df, contract, name)
+    print_report(report)
+    return report
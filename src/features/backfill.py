@@ -0,0 +1,157 @@
+"""
+Point-in-time feature backfill over a grid of as-of dates.
+
+Instead of re-running build_master_dataset + add_churn_and_lease_features
+once per day, every event table is sorted once (EventIndex) and the
+aggregates for all (customer, as_of) pairs are read off cumulative sums
+with np.searchsorted. Output is a long table: one row per customer per
+as-of date.
+"""
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import customer_index
+from src.features.event_index import EVENT_DATE_COLUMNS, EventIndex
+
+# event table → numeric columns the snapshots read (besides key and date)
+SNAPSHOT_INPUTS = {
+    "payments": ["amount", "missed_payment", "late_days"],
+    "complaints": [],
+    "service_history": ["satisfaction_score"],
+}
+
+SNAPSHOT_COLUMNS = [
+    "as_of", "customer_id",
+    "total_amount_paid", "total_missed_payments", "total_late_days",
+    "complaint_count", "num_service_visits", "avg_service_satisfaction",
+    "days_until_lease_end", "customer_tenure_days", "monthly_payment",
+]
+
+
+def _event_index(tables, name, index, columns=()):
+    date_col = EVENT_DATE_COLUMNS[name]
+    df = tables.get(name)
+    if df is None or date_col not in df.columns:
+        print(f"⚠ {name}: no '{date_col}' column — point-in-time values left empty.")
+        return None
+    return EventIndex(df, date_col, index, columns)
+
+
+def _lease_index(leases, index):
+    """
+    Leases sorted once by (customer, lease_start), plus the lease
+    select_current_leases would pick from every sorted prefix, i.e. among
+    the leases started by a given day: the latest lease_end (an active
+    lease always has it), ties → first in table order.
+    """
+    if leases is None or not {"lease_start", "lease_end"} <= set(leases.columns):
+        return None
+    leases = leases.reset_index(drop=True)
+    events = EventIndex(leases, "lease_start", index)
+
+    start = pd.to_datetime(leases["lease_start"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+    end = pd.to_datetime(leases["lease_end"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+    # rank every sorted lease by (lease_end, earlier row wins ties); NaT ranks lowest
+    rows = events.rows
+    order = np.lexsort((-rows, end[rows].astype(np.int64)))
+    rank = np.empty(len(rows), dtype=np.int64)
+    rank[order] = np.arange(len(rows))
+
+    # running max of the rank within each customer (offsets keep customers apart)
+    offset = events.codes.astype(np.int64) * max(len(rows), 1)
+    best = np.maximum.accumulate(rank + offset) - offset
+
+    payment = None
+    if "monthly_payment" in leases.columns:
+        payment = pd.to_numeric(leases["monthly_payment"], errors="coerce").to_numpy(dtype=np.float64)
+    return {"events": events, "best_row": rows[order[best]], "lease_start": start, "lease_end": end,
+            "monthly_payment": payment}
+
+
+def _lease_at(values, row):
+    """values[row] with missing where row is -1 (no lease started yet)."""
+    out = np.full(len(row), np.nan, dtype=np.float64) if values.dtype.kind == "f" \
+        else np.full(len(row), np.datetime64("NaT"), dtype=values.dtype)
+    found = row >= 0
+    out[found] = values[row[found]]
+    return out
+
+
+def _snapshot(indexes, leases, codes, days):
+    payments, complaints, service = indexes
+    out = {}
+
+    if payments is not None:
+        out["total_amount_paid"] = payments.sum("amount", codes, days)
+        out["total_missed_payments"] = payments.sum("missed_payment", codes, days)
+        out["total_late_days"] = payments.sum("late_days", codes, days)
+
+    if complaints is not None:
+        out["complaint_count"] = complaints.count(codes, days)
+
+    if service is not None:
+        visits = service.count(codes, days)
+        rated = service.count_present("satisfaction_score", codes, days)
+        total = service.sum("satisfaction_score", codes, days)
+        out["num_service_visits"] = visits
+        # same convention as the master table: no ratings → 0
+        out["avg_service_satisfaction"] = np.divide(total, rated, out=np.zeros(len(total)), where=rated > 0)
+
+    if leases is not None:
+        # each (customer, day)'s current lease, -1 when none had started
+        pos = leases["events"].last_position(codes, days)
+        row = np.where(pos >= 0, leases["best_row"][np.maximum(pos, 0)], -1)
+        as_of = pd.to_datetime(days, unit="D")
+
+        out["days_until_lease_end"] = (_lease_at(leases["lease_end"], row) - as_of).days.to_numpy(dtype=np.float64)
+        out["customer_tenure_days"] = (as_of - _lease_at(leases["lease_start"], row)).days.to_numpy(dtype=np.float64)
+
+        if leases["monthly_payment"] is not None:
+            out["monthly_payment"] = _lease_at(leases["monthly_payment"], row)
+
+    return out
+
+
+def iter_point_in_time_snapshots(tables, as_of_dates, dates_per_batch=30):
+    """
+    Yield long-format snapshot frames, `dates_per_batch` as-of dates at a
+    time, so very large grids never have to sit in memory at once.
+    """
+    index = customer_index(tables["customers"])
+    n = len(index)
+
+    indexes = tuple(_event_index(tables, name, index, columns) for name, columns in SNAPSHOT_INPUTS.items())
+    leases = _lease_index(tables.get("leases"), index)
+
+    grid = pd.DatetimeIndex(pd.to_datetime(list(as_of_dates))).normalize().unique().sort_values()
+    grid_days = grid.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    customer_codes = np.arange(n, dtype=np.int64)
+
+    for start in range(0, len(grid), dates_per_batch):
+        batch_days = grid_days[start:start + dates_per_batch]
+        codes = np.tile(customer_codes, len(batch_days))
+        days = np.repeat(batch_days, n)
+
+        columns = _snapshot(indexes, leases, codes, days)
+        frame = pd.DataFrame({
+            "as_of": np.repeat(grid[start:start + dates_per_batch].to_numpy(), n),
+            "customer_id": np.tile(index.to_numpy(), len(batch_days)),
+            **columns,
+        })
+        yield frame[[c for c in SNAPSHOT_COLUMNS if c in frame.columns]]
+
+
+def build_point_in_time_snapshots(tables, as_of_dates, dates_per_batch=30):
+    """
+    Point-in-time aggregates for every customer at every as-of date.
+
+    tables: cleaned tables (customers, leases, payments, service_history,
+            complaints with a complaint_date column).
+    as_of_dates: iterable of dates, e.g. pd.date_range("2024-01-01", "2024-12-31").
+    Returns a long DataFrame (as_of, customer_id, ...).
+    """
+    frames = list(iter_point_in_time_snapshots(tables, as_of_dates, dates_per_batch))
+    if not frames:
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
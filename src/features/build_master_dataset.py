@@ -1,124 +1,55 @@
-import pandas as pd
-
-
-def build_master_dataset(raw):
-    """
-    Build a unified master dataset from your actual Ali & Sons structure.
-    All aggregations match the REAL CSV fields (no synthetic fields).
-    """
-
-    customers = raw["customers"]
-    leases = raw["leases"]
-    payments = raw["payments"]
-    complaints = raw["complaints"]
-    calls = raw["call_center"]
-    service = raw["service_history"]
-    sales = raw["sales_interactions"]
-
-    # ---------------------------------------------------------------------
-    # 1. Merge customers + leases
-    # ---------------------------------------------------------------------
-    master = customers.merge(
-        leases,
-        on="customer_id",
-        how="left"
-    )
-
-    # ---------------------------------------------------------------------
-    # 2. Payments Aggregation
-    # ---------------------------------------------------------------------
+from src.data.aggregate import build_master
+from src.data.chunked import DEFAULT_CHUNKSIZE
+
+# ---------------------------------------------------------------------
+# Aggregation config: table → {output column: (source column, kernel)}
+# All aggregations match the REAL CSV fields (no synthetic fields).
+# ---------------------------------------------------------------------
+MASTER_AGGS = {
     # Fields available: amount, missed_payment, late_days
-    payments_agg = payments.groupby("customer_id").agg({
-        "amount": "sum",
-        "missed_payment": "sum",
-        "late_days": "sum"
-    }).reset_index()
-
-    payments_agg.rename(columns={
-        "amount": "total_amount_paid",
-        "missed_payment": "total_missed_payments",
-        "late_days": "total_late_days"
-    }, inplace=True)
-
-    master = master.merge(payments_agg, on="customer_id", how="left")
-
-    # ---------------------------------------------------------------------
-    # 3. Complaints Aggregation
-    # ---------------------------------------------------------------------
+    "payments": {
+        "total_amount_paid": ("amount", "sum"),
+        "total_missed_payments": ("missed_payment", "sum"),
+        "total_late_days": ("late_days", "sum"),
+    },
     # Count of tickets (ticket_id)
-    complaints_agg = complaints.groupby("customer_id").agg({
-        "ticket_id": "count"
-    }).reset_index()
-
-    complaints_agg.rename(columns={
-        "ticket_id": "complaint_count"
-    }, inplace=True)
-
-    master = master.merge(complaints_agg, on="customer_id", how="left")
-
-    # ---------------------------------------------------------------------
-    # 4. Call Center Logs Aggregation
-    # ---------------------------------------------------------------------
-    calls_agg = calls.groupby("customer_id").agg({
-        "call_duration_min": "sum",
-        "satisfaction_score": "mean",
-    }).reset_index()
-
-    calls_agg.rename(columns={
-        "call_duration_min": "total_call_minutes",
-        "satisfaction_score": "avg_call_satisfaction"
-    }, inplace=True)
-
-    master = master.merge(calls_agg, on="customer_id", how="left")
-
-    # ---------------------------------------------------------------------
-    # 5. Service History Aggregation
-    # ---------------------------------------------------------------------
-    service_agg = service.groupby("customer_id").agg({
-        "service_type": "count",
-        "amount_billed": "sum",
-        "satisfaction_score": "mean"
-    }).reset_index()
-
-    service_agg.rename(columns={
-        "service_type": "num_service_visits",
-        "amount_billed": "total_service_billed",
-        "satisfaction_score": "avg_service_satisfaction"
-    }, inplace=True)
-
-    master = master.merge(service_agg, on="customer_id", how="left")
-
-    # ---------------------------------------------------------------------
-    # 6. Sales Interactions Aggregation
-    # ---------------------------------------------------------------------
+    "complaints": {
+        "complaint_count": ("ticket_id", "count"),
+    },
+    "call_center": {
+        "total_call_minutes": ("call_duration_min", "sum"),
+        "avg_call_satisfaction": ("satisfaction_score", "mean"),
+    },
+    "service_history": {
+        "num_service_visits": ("service_type", "count"),
+        "total_service_billed": ("amount_billed", "sum"),
+        "avg_service_satisfaction": ("satisfaction_score", "mean"),
+    },
     # Fields: salesperson, interaction_type, status
-    sales_agg = sales.groupby("customer_id").agg({
-        "interaction_type": "count",
-        "status": lambda x: (x == "Completed").sum()
-    }).reset_index()
+    "sales_interactions": {
+        "num_sales_interactions": ("interaction_type", "count"),
+        "successful_sales_interactions": ("status", "count_eq", "Completed"),
+    },
+}
+
+FILL_ZERO = [
+    "total_amount_paid", "total_missed_payments", "total_late_days",
+    "complaint_count", "total_call_minutes", "avg_call_satisfaction",
+    "num_service_visits", "total_service_billed", "avg_service_satisfaction",
+    "num_sales_interactions", "successful_sales_interactions",
+]
 
-    sales_agg.rename(columns={
-        "interaction_type": "num_sales_interactions",
-        "status": "successful_sales_interactions"
-    }, inplace=True)
 
-    master = master.merge(sales_agg, on="customer_id", how="left")
+def build_master_dataset(raw, stream_dir=None, chunksize=DEFAULT_CHUNKSIZE, as_of=None):
+    """
+    Build a unified master dataset from your actual Ali & Sons structure.
 
-    # ---------------------------------------------------------------------
-    # 7. Fill Missing Numerical Values
-    # ---------------------------------------------------------------------
-    master.fillna({
-        "total_amount_paid": 0,
-        "total_missed_payments": 0,
-        "total_late_days": 0,
-        "complaint_count": 0,
-        "total_call_minutes": 0,
-        "avg_call_satisfaction": 0,
-        "num_service_visits": 0,
-        "total_service_billed": 0,
-        "avg_service_satisfaction": 0,
-        "num_sales_interactions": 0,
-        "successful_sales_interactions": 0
-    }, inplace=True)
+    stream_dir: folder with the raw CSVs. When given, payments,
+    service_history and call_center are aggregated from disk in chunks
+    of `chunksize` rows (bounded memory) and may be left out of raw.
 
-    return master
+    One row per customer: only the lease active at as_of (default today),
+    or else the most recent one, is joined; lease_count and
+    first_lease_start describe the lease history.
+    """
+    return build_master(raw, MASTER_AGGS, FILL_ZERO, stream_dir, chunksize, as_of)
@@ -1,64 +1,105 @@
+import numpy as np
 import pandas as pd
 
+# Placeholder for missing lease dates (keeps day counts numeric)
+MISSING_LEASE_DATE = pd.Timestamp("2000-01-01")
 
-def add_churn_and_lease_features(df):
+# (days_until_lease_end <= bound, label), checked in order
+RENEWAL_PRIORITY_THRESHOLDS = (
+    (30, "🔥 Top Priority (Save Now)"),
+    (90, "High Priority"),
+    (180, "Warm Priority"),
+)
+DEFAULT_RENEWAL_PRIORITY = "Low Priority"
+
+# (churn_prob >= bound, label), checked in order
+CHURN_RISK_THRESHOLDS = (
+    (0.7, "High"),
+    (0.4, "Medium"),
+)
+DEFAULT_CHURN_RISK = "Low"
+
+
+def resolve_as_of(as_of=None):
+    """Normalize an as-of date; None means today (midnight)."""
+    if as_of is None:
+        return pd.Timestamp.today().normalize()
+    return pd.Timestamp(as_of)
+
+
+def _bucket(values, conditions, labels, default):
+    """np.select into a categorical without building Python strings per row."""
+    codes = np.select(conditions, np.arange(len(labels)), default=len(labels))
+    return pd.Categorical.from_codes(codes, categories=list(labels) + [default])
+
+
+def add_churn_and_lease_features(
+    df,
+    as_of=None,
+    priority_thresholds=RENEWAL_PRIORITY_THRESHOLDS,
+    churn_thresholds=CHURN_RISK_THRESHOLDS,
+    model=None,
+):
     """
     Add numerical churn features and key lease timing metrics.
+
+    as_of: reference date for all day counts. Pass it explicitly to make
+    the output reproducible (and cacheable); defaults to today.
+    Thresholds are ((bound, label), ...) tuples, see the module constants.
+    model: optional churn scorer (src.models.churn_model.ChurnModel);
+    when given, churn_prob is (re)computed in one batch call. Without
+    one, df must already carry churn_prob.
+    Returns a new frame; the input is not modified.
     """
+    df = df.copy()
+    reference_date = resolve_as_of(as_of)
 
     # -------------------------------------------------------
-    # 1. Ensure lease dates are datetime
+    # 1. Ensure lease dates are datetime (missing → placeholder)
     # -------------------------------------------------------
-    df["lease_start"] = pd.to_datetime(df["lease_start"], errors="coerce")
-    df["lease_end"] = pd.to_datetime(df["lease_end"], errors="coerce")
-
-    # Fill missing dates with a safe placeholder
-    df["lease_start"].fillna(pd.Timestamp("2000-01-01"), inplace=True)
-    df["lease_end"].fillna(pd.Timestamp("2000-01-01"), inplace=True)
+    df["lease_start"] = pd.to_datetime(df["lease_start"], errors="coerce").fillna(MISSING_LEASE_DATE)
+    df["lease_end"] = pd.to_datetime(df["lease_end"], errors="coerce").fillna(MISSING_LEASE_DATE)
 
     # -------------------------------------------------------
-    # 2. Days until lease end
+    # 2. Days until lease end / remaining months
     # -------------------------------------------------------
-    reference_date = pd.Timestamp.today()
     df["days_until_lease_end"] = (df["lease_end"] - reference_date).dt.days
-
-    # -------------------------------------------------------
-    # 3. Lease remaining months
-    # -------------------------------------------------------
     df["remaining_months"] = df["days_until_lease_end"] / 30.0
 
     # -------------------------------------------------------
-    # 4. Customer tenure
+    # 3. Customer tenure
     # -------------------------------------------------------
     df["customer_tenure_days"] = (reference_date - df["lease_start"]).dt.days
     df["customer_tenure_months"] = df["customer_tenure_days"] / 30.0
 
     # -------------------------------------------------------
-    # 5. Renewal priority logic
+    # 4. Renewal priority (vectorized thresholds)
     # -------------------------------------------------------
-    def calc_priority(row):
-        d = row["days_until_lease_end"]
+    days = df["days_until_lease_end"].to_numpy(dtype=np.float64)
+    df["renewal_priority"] = _bucket(
+        days,
+        [days <= bound for bound, _ in priority_thresholds],
+        [label for _, label in priority_thresholds],
+        DEFAULT_RENEWAL_PRIORITY,
+    )
 
-        if d <= 30:
-            return "🔥 Top Priority (Save Now)"
-        elif d <= 90:
-            return "High Priority"
-        elif d <= 180:
-            return "Warm Priority"
-        return "Low Priority"
-
-    df["renewal_priority"] = df.apply(calc_priority, axis=1)
+    # -------------------------------------------------------
+    # 5. churn_prob: scored by the model, or already in your data
+    # -------------------------------------------------------
+    if model is not None:
+        df["churn_prob"] = model.predict_proba(df, as_of=reference_date)
+    elif "churn_prob" not in df.columns:
+        raise ValueError("No churn_prob column: pass a trained churn model (model=...).")
 
     # -------------------------------------------------------
-    # 6. Risk bucket from churn_prob (already exists in your data)
+    # 6. Risk bucket from churn_prob
     # -------------------------------------------------------
-    def map_churn(prob):
-        if prob >= 0.7:
-            return "High"
-        if prob >= 0.4:
-            return "Medium"
-        return "Low"
-
-    df["churn_risk_bucket"] = df["churn_prob"].apply(map_churn)
+    prob = pd.to_numeric(df["churn_prob"], errors="coerce").to_numpy(dtype=np.float64)
+    df["churn_risk_bucket"] = _bucket(
+        prob,
+        [prob >= bound for bound, _ in churn_thresholds],
+        [label for _, label in churn_thresholds],
+        DEFAULT_CHURN_RISK,
+    )
 
     return df
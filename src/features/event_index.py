@@ -0,0 +1,113 @@
+"""
+Sorted event arrays for point-in-time and windowed features.
+
+Each event table is sorted once by (customer, date) and packed into a
+single int64 key, so "events of customer c up to day t" is one
+np.searchsorted and any sum over that range is a difference of two
+cumulative sums. Queries are fully vectorized over (customer, day) pairs.
+"""
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import encode_ids
+
+# Date column used to place each event table on the timeline
+EVENT_DATE_COLUMNS = {
+    "payments": "payment_date",
+    "service_history": "service_date",
+    "complaints": "complaint_date",
+    "call_center": "call_date",
+    "sales_interactions": "interaction_date",
+    "leases": "lease_start",
+}
+
+_DAY_OFFSET = 1 << 31
+
+
+def to_days(values):
+    """Datetime-like values → int64 days since epoch (NaT → None mask)."""
+    dates = pd.to_datetime(pd.Series(values), errors="coerce")
+    days = dates.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return days, dates.isna().to_numpy()
+
+
+class EventIndex:
+    """
+    One event table sorted by (customer code, event day).
+
+    index: customer Index shared by every query (see customer_index).
+    columns: numeric columns to prepare cumulative sums for.
+    """
+
+    def __init__(self, df, date_col, index, columns=(), key="customer_id"):
+        codes = encode_ids(df[key], index)
+        days, missing = to_days(df[date_col])
+        keep = (codes >= 0) & ~missing
+
+        codes, days = codes[keep], days[keep]
+        order = np.lexsort((days, codes))
+
+        self.n_customers = len(index)
+        self.codes = codes[order]
+        self.days = days[order]
+        self.keys = self._key(self.codes, self.days)
+        self.rows = np.flatnonzero(keep)[order]  # positions in the source frame
+
+        # first sorted position of every customer code
+        self.starts = np.searchsorted(self.codes, np.arange(self.n_customers + 1), side="left")
+
+        self._cumsums = {}
+        for col in columns:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)[keep][order]
+            present = ~np.isnan(values)
+            self._cumsums[col] = (
+                np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))]),
+                np.concatenate([[0], np.cumsum(present)]),
+            )
+
+    @staticmethod
+    def _key(codes, days):
+        return (codes.astype(np.int64) << 32) + (days + _DAY_OFFSET)
+
+    # --------------------------------------------------------
+    # Positions
+    # --------------------------------------------------------
+    def upto(self, codes, days):
+        """Sorted position just past the last event of each customer on/before day."""
+        return np.searchsorted(self.keys, self._key(codes, days), side="right")
+
+    def first(self, codes):
+        return self.starts[codes]
+
+    # --------------------------------------------------------
+    # Vectorized range queries: events in (lo_day, hi_day]
+    # --------------------------------------------------------
+    def count(self, codes, hi_days, lo_days=None):
+        hi = self.upto(codes, hi_days)
+        lo = self.first(codes) if lo_days is None else self.upto(codes, lo_days)
+        return hi - lo
+
+    def sum(self, col, codes, hi_days, lo_days=None):
+        total, _ = self._cumsums[col]
+        hi = self.upto(codes, hi_days)
+        lo = self.first(codes) if lo_days is None else self.upto(codes, lo_days)
+        return total[hi] - total[lo]
+
+    def count_present(self, col, codes, hi_days, lo_days=None):
+        _, present = self._cumsums[col]
+        hi = self.upto(codes, hi_days)
+        lo = self.first(codes) if lo_days is None else self.upto(codes, lo_days)
+        return present[hi] - present[lo]
+
+    def last_position(self, codes, days):
+        """Sorted position of the last event on/before day (-1 if none)."""
+        pos = self.upto(codes, days) - 1
+        return np.where(pos >= self.first(codes), pos, -1)
+
+    def last_day(self, codes, days):
+        """Day of the last event on/before day (NaN if none)."""
+        pos = self.last_position(codes, days)
+        out = np.full(len(pos), np.nan)
+        hit = pos >= 0
+        out[hit] = self.days[pos[hit]]
+        return out
@@ -1,22 +1,27 @@
-import os
-from openai import OpenAI
-
-client = OpenAI()
+from src.llm.gateway import get_gateway
+from src.llm.prompts import DEFAULT_PROMPT_BUDGET, PERSONA_TONE_STYLES, persona_email_template, tone_style
+from src.memory.llm_response_cache import LLMResponseCache, cache_key
 
 
 class LLMEmailWriter:
     """
     Persona-aware, tone-adjusting renewal email generator.
     Produces unique structure and messaging for each customer.
+
+    cache: LLMResponseCache for identical prompts (default: a local SQLite
+    cache; pass False to disable). Use regenerate=True for a fresh variant.
+    prompt_budget: max input tokens per rendered prompt (see src.llm.prompts).
     """
 
-    def __init__(self, model: str = "gpt-4.1-mini"):
+    def __init__(self, model: str = "gpt-4.1-mini", cache=None, prompt_budget=DEFAULT_PROMPT_BUDGET):
         self.model = model
+        self.template = persona_email_template(prompt_budget, model)
+        self.cache = LLMResponseCache() if cache is None else cache
 
     # ---------------------------------------------------------
     # MAIN EMAIL WRITER
     # ---------------------------------------------------------
-    def write_email(self, customer_info, reason, offer, language, tone):
+    def write_email(self, customer_info, reason, offer, language, tone, regenerate=False):
         """
         customer_info includes:
             - customer_id
@@ -32,111 +37,54 @@ class LLMEmailWriter:
             - preferred_language
         """
 
-        prompt = self._build_prompt(
+        messages = self.template.render(self._facts(
             customer_info=customer_info,
             reason=reason,
             offer=offer,
             language=language,
             tone=tone,
-        )
+        ))
+        temperature = 0.65  # <-- Higher temperature = more variation
+
+        def create():
+            return get_gateway().chat_text(
+                messages,
+                model=self.model,
+                temperature=temperature,
+                tag="persona_email",
+            )
 
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system",
-                 "content": "You are a highly skilled automotive retention strategist who writes human, persuasive, persona-tailored emails."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.65,  # <-- Higher temperature = more variation
-        )
+        if not self.cache:
+            return create()
 
-        return response.choices[0].message.content.strip()
+        key = cache_key(self.model, temperature, messages[0]["content"], messages[-1]["content"])
+        return self.cache.get_or_create(key, create, model=self.model, bypass=regenerate)
 
     # ---------------------------------------------------------
-    # PROMPT BUILDER
+    # PROMPT FACTS
     # ---------------------------------------------------------
-    def _build_prompt(self, customer_info, reason, offer, language, tone):
+    def _facts(self, customer_info, reason, offer, language, tone):
         """
-        Builds a rich persona-aware prompt.
+        Compact persona-aware facts; the persona structure rules, tone
+        styles and email requirements live in the static system prefix.
         """
-
-        name = customer_info["name"]
-        car = customer_info["car_model"]
-        days = customer_info["days_until_lease_end"]
         churn = customer_info["churn_risk_bucket"]
         score = customer_info["churn_risk_score"]
-        nationality = customer_info.get("nationality", "Unknown")
-
-        persona_name = customer_info.get("persona_name", "General Customer")
-        persona_emoji = customer_info.get("persona_emoji", "")
-        persona_style = customer_info.get(
-            "persona_style",
-            "No behavior data available. Use a professional but warm style."
-        )
-
-        # -------------------------------
-        # LANGUAGE LOGIC
-        # -------------------------------
-        if language == "ar":
-            lang_instruction = "Write the entire email in professional Arabic."
-        elif language == "en":
-            lang_instruction = "Write the entire email in natural-sounding professional English."
-        else:
-            lang_instruction = (
-                "If the customer nationality is from GCC, Egypt, Levant, Sudan, or Iraq, "
-                "prefer Arabic. Otherwise use English. Ensure translation quality is flawless."
-            )
-
-        # -------------------------------
-        # TONE STYLES (persona overrides may adjust this)
-        # -------------------------------
-        tone_map = {
-            "direct": "concise, action-driven, and urgent",
-            "warm": "friendly, emotional, and human",
-            "warm_consultative": "empathetic, advisory, patient, and trust-building",
-            "informative": "clear, factual, structured, and helpful",
-            "reassuring": "supportive, calming, and positive",
-            "neutral": "simple, polite, and professional",
+        persona = f"{customer_info.get('persona_name', 'General Customer')} {customer_info.get('persona_emoji', '')}"
+
+        return {
+            "name": customer_info["name"],
+            "nationality": customer_info.get("nationality", "Unknown"),
+            "car": customer_info["car_model"],
+            "days_left": customer_info["days_until_lease_end"],
+            "churn": f"{churn} ({score:.2f})",
+            "reason": reason,
+            "persona": persona.strip(),
+            "traits": customer_info.get(
+                "persona_style",
+                "No behavior data available. Use a professional but warm style."
+            ),
+            "offer": offer,
+            "tone": tone_style(tone, PERSONA_TONE_STYLES),
+            "language": language or "auto",
         }
-
-        tone_style = tone_map.get(tone, "professional and friendly")
-
-        # -------------------------------
-        # FINAL PROMPT
-        # -------------------------------
-        return f"""
-Write a renewal email *fully tailored* to the customer's persona, culture, and situation.
-
-### CUSTOMER PROFILE
-- Name: {name}
-- Nationality: {nationality}
-- Car Model: {car}
-- Days until lease end: {days}
-- Churn Risk: {churn} (score {score:.2f})
-- Reason for contact: {reason}
-
-### PERSONA DETAILS
-- Persona Type: {persona_name} {persona_emoji}
-- Behavioral Traits: {persona_style}
-- Adapt the writing style, tone, emotional intensity, structure, and negotiation strategy to this persona.
-
-### OFFER TO INCLUDE
-{offer}
-
-### EMAIL REQUIREMENTS
-1. Tone style to follow: **{tone_style}**
-2. {lang_instruction}
-3. Make the email STRUCTURE different depending on the persona:
-   - High-Urgency personas → strong opening, bold CTA, short message
-   - Analytical personas → structured bullets, logic, clarity
-   - Price-sensitive personas → value justification, savings emphasis
-   - Relationship personas → empathy, reassurance, human warmth
-   - Busy Executive personas → extremely concise, no fluff
-4. Reference the reason for contact naturally and in the persona’s preferred communication style.
-5. Do NOT repeat the reason text word-for-word; reinterpret it.
-6. Make the offer sound tailored — explain *why this customer* is receiving it.
-7. Close with a CTA appropriate for the persona (assertive, soft, detailed, or minimal).
-8. DO NOT invent financial details or numbers.
-
-Write the email now.
-"""
@@ -1,13 +1,238 @@
+"""
+Persona discovery.
+
+discover_personas(): LLM invents personas from a describe() summary of a
+small sample (quick look).
+
+discover_persona_clusters(): clusters every customer locally and only
+asks the LLM to name the centroids —
+    1. one scaler pass: StandardScaler partial_fit over every chunk
+       (log1p on heavy-tailed amounts)
+    2. one training pass: MiniBatchKMeans partial_fit on the chunks
+       scaled with the now fixed scaler (missing values → the mean)
+    3. one assignment pass: cluster per customer + centroid table
+       (size, feature means in original units, dominant categories)
+    4. one LLM call naming / describing the centroids
+Input is a DataFrame or a CSV path read in chunks, so memory stays flat
+for millions of rows.
+"""
+
+import numpy as np
 import pandas as pd
-from openai import OpenAI
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from src.features.tone_extractor import parse_json
+from src.llm.gateway import get_gateway
+from src.models.churn_model import FEATURE_ALIASES
+
+# Behavioural features; whichever are present in the data are used
+CLUSTER_FEATURES = [
+    "age",
+    "monthly_payment",
+    "total_amount_paid",
+    "total_missed_payments",
+    "total_late_days",
+    "avg_late_days",
+    "complaint_count",
+    "call_count",
+    "avg_call_satisfaction",
+    "num_service_visits",
+    "avg_service_satisfaction",
+    "num_sales_interactions",
+    "successful_sales_interactions",
+    "remaining_months",
+    "churn_prob",
+]
+# master-table names → feature names (both master builders are accepted)
+COLUMN_ALIASES = {**FEATURE_ALIASES, "sales_interactions": "num_sales_interactions"}
+LOG_FEATURES = {"monthly_payment", "total_amount_paid", "total_late_days"}
+PROFILE_CATEGORIES = ["nationality", "segment", "loyalty_tier"]
+
+DEFAULT_N_CLUSTERS = 6
+DEFAULT_CHUNKSIZE = 100_000
+NAMING_FIELDS = (
+    "persona_name", "description", "communication_tone",
+    "renewal_motivators", "churn_triggers", "recommended_strategy",
+)
+
+
+def _iter_chunks(data, chunksize, columns=None):
+    """
+    DataFrame slices, or CSV chunks restricted to the wanted columns;
+    master-table names (total_paid, ...) are mapped to the feature names.
+    """
+    if isinstance(data, pd.DataFrame):
+        chunks = (data.iloc[start:start + chunksize] for start in range(0, len(data), chunksize))
+    else:
+        wanted = set(columns) | set(COLUMN_ALIASES) if columns is not None else None
+        usecols = (lambda c: c in wanted) if wanted is not None else None
+        chunks = pd.read_csv(data, chunksize=chunksize, usecols=usecols, low_memory=False)
+
+    for chunk in chunks:
+        rename = {k: v for k, v in COLUMN_ALIASES.items() if k in chunk.columns and v not in chunk.columns}
+        yield chunk.rename(columns=rename) if rename else chunk
+
+
+def _feature_block(chunk, features):
+    X = chunk.reindex(columns=features).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    for j, name in enumerate(features):
+        if name in LOG_FEATURES:
+            X[:, j] = np.log1p(np.clip(X[:, j], 0, None))
+    return X
 
-client = OpenAI()
 
 class LLMPersonaDiscovery:
 
     def __init__(self, model="gpt-4.1"):
         self.model = model
 
+    # --------------------------------------------
+    # Clustering mode
+    # --------------------------------------------
+    def fit_clusters(self, data, n_clusters=DEFAULT_N_CLUSTERS, chunksize=DEFAULT_CHUNKSIZE,
+                     features=None, random_state=42):
+        """
+        Two streaming passes; returns (scaler, kmeans, features).
+        The scaler sees every row first, so k-means trains on one fixed scale.
+        """
+        scaler = StandardScaler()
+        wanted = set(features or CLUSTER_FEATURES)
+        for chunk in _iter_chunks(data, chunksize, wanted):
+            if features is None:
+                features = [c for c in CLUSTER_FEATURES if c in chunk.columns]
+            scaler.partial_fit(_feature_block(chunk, features))
+
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state,
+                                 batch_size=min(chunksize, 4096), n_init=3)
+        pending = None
+        for chunk in _iter_chunks(data, chunksize, set(features or ())):
+            X = _feature_block(chunk, features)
+
+            # k-means needs at least n_clusters rows in its first batch
+            pending = X if pending is None else np.vstack([pending, X])
+            if len(pending) < n_clusters:
+                continue
+            kmeans.partial_fit(np.nan_to_num(scaler.transform(pending)))
+            pending = None
+
+        if not hasattr(kmeans, "cluster_centers_"):
+            raise ValueError(f"Need at least {n_clusters} customers to build {n_clusters} clusters")
+        return scaler, kmeans, features
+
+    def assign_clusters(self, data, scaler, kmeans, features, chunksize=DEFAULT_CHUNKSIZE, key="customer_id"):
+        """Cluster per customer plus the centroid table (after fit_clusters)."""
+        k = kmeans.n_clusters
+        sizes = np.zeros(k)
+        sums = np.zeros((k, len(features)))
+        counts = np.zeros((k, len(features)))
+        categories = {col: [] for col in PROFILE_CATEGORIES}
+        assignments = []
+
+        wanted = set(features) | {key} | set(PROFILE_CATEGORIES)
+        for chunk in _iter_chunks(data, chunksize, wanted):
+            Z = np.nan_to_num(scaler.transform(_feature_block(chunk, features)))
+            labels = kmeans.predict(Z)
+            distance = np.linalg.norm(Z - kmeans.cluster_centers_[labels], axis=1)
+
+            raw = chunk.reindex(columns=features).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+            present = ~np.isnan(raw)
+            np.add.at(sizes, labels, 1)
+            np.add.at(sums, labels, np.where(present, raw, 0.0))
+            np.add.at(counts, labels, present)
+
+            for col in categories:
+                if col in chunk.columns:
+                    categories[col].append(
+                        pd.DataFrame({"cluster": labels, col: chunk[col].to_numpy()})
+                        .value_counts().rename("n")
+                    )
+
+            assignments.append(pd.DataFrame({
+                key: chunk[key].to_numpy() if key in chunk.columns else chunk.index.to_numpy(),
+                "cluster": labels,
+                "distance": distance.round(4),
+            }))
+
+        centroids = pd.DataFrame(
+            np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0),
+            columns=features,
+        ).round(2)
+        centroids.insert(0, "cluster", np.arange(k))
+        centroids.insert(1, "size", sizes.astype(int))
+        centroids.insert(2, "share", (sizes / max(sizes.sum(), 1)).round(3))
+
+        for col, parts in categories.items():
+            if parts:
+                counts_by = pd.concat(parts).groupby(level=[0, 1]).sum()
+                top = counts_by.reset_index().sort_values("n", ascending=False).drop_duplicates("cluster")
+                centroids[f"top_{col}"] = centroids["cluster"].map(top.set_index("cluster")[col])
+
+        return pd.concat(assignments, ignore_index=True), centroids
+
+    def name_clusters(self, centroids):
+        """One LLM call naming every centroid; falls back to 'Persona <n>'."""
+        prompt = f"""
+You are an automotive customer behavior expert.
+
+Each row below is one customer cluster found by k-means over ALL customers of a dealership:
+its size, share, mean behaviour (amounts, payments, complaints, service, satisfaction,
+sales contacts, remaining lease months, churn probability) and dominant categories.
+
+CLUSTER CENTROIDS:
+{centroids.to_csv(index=False)}
+
+Name and describe each cluster as a persona. Reply with JSON:
+{{"personas": [{{"cluster": <int>, {", ".join(f'"{f}": "..."' for f in NAMING_FIELDS)}}}]}}
+with exactly one entry per cluster.
+"""
+
+        text = get_gateway().chat_text(
+            [
+                {"role": "system", "content": "You name customer segments found by clustering."},
+                {"role": "user", "content": prompt}
+            ],
+            model=self.model,
+            temperature=0.3,
+            tag="persona_discovery",
+            response_format={"type": "json_object"},
+        )
+
+        data = parse_json(text)
+        personas = data.get("personas") if isinstance(data, dict) else data
+        by_cluster = {}
+        for persona in personas if isinstance(personas, list) else []:
+            if isinstance(persona, dict) and str(persona.get("cluster", "")).isdigit():
+                by_cluster[int(persona["cluster"])] = persona
+
+        named = centroids.copy()
+        for field in NAMING_FIELDS:
+            named[field] = [
+                by_cluster.get(c, {}).get(field) or (f"Persona {c + 1}" if field == "persona_name" else None)
+                for c in named["cluster"]
+            ]
+        if len(by_cluster) < len(named):
+            print(f"⚠ LLM named {len(by_cluster)} of {len(named)} clusters; the rest keep generic names.")
+        return named
+
+    def discover_persona_clusters(self, data, n_clusters=DEFAULT_N_CLUSTERS, chunksize=DEFAULT_CHUNKSIZE,
+                                  key="customer_id", name=True):
+        """
+        Cluster all customers (DataFrame or CSV path) and name the centroids.
+        Returns (assignments, centroids): customer → cluster / persona_name,
+        and one row per cluster with its profile and LLM description.
+        """
+        scaler, kmeans, features = self.fit_clusters(data, n_clusters, chunksize)
+        assignments, centroids = self.assign_clusters(data, scaler, kmeans, features, chunksize, key)
+
+        if name:
+            centroids = self.name_clusters(centroids)
+            assignments["persona_name"] = assignments["cluster"].map(centroids.set_index("cluster")["persona_name"])
+        return assignments, centroids
+
+    # --------------------------------------------
+    # Summary mode
+    # --------------------------------------------
     def discover_personas(self, df: pd.DataFrame, sample_size=60):
         """
         Efficient LLM persona discovery using compressed statistical summary.
@@ -73,13 +298,14 @@ IMPORTANT:
 Return ONLY JSON (a list of persona objects).
 """
 
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[
+        response = get_gateway().chat(
+            [
                 {"role": "system", "content": "You derive customer personas from dataset summaries."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3
+            model=self.model,
+            temperature=0.3,
+            tag="persona_discovery",
         )
 
         # FIX: correct extraction for new OpenAI SDK  
@@ -1,7 +1,88 @@
-from openai import OpenAI
-client = OpenAI()
+"""
+Tone signals from call-center transcripts.
 
+extract_tone_signals(): one transcript → parsed signals dict.
+
+BatchToneExtractor: the whole customer base in few requests —
+    • one transcript per customer (all of its calls, in date order)
+    • many transcripts packed per request under an input-token budget
+    • JSON results validated field by field; customers missing from a
+      packed answer are retried one by one
+    • requests run concurrently (shared limiter / retries as for drafts)
+    • preferred_tone / preferred_language written to CustomerMemoryDB in
+      bulk, with a content hash per customer so unchanged transcripts are
+      skipped on the next run
+"""
+import hashlib
+import json
+import re
+
+import pandas as pd
+
+from src.agent.concurrency import DEFAULT_MAX_RETRIES, map_ordered, retry_with_backoff
+from src.llm.gateway import get_gateway
+from src.llm.prompts import count_tokens
+from src.memory.customer_memory_db import CustomerMemoryDB
+
+TONE_MODEL = "gpt-4.1-mini"
+
+ALLOWED_VALUES = {
+    "preferred_language": {"en", "ar"},
+    "preferred_tone": {"warm_consultative", "premium_concise", "apologetic_recovery", "direct_transactional"},
+    "frustration_level": {"low", "medium", "high"},
+    "price_sensitivity": {"low", "medium", "high"},
+    "closure_preference": {"direct", "soft", "detailed"},
+}
+TEXT_FIELDS = ("emotional_style", "notes")
+MAX_TEXT_CHARS = 300
+
+TRANSCRIPT_COLUMNS = ("issue", "resolution", "notes")
+DEFAULT_REQUEST_BUDGET = 6000     # input tokens per packed request
+DEFAULT_MAX_PER_REQUEST = 25      # keeps each JSON answer well under the output limit
+MAX_TRANSCRIPT_TOKENS = 600       # longer transcripts keep their most recent calls
+DEFAULT_WRITE_EVERY = 40          # requests per bulk memory write
+
+
+# ============================================================
+# Parsing / validation
+# ============================================================
+def parse_json(text):
+    """JSON payload of a model answer (tolerates ``` fences); None if unparseable."""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", (text or "").strip())
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def validate_signals(obj):
+    """
+    Cleaned signals dict, or None when neither tone nor language is usable.
+    Values outside the allowed sets become None.
+    """
+    if not isinstance(obj, dict):
+        return None
+
+    signals = {}
+    for field, allowed in ALLOWED_VALUES.items():
+        value = obj.get(field)
+        value = value.strip().lower() if isinstance(value, str) else None
+        signals[field] = value if value in allowed else None
+
+    for field in TEXT_FIELDS:
+        value = obj.get(field)
+        signals[field] = str(value).strip()[:MAX_TEXT_CHARS] if value else None
+
+    if signals["preferred_tone"] is None and signals["preferred_language"] is None:
+        return None
+    return signals
+
+
+# ============================================================
+# Single transcript
+# ============================================================
 def extract_tone_signals(call_transcript: str) -> dict:
+    """Signals for one transcript ({} when the answer does not validate)."""
     prompt = f"""
 Analyze the following customer call and extract communication behavior patterns.
 
@@ -22,10 +103,236 @@ Return a JSON with:
 - notes: short plain text summary
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1
+    text = get_gateway().chat_text(
+        [{"role": "user", "content": prompt}],
+        model=TONE_MODEL,
+        temperature=0.1,
+        tag="tone_extraction",
+        response_format={"type": "json_object"},
     )
 
-    return response.choices[0].message.content
+    return validate_signals(parse_json(text)) or {}
+
+
+# ============================================================
+# Transcripts + packing
+# ============================================================
+def _call_order(calls, date_col, id_col):
+    """
+    Sort key putting each customer's calls oldest first: call_date when
+    the table has it, else call_id (the real call_center has no dates;
+    ids grow over time), numerically when every id is a number.
+    """
+    if date_col in calls.columns:
+        return pd.to_datetime(calls[date_col], errors="coerce")
+    if id_col in calls.columns:
+        ids = pd.to_numeric(calls[id_col], errors="coerce")
+        return ids if ids.notna().all() else calls[id_col].astype("string")
+    return None
+
+
+def build_transcripts(call_center, key="customer_id", date_col="call_date", id_col="call_id",
+                      columns=TRANSCRIPT_COLUMNS):
+    """
+    customer_id → one transcript per customer, one line per call, oldest
+    first (see _call_order; file order when neither column exists).
+    """
+    columns = [c for c in columns if c in call_center.columns]
+    calls = call_center.dropna(subset=[key])
+    order = _call_order(calls, date_col, id_col)
+    if order is not None:
+        calls = calls.assign(_when=order).sort_values([key, "_when"], kind="stable")
+
+    parts = calls[columns].astype("string").fillna("")
+    lines = parts.agg(" | ".join, axis=1).str.strip(" |")
+    lines = lines[lines != ""]
+
+    transcripts = lines.groupby(calls.loc[lines.index, key].astype(str), sort=True).agg("\n".join)
+    transcripts.index.name = key
+    return transcripts
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _clip(text, max_tokens):
+    """Keep the last lines (most recent calls, see build_transcripts) within max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    lines = text.split("\n")
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)[-max_tokens * 4:]
+
+
+def _entry(customer_id, text):
+    return f"### {customer_id}\n{text}\n"
+
+
+def pack_transcripts(items, budget=DEFAULT_REQUEST_BUDGET, max_per_request=DEFAULT_MAX_PER_REQUEST,
+                     max_transcript_tokens=MAX_TRANSCRIPT_TOKENS):
+    """
+    Greedily pack (customer_id, text) items into requests whose input
+    (static instructions + transcripts) stays within budget tokens.
+    """
+    fixed = count_tokens(BATCH_SYSTEM) + count_tokens(BATCH_HEADER) + 8
+    packs, current, used = [], [], fixed
+
+    for customer_id, text in items:
+        text = _clip(text, max_transcript_tokens)
+        cost = count_tokens(_entry(customer_id, text))
+        if current and (used + cost > budget or len(current) >= max_per_request):
+            packs.append(current)
+            current, used = [], fixed
+        current.append((customer_id, text))
+        used += cost
+
+    if current:
+        packs.append(current)
+    return packs
+
+
+# ============================================================
+# Batch extraction
+# ============================================================
+BATCH_SYSTEM = """
+You analyse automotive customers' call-center transcripts and extract their communication behaviour.
+Each transcript starts with "### <customer_id>".
+
+Reply with JSON: {"results": [ ... ]} holding exactly one object per customer_id, with keys:
+- customer_id: as given
+- preferred_language: "en" or "ar"
+- preferred_tone: "warm_consultative", "premium_concise", "apologetic_recovery" or "direct_transactional"
+- frustration_level: "low", "medium" or "high"
+- price_sensitivity: "low", "medium" or "high"
+- emotional_style: one sentence
+- closure_preference: "direct", "soft" or "detailed"
+- notes: short plain-text summary
+""".strip()
+
+BATCH_HEADER = "TRANSCRIPTS"
+
+
+class BatchToneExtractor:
+    """
+    Extracts tone signals for many customers and stores them in memory.
+
+    request_budget / max_per_request: packing limits per request.
+    limiter: optional RateLimiter; transient errors are retried with backoff.
+    """
+
+    def __init__(self, memory=None, model=TONE_MODEL, request_budget=DEFAULT_REQUEST_BUDGET,
+                 max_per_request=DEFAULT_MAX_PER_REQUEST, max_workers=8, limiter=None,
+                 max_retries=DEFAULT_MAX_RETRIES, write_every=DEFAULT_WRITE_EVERY, gateway=None):
+        self.memory = memory or CustomerMemoryDB()
+        self.model = model
+        self.request_budget = request_budget
+        self.max_per_request = max_per_request
+        self.max_workers = max_workers
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.write_every = write_every
+        self._gateway = gateway
+
+    @property
+    def gateway(self):
+        return self._gateway or get_gateway()
+
+    def build_messages(self, pack):
+        body = BATCH_HEADER + "\n\n" + "\n".join(_entry(cid, text) for cid, text in pack)
+        return [
+            {"role": "system", "content": BATCH_SYSTEM},
+            {"role": "user", "content": body},
+        ]
+
+    def _request(self, pack):
+        """customer_id → validated signals for one packed request."""
+        messages = self.build_messages(pack)
+        tokens = sum(count_tokens(m["content"]) for m in messages) + 80 * len(pack)
+
+        def call():
+            if self.limiter is not None:
+                self.limiter.acquire(tokens)
+            return self.gateway.chat_text(
+                messages, self.model, temperature=0.1, tag="tone_extraction",
+                response_format={"type": "json_object"},
+            )
+
+        data = parse_json(retry_with_backoff(call, max_retries=self.max_retries))
+        results = data.get("results") if isinstance(data, dict) else data
+        wanted = {cid for cid, _ in pack}
+
+        found = {}
+        for obj in results if isinstance(results, list) else []:
+            cid = str(obj.get("customer_id")) if isinstance(obj, dict) else None
+            signals = validate_signals(obj) if cid in wanted else None
+            if signals:
+                found[cid] = signals
+        return found
+
+    def _safe_request(self, pack):
+        try:
+            return self._request(pack)
+        except Exception as exc:
+            print(f"⚠ Tone extraction failed for {len(pack)} transcripts: {type(exc).__name__}: {exc}")
+            return {}
+
+    def _run_wave(self, packs):
+        results = map_ordered(self._safe_request, packs, self.max_workers)
+        found = {}
+        for result in results:
+            found.update(result)
+
+        # Customers a packed answer skipped or garbled get one single-transcript retry
+        retry = [[item] for pack in packs if len(pack) > 1 for item in pack if item[0] not in found]
+        if retry:
+            for result in map_ordered(self._safe_request, retry, self.max_workers):
+                found.update(result)
+        return found, len(packs) + len(retry)
+
+    def run(self, transcripts, force=False):
+        """
+        transcripts: Series customer_id → transcript (see build_transcripts).
+        force=True re-extracts customers whose transcripts did not change.
+        Returns a summary dict.
+        """
+        hashes = {str(cid): content_hash(text) for cid, text in transcripts.items()}
+        done = {} if force else self.memory.tone_source_hashes()
+        todo = [(str(cid), text) for cid, text in transcripts.items() if done.get(str(cid)) != hashes[str(cid)]]
+
+        packs = pack_transcripts(todo, self.request_budget, self.max_per_request)
+        summary = {
+            "customers": len(hashes),
+            "skipped": len(hashes) - len(todo),
+            "extracted": 0,
+            "failed": 0,
+            "requests": 0,
+        }
+        print(f"🗣 {len(todo)} transcripts to analyse ({summary['skipped']} unchanged) in {len(packs)} requests.")
+
+        for start in range(0, len(packs), self.write_every):
+            wave = packs[start:start + self.write_every]
+            found, n_requests = self._run_wave(wave)
+
+            records = [
+                {
+                    "customer_id": cid,
+                    "preferred_tone": signals["preferred_tone"],
+                    "preferred_language": signals["preferred_language"],
+                    "content_hash": hashes[cid],
+                    "signals": json.dumps(signals, ensure_ascii=False),
+                }
+                for cid, signals in found.items()
+            ]
+            self.memory.save_tones_bulk(records)
+
+            summary["extracted"] += len(records)
+            summary["failed"] += sum(len(pack) for pack in wave) - len(records)
+            summary["requests"] += n_requests
+
+        print(
+            f"✅ Tone signals stored for {summary['extracted']} customers "
+            f"({summary['failed']} failed, {summary['requests']} requests)."
+        )
+        return summary
@@ -0,0 +1,121 @@
+"""
+Rolling time-window behaviour features.
+
+Lifetime totals treat a missed payment five years ago like one last
+month. These features count / sum events in the last 30/90/180/365 days
+before an as-of date, for all customers at once, using the presorted
+event arrays in EventIndex (one searchsorted per window edge).
+"""
+import numpy as np
+import pandas as pd
+
+from src.data.aggregate import customer_index
+from src.features.churn_features import resolve_as_of
+from src.features.event_index import EVENT_DATE_COLUMNS, EventIndex
+
+WINDOWS = (30, 90, 180, 365)
+
+# feature prefix → (table, column to sum; None counts events)
+WINDOW_FEATURES = {
+    "missed_payments": ("payments", "missed_payment"),
+    "late_days": ("payments", "late_days"),
+    "complaints": ("complaints", None),
+    "calls": ("call_center", None),
+    "service_visits": ("service_history", None),
+}
+
+
+# tables compute_window_features reads
+WINDOW_TABLES = {table for table, _ in WINDOW_FEATURES.values()} | {"sales_interactions"}
+
+
+def window_column(prefix, days):
+    return f"{prefix}_{days}d"
+
+
+def window_event_rows(table, rows, as_of=None, windows=WINDOWS, key="customer_id"):
+    """
+    The part of an event table that compute_window_features reads at
+    as_of: rows inside the widest window, or for sales_interactions each
+    customer's latest interaction up to as_of. Lets callers that stream a
+    table chunk by chunk keep only this much of it (apply again to the
+    concatenated chunks). None when the table has no date column.
+    """
+    date_col = EVENT_DATE_COLUMNS[table]
+    if date_col not in rows.columns:
+        return None
+    as_of = resolve_as_of(as_of)
+    dates = pd.to_datetime(rows[date_col], errors="coerce")
+    until = dates < as_of + pd.Timedelta(days=1)
+
+    if table == "sales_interactions":
+        latest = rows.loc[until, [key, date_col]].sort_values(date_col, kind="stable")
+        return latest.drop_duplicates(key, keep="last")
+
+    columns = [key, date_col] + [col for t, col in WINDOW_FEATURES.values() if t == table and col in rows.columns]
+    since = dates >= as_of - pd.Timedelta(days=max(windows))
+    return rows.loc[since & until, list(dict.fromkeys(columns))]
+
+
+def compute_window_features(tables, as_of=None, windows=WINDOWS, key="customer_id"):
+    """
+    Windowed features for every customer in tables["customers"].
+
+    Window w covers events in (as_of - w days, as_of]. Tables without a
+    usable date column are skipped with a warning. Returns a DataFrame
+    indexed by customer_id, plus days_since_last_sales_interaction
+    (NaN when the customer never had one).
+    """
+    as_of = resolve_as_of(as_of)
+    index = customer_index(tables["customers"], key)
+    codes = np.arange(len(index), dtype=np.int64)
+    today = np.full(len(index), as_of.to_datetime64().astype("datetime64[D]").astype(np.int64))
+
+    # one sorted index per table, shared by all its features
+    needed = {}
+    for table, col in WINDOW_FEATURES.values():
+        needed.setdefault(table, set())
+        if col is not None:
+            needed[table].add(col)
+    needed.setdefault("sales_interactions", set())
+
+    indexes = {}
+    for table, cols in needed.items():
+        df, date_col = tables.get(table), EVENT_DATE_COLUMNS[table]
+        if df is None or date_col not in df.columns or any(c not in df.columns for c in cols):
+            print(f"⚠ {table}: no '{date_col}' column — skipping its window features.")
+            continue
+        indexes[table] = EventIndex(df, date_col, index, sorted(cols), key=key)
+
+    out = {}
+    for prefix, (table, col) in WINDOW_FEATURES.items():
+        events = indexes.get(table)
+        if events is None:
+            continue
+        for w in windows:
+            start = today - w
+            if col is None:
+                out[window_column(prefix, w)] = events.count(codes, today, start)
+            else:
+                out[window_column(prefix, w)] = events.sum(col, codes, today, start)
+
+    sales = indexes.get("sales_interactions")
+    if sales is not None:
+        out["days_since_last_sales_interaction"] = today - sales.last_day(codes, today)
+
+    return pd.DataFrame(out, index=pd.Index(index, name=key))
+
+
+def add_window_features(df, tables, as_of=None, windows=WINDOWS, key="customer_id"):
+    """Left-join windowed features onto a master/featured frame (0 for unknown customers)."""
+    features = compute_window_features(tables, as_of, windows, key)
+    df = df.copy()
+    pos = features.index.get_indexer(df[key])
+    hit = pos >= 0
+    for col in features.columns:
+        values = features[col].to_numpy(dtype=np.float64)
+        # counts / sums default to 0; "days since" stays unknown
+        filled = np.full(len(df), np.nan if col.startswith("days_since") else 0.0)
+        filled[hit] = values[pos[hit]]
+        df[col] = filled
+    return df
@@ -0,0 +1 @@
+# Makes the llm folder importable
@@ -0,0 +1,262 @@
+"""
+Shared LLM gateway.
+
+Every module that talks to the LLM goes through get_gateway() instead of
+creating its own OpenAI client at import time:
+
+    • lazy  – nothing is imported or connected until the first call, so
+      importing the agent / features modules needs no API key
+    • one keep-alive HTTP pool shared by all callers and threads
+    • configurable connect / read timeouts (per call overrides: timeout=,
+      max_retries=)
+    • no SDK retries by default: callers retry through
+      src.agent.concurrency.retry_with_backoff, which goes back through
+      their RateLimiter (SDK retries would stack on top and bypass it)
+    • per-call latency and token accounting (gateway.stats(), by tag),
+      including time-to-first-token for streamed calls
+    • pluggable backend – benchmarks and manual tests point it at the
+      local fake server:
+
+        configure(base_url=server.base_url, api_key="fake")
+
+A backend is any object with complete(**request) returning an OpenAI
+chat.completion response, or an iterable of chat.completion.chunk objects
+when request["stream"] is set (and .client for APIs beyond chat, e.g. batch).
+"""
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_MODEL = "gpt-4.1-mini"
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_KEEPALIVE = 32
+DEFAULT_MAX_RETRIES = 0  # retry policy lives in retry_with_backoff
+RECENT_CALLS = 1000
+
+
+class OpenAIBackend:
+    """OpenAI (or OpenAI-compatible) API on one shared keep-alive pool."""
+
+    def __init__(self, base_url=None, api_key=None, timeout=DEFAULT_TIMEOUT,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive=DEFAULT_MAX_KEEPALIVE, max_retries=DEFAULT_MAX_RETRIES):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_retries = max_retries
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient, OpenAI, Timeout
+
+        # Same Limits class as the transport the installed SDK ships with
+        limits = type(DEFAULT_CONNECTION_LIMITS)(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+        )
+        timeout = Timeout(self.timeout, connect=self.connect_timeout)
+
+        return OpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            timeout=timeout,
+            max_retries=self.max_retries,
+            http_client=DefaultHttpxClient(limits=limits, timeout=timeout),
+        )
+
+    def complete(self, **request):
+        max_retries = request.pop("max_retries", None)
+        client = self.client if max_retries is None else self.client.with_options(max_retries=max_retries)
+        return client.chat.completions.create(**request)
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class LLMGateway:
+    """Single entry point for chat completions, with accounting."""
+
+    def __init__(self, backend=None, default_model=DEFAULT_MODEL):
+        self.backend = backend or OpenAIBackend()
+        self.default_model = default_model
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=RECENT_CALLS)
+        self.totals = {}
+
+    @property
+    def client(self):
+        """Underlying OpenAI client (batch / files APIs)."""
+        return self.backend.client
+
+    # --------------------------------------------------------
+    # Calls
+    # --------------------------------------------------------
+    def chat(self, messages, model=None, temperature=None, tag="default", **kwargs):
+        """One chat completion; kwargs go straight to the backend (e.g. timeout=)."""
+        request = {"model": model or self.default_model, "messages": messages, **kwargs}
+        if temperature is not None:
+            request["temperature"] = temperature
+
+        start = time.perf_counter()
+        try:
+            response = self.backend.complete(**request)
+        except Exception as exc:
+            self._record(tag, request["model"], time.perf_counter() - start, error=type(exc).__name__)
+            raise
+
+        usage = getattr(response, "usage", None)
+        self._record(
+            tag, request["model"], time.perf_counter() - start,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        )
+        return response
+
+    def chat_text(self, messages, model=None, temperature=None, tag="default", **kwargs):
+        """chat(), returning the stripped message content."""
+        response = self.chat(messages, model, temperature, tag, **kwargs)
+        return response.choices[0].message.content.strip()
+
+    def stream(self, messages, model=None, temperature=None, tag="default", **kwargs):
+        """
+        Streamed chat completion: yields content deltas as they arrive.
+        API errors surface on the first next().
+        """
+        request = {
+            "model": model or self.default_model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            **kwargs,
+        }
+        if temperature is not None:
+            request["temperature"] = temperature
+
+        start = time.perf_counter()
+        ttft, usage = None, None
+        try:
+            for chunk in self.backend.complete(**request):
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    yield piece
+        except Exception as exc:
+            self._record(tag, request["model"], time.perf_counter() - start, error=type(exc).__name__, ttft=ttft)
+            raise
+
+        self._record(
+            tag, request["model"], time.perf_counter() - start,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            ttft=ttft,
+        )
+
+    # --------------------------------------------------------
+    # Accounting
+    # --------------------------------------------------------
+    def _record(self, tag, model, latency, prompt_tokens=0, completion_tokens=0, error=None, ttft=None):
+        call = {
+            "tag": tag,
+            "model": model,
+            "latency": latency,
+            "ttft": ttft,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "error": error,
+        }
+        with self.lock:
+            self.recent.append(call)
+            totals = self.totals.setdefault(tag, {
+                "calls": 0, "errors": 0, "latency": 0.0, "max_latency": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "streamed": 0, "ttft": 0.0,
+            })
+            totals["calls"] += 1
+            totals["errors"] += error is not None
+            totals["latency"] += latency
+            totals["max_latency"] = max(totals["max_latency"], latency)
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            if ttft is not None:
+                totals["streamed"] += 1
+                totals["ttft"] += ttft
+
+    def stats(self):
+        """Per-tag totals plus mean latency, e.g. {"sales_email": {...}}."""
+        with self.lock:
+            out = {tag: dict(t) for tag, t in self.totals.items()}
+        for totals in out.values():
+            totals["mean_latency"] = totals["latency"] / totals["calls"] if totals["calls"] else 0.0
+            totals["mean_ttft"] = totals["ttft"] / totals["streamed"] if totals["streamed"] else None
+        return out
+
+    def reset_stats(self):
+        with self.lock:
+            self.recent.clear()
+            self.totals.clear()
+
+    def print_stats(self):
+        for tag, t in sorted(self.stats().items()):
+            print(
+                f"📊 {tag}: {t['calls']} calls, {t['errors']} errors, "
+                f"mean {t['mean_latency'] * 1000:.0f} ms, max {t['max_latency'] * 1000:.0f} ms, "
+                f"{t['prompt_tokens']} prompt + {t['completion_tokens']} completion tokens"
+                + (f", mean TTFT {t['mean_ttft'] * 1000:.0f} ms" if t["mean_ttft"] is not None else "")
+            )
+
+    def close(self):
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            close()
+
+
+# ============================================================
+# Shared instance
+# ============================================================
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The process-wide gateway (created on first use)."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(default_model=os.environ.get("LLM_MODEL", DEFAULT_MODEL))
+    return _gateway
+
+
+def configure(backend=None, **backend_kwargs):
+    """
+    Replace the shared gateway, e.g. configure(base_url=..., api_key="fake")
+    or configure(backend=MyBackend()). Returns the new gateway.
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is not None:
+            _gateway.close()
+        _gateway = LLMGateway(backend or OpenAIBackend(**backend_kwargs),
+                              default_model=os.environ.get("LLM_MODEL", DEFAULT_MODEL))
+    return _gateway
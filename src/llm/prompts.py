@@ -0,0 +1,217 @@
+"""
+Prompt templates with a static prefix and compact per-customer facts.
+
+Every instruction that does not depend on the customer (role, language
+rules, structure and writing rules) lives in one fixed system message,
+byte-identical across calls; the user message only carries a short
+"key: value" facts block. The saving is in the shorter prompts: the
+system prefixes here are well under the provider's minimum for prefix
+caching (PREFIX_CACHE_MIN_TOKENS), so they are not cached today.
+
+Each rendered prompt is counted (tiktoken when installed, else the
+chars/4 estimate) and checked against a token budget: optional facts are
+dropped, in the template's order, until the prompt fits; otherwise
+PromptBudgetError is raised.
+"""
+import threading
+
+DEFAULT_PROMPT_BUDGET = 800
+PREFIX_CACHE_MIN_TOKENS = 1024  # OpenAI only caches prompts at least this long
+FACTS_HEADER = "CUSTOMER FACTS"
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to the chars/4 estimate
+    tiktoken = None
+
+_encodings = {}
+
+
+def _encoding(model):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return _encodings[model]
+
+
+def count_tokens(text, model="gpt-4.1-mini"):
+    if tiktoken is None:
+        return max(1, len(text) // 4)
+    return len(_encoding(model).encode(text))
+
+
+def count_message_tokens(messages, model="gpt-4.1-mini"):
+    """Input tokens of a chat request (content + ~4 tokens framing per message)."""
+    return sum(count_tokens(m["content"], model) + 4 for m in messages)
+
+
+class PromptBudgetError(ValueError):
+    pass
+
+
+# ============================================================
+# Template
+# ============================================================
+class PromptTemplate:
+    """
+    system: static instructions (the shared prefix)
+    optional: fact keys that may be dropped, first to last, to fit the budget
+    budget: max input tokens per rendered prompt (None = unlimited)
+    """
+
+    def __init__(self, name, system, optional=(), budget=DEFAULT_PROMPT_BUDGET, model="gpt-4.1-mini"):
+        self.name = name
+        self.system = system.strip()
+        self.optional = tuple(optional)
+        self.budget = budget
+        self.model = model
+
+        self.lock = threading.Lock()
+        self.stats = {"rendered": 0, "tokens": 0, "max_tokens": 0, "trimmed": 0}
+
+    @staticmethod
+    def facts_block(facts):
+        lines = [FACTS_HEADER]
+        for key, value in facts.items():
+            if value is None or value == "":
+                continue
+            lines.append(f"{key}: {value}")
+        return "\n".join(lines)
+
+    def _messages(self, facts):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.facts_block(facts)},
+        ]
+
+    def render(self, facts):
+        """Chat messages for one request; facts is an ordered dict of short values."""
+        facts = dict(facts)
+        messages = self._messages(facts)
+        tokens = count_message_tokens(messages, self.model)
+        trimmed = False
+
+        if self.budget is not None:
+            for key in self.optional:
+                if tokens <= self.budget:
+                    break
+                if facts.pop(key, None) is not None:
+                    trimmed = True
+                    messages = self._messages(facts)
+                    tokens = count_message_tokens(messages, self.model)
+
+            if tokens > self.budget:
+                raise PromptBudgetError(
+                    f"Prompt '{self.name}' needs {tokens} tokens (budget {self.budget})"
+                )
+
+        with self.lock:
+            self.stats["rendered"] += 1
+            self.stats["tokens"] += tokens
+            self.stats["max_tokens"] = max(self.stats["max_tokens"], tokens)
+            self.stats["trimmed"] += trimmed
+        return messages
+
+    def prefix_tokens(self):
+        return count_tokens(self.system, self.model) + 4
+
+    def mean_tokens(self):
+        with self.lock:
+            return self.stats["tokens"] / self.stats["rendered"] if self.stats["rendered"] else 0.0
+
+
+# ============================================================
+# Shared instruction blocks
+# ============================================================
+TONE_STYLES = {
+    "direct": "short, clear, urgency-focused",
+    "warm": "friendly, reassuring, human",
+    "warm_consultative": "empathetic, advisory, relationship-focused",
+    "informative": "clear, factual, benefit-driven",
+    "reassuring": "soft, supportive, trust-building",
+    "neutral": "professional, simple, polite",
+    # tones learned from call transcripts (src.features.tone_extractor)
+    "premium_concise": "polished, brief, premium",
+    "apologetic_recovery": "apologetic, accountable, service-recovery focused",
+    "direct_transactional": "to the point, practical, no small talk",
+}
+
+PERSONA_TONE_STYLES = {
+    "direct": "concise, action-driven, urgent",
+    "warm": "friendly, emotional, human",
+    "warm_consultative": "empathetic, advisory, patient, trust-building",
+    "informative": "clear, factual, structured, helpful",
+    "reassuring": "supportive, calming, positive",
+    "neutral": "simple, polite, professional",
+    "premium_concise": "polished, brief, premium",
+    "apologetic_recovery": "apologetic, accountable, service-recovery focused",
+    "direct_transactional": "to the point, practical, no small talk",
+}
+
+
+DEFAULT_TONE_STYLE = "professional and friendly"
+
+
+def tone_style(tone, styles=TONE_STYLES):
+    """Short style description for a tone key (sent as the 'tone' fact)."""
+    return styles.get(tone, DEFAULT_TONE_STYLE)
+
+
+# Each writer keeps its own "auto" rule
+SALES_LANGUAGE_LINE = (
+    "Language: ar = Arabic; en = English; auto = Arabic if nationality is GCC "
+    "(UAE, KSA, Oman, Qatar, Bahrain, Kuwait), Jordan or Egypt, else English. Always professional."
+)
+PERSONA_LANGUAGE_LINE = (
+    "Language: ar = Arabic; en = English; auto = Arabic if nationality is GCC, Egypt, "
+    "Levant, Sudan or Iraq, else English. Always natural, flawless translation."
+)
+
+
+# ============================================================
+# Templates
+# ============================================================
+SALES_EMAIL_SYSTEM = f"""
+You are a professional automotive retention email writer who explains offers clearly and tactfully.
+Write a renewal email from the sales team to the customer in {FACTS_HEADER}.
+
+Follow the tone given in the facts.
+{SALES_LANGUAGE_LINE}
+
+Rules:
+- why_offer is internal rationale: use it to explain the offer's benefits naturally; never quote it or mention a system.
+- Show why the offer is valuable for this customer's situation.
+- No invented financial numbers or unrealistic claims.
+- Concise and warm; end with an invitation to contact the salesperson.
+- Reply with the email only.
+"""
+
+PERSONA_EMAIL_SYSTEM = f"""
+You are a highly skilled automotive retention strategist who writes human, persuasive, persona-tailored emails.
+Write a renewal email tailored to the persona, culture and situation of the customer in {FACTS_HEADER}.
+
+Follow the tone given in the facts.
+{PERSONA_LANGUAGE_LINE}
+
+Structure by persona: high-urgency = strong opening, bold CTA, short; analytical = bullets, logic;
+price-sensitive = value and savings; relationship = empathy, warmth; busy executive = very concise.
+
+Rules:
+- Reinterpret the reason naturally; never repeat it word-for-word.
+- Explain why this customer is getting the offer.
+- Close with a CTA that suits the persona.
+- No invented financial details or numbers.
+- Reply with the email only.
+"""
+
+
+def sales_email_template(budget=DEFAULT_PROMPT_BUDGET, model="gpt-4.1-mini"):
+    return PromptTemplate("sales_email", SALES_EMAIL_SYSTEM, optional=("why_offer", "nationality"),
+                          budget=budget, model=model)
+
+
+def persona_email_template(budget=DEFAULT_PROMPT_BUDGET, model="gpt-4.1-mini"):
+    return PromptTemplate("persona_email", PERSONA_EMAIL_SYSTEM, optional=("traits", "nationality"),
+                          budget=budget, model=model)
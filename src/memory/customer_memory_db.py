@@ -15,6 +15,10 @@ class CustomerMemoryDB:
         - last_feedback
         - revision_count
         - updated_at
+
+    tone_sources keeps the content hash (and parsed signals) of the call
+    transcripts each customer's tone was last extracted from, so batch
+    extraction can skip unchanged customers.
     """
 
     def __init__(self, db_path="customer_memory.db"):
@@ -39,6 +43,15 @@ class CustomerMemoryDB:
             )
         """)
 
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS tone_sources (
+                customer_id TEXT PRIMARY KEY,
+                content_hash TEXT,
+                signals TEXT,
+                processed_at TEXT
+            )
+        """)
+
         conn.commit()
         conn.close()
 
@@ -89,6 +102,56 @@ class CustomerMemoryDB:
         conn.commit()
         conn.close()
 
+    def save_tones_bulk(self, records):
+        """
+        Upsert extracted tones in one transaction.
+
+        records: dicts with customer_id, preferred_tone, preferred_language
+        and optionally content_hash / signals (JSON text) for tone_sources.
+        Feedback and revision counts are left untouched.
+        """
+        now = datetime.utcnow().isoformat()
+        conn = sqlite3.connect(self.db_path)
+
+        with conn:
+            conn.executemany("""
+                INSERT INTO customer_memory (
+                    customer_id, preferred_tone, preferred_language, revision_count, updated_at
+                )
+                VALUES (?, ?, ?, 0, ?)
+                ON CONFLICT(customer_id)
+                DO UPDATE SET
+                    preferred_tone=COALESCE(excluded.preferred_tone, customer_memory.preferred_tone),
+                    preferred_language=COALESCE(excluded.preferred_language, customer_memory.preferred_language),
+                    updated_at=excluded.updated_at
+            """, [
+                (str(r["customer_id"]), r.get("preferred_tone"), r.get("preferred_language"), now)
+                for r in records
+            ])
+
+            conn.executemany("""
+                INSERT INTO tone_sources (customer_id, content_hash, signals, processed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(customer_id)
+                DO UPDATE SET
+                    content_hash=excluded.content_hash,
+                    signals=excluded.signals,
+                    processed_at=excluded.processed_at
+            """, [
+                (str(r["customer_id"]), r["content_hash"], r.get("signals"), now)
+                for r in records if r.get("content_hash")
+            ])
+
+        conn.close()
+        return len(records)
+
+    def tone_source_hashes(self):
+        """customer_id → content hash of the transcripts last extracted."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT customer_id, content_hash FROM tone_sources").fetchall()
+        conn.close()
+        return dict(rows)
+
     # --------------------------------------------------------
     # Load memory
     # --------------------------------------------------------
@@ -134,5 +197,6 @@ class CustomerMemoryDB:
         cur = conn.cursor()
 
         cur.execute("DELETE FROM customer_memory")
+        cur.execute("DELETE FROM tone_sources")
         conn.commit()
         conn.close()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600   # 30 days
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def cache_key(model, temperature, system, prompt):
+    """Content address of one completion request."""
+    payload = json.dumps(
+        {"model": model, "temperature": temperature, "system": system, "prompt": prompt},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent, content-addressed cache of LLM completions (SQLite).
+
+    Entries are keyed by a hash of model, temperature, system message and
+    rendered prompt, expire after ttl_seconds, and the least recently used
+    ones are evicted beyond max_entries. Safe to share across threads.
+    """
+
+    def __init__(self, db_path="llm_response_cache.db", ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "writes": 0, "evicted": 0}
+        self._ensure_db()
+
+    # --------------------------------------------------------
+    # DB Initialization
+    # --------------------------------------------------------
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _ensure_db(self):
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                created_at REAL,
+                last_access REAL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_last_access ON llm_responses(last_access)")
+        conn.commit()
+        conn.close()
+
+    def _count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+    # --------------------------------------------------------
+    # Read / write
+    # --------------------------------------------------------
+    def get(self, key):
+        """Cached response text, or None when missing or expired."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT response FROM llm_responses WHERE key = ? AND created_at >= ?",
+            (key, now - self.ttl_seconds),
+        ).fetchone()
+
+        if row:
+            conn.execute(
+                "UPDATE llm_responses SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (now, key),
+            )
+            conn.commit()
+        conn.close()
+
+        self._count("hits" if row else "misses")
+        return row[0] if row else None
+
+    def put(self, key, response, model=None):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("""
+            INSERT INTO llm_responses (key, model, response, created_at, last_access, hits)
+            VALUES (?, ?, ?, ?, ?, 0)
+            ON CONFLICT(key) DO UPDATE SET
+                response=excluded.response,
+                created_at=excluded.created_at,
+                last_access=excluded.last_access
+        """, (key, model, response, now, now))
+        conn.commit()
+        self._evict(conn, now)
+        conn.close()
+        self._count("writes")
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used ones beyond max_entries."""
+        cur = conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        evicted = cur.rowcount
+
+        (count,) = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+        if count > self.max_entries:
+            cur = conn.execute("""
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM llm_responses ORDER BY last_access ASC LIMIT ?
+                )
+            """, (count - self.max_entries,))
+            evicted += cur.rowcount
+
+        conn.commit()
+        if evicted:
+            self._count("evicted", evicted)
+
+    def get_or_create(self, key, create_fn, model=None, bypass=False):
+        """
+        Cached response for key, else create_fn() (stored for next time).
+        bypass=True always calls create_fn and overwrites the entry ("regenerate").
+        """
+        if bypass:
+            self._count("bypassed")
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+        response = create_fn()
+        self.put(key, response, model)
+        return response
+
+    # --------------------------------------------------------
+    # Maintenance
+    # --------------------------------------------------------
+    def size(self):
+        conn = self._connect()
+        (count,) = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+        conn.close()
+        return count
+
+    def clear_all(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM llm_responses")
+        conn.commit()
+        conn.close()
@@ -0,0 +1 @@
+# Makes the models folder importable
@@ -0,0 +1,430 @@
+"""
+Churn scoring model.
+
+A HistGradientBoostingClassifier trained on point-in-time master
+features (see src/features/backfill.py), saved with joblib and applied
+to the whole featured frame in a single vectorized predict_proba call,
+so the pipeline fills churn_prob itself.
+
+Labels: a customer with a lease in force at the training cutoff has
+churned if none of their leases runs past cutoff + horizon_days.
+
+Serving: master / featured frames are mapped onto the snapshot features
+by serving_frame (same definitions as training; a feature the frame
+cannot provide is an error, not a silent NaN column).
+
+Inputs: only features with values in the training frame go into the
+estimator (input_features). On the real schema complaints and call
+center rows carry no dates, so their point-in-time counts do not exist;
+an all-NaN column would break HGB binning, so the model, serving_frame
+and the array export all use the reduced layout.
+
+Daily updates: outcomes resolved since the last training date are added
+to the model's training window (the labelled rows of the last
+window_days) and the model is refit on the whole window, so bins,
+categories and trees never come from one day's outcomes alone. Every fit
+gets a new version_, which is part of CachedChurnScorer's row hashes:
+only rows whose model inputs changed are rescored, and all rows are
+rescored after the model changes.
+"""
+import os
+import uuid
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+from src.features.backfill import build_point_in_time_snapshots
+from src.features.churn_features import MISSING_LEASE_DATE, resolve_as_of
+
+NUMERIC_FEATURES = [
+    "total_amount_paid", "total_missed_payments", "total_late_days",
+    "complaint_count", "num_service_visits", "avg_service_satisfaction",
+    "days_until_lease_end", "customer_tenure_days", "monthly_payment", "age",
+]
+CATEGORICAL_FEATURES = ["segment", "loyalty_tier", "nationality"]
+
+# src/data/transform.py names for the same lifetime totals
+# (total_late_days and complaint_count share their names)
+FEATURE_ALIASES = {
+    "total_paid": "total_amount_paid",
+    "missed_payments": "total_missed_payments",
+    "service_visits": "num_service_visits",
+}
+
+DEFAULT_HORIZON_DAYS = 180
+DEFAULT_PARAMS = {
+    "max_iter": 200,
+    "learning_rate": 0.1,
+    "max_leaf_nodes": 31,
+    "early_stopping": False,
+    "random_state": 42,
+}
+
+# HGB bins categories; keep the most frequent ones, the rest map to missing
+MAX_CATEGORIES = 250
+
+# Daily updates refit on the labelled rows whose cutoff lies within this
+# many days of the newest one
+DEFAULT_WINDOW_DAYS = 730
+
+
+# --------------------------------------------------------
+# Labels + training frame
+# --------------------------------------------------------
+def derive_churn_labels(leases, cutoff, horizon_days=DEFAULT_HORIZON_DAYS, key="customer_id"):
+    """
+    1 = churned, 0 = retained, for customers with a lease in force at cutoff.
+    Returns a Series indexed by customer_id.
+    """
+    cutoff = resolve_as_of(cutoff)
+    start = pd.to_datetime(leases["lease_start"], errors="coerce")
+    end = pd.to_datetime(leases["lease_end"], errors="coerce")
+
+    active = (start <= cutoff) & (end >= cutoff)
+    eligible = pd.Index(leases.loc[active, key].unique())
+
+    last_end = end.groupby(leases[key].to_numpy(), observed=True).max()
+    last_end = last_end.reindex(eligible)
+    churned = last_end <= cutoff + pd.Timedelta(days=horizon_days)
+    return churned.astype(np.int8).rename("churned")
+
+
+def build_training_frame(tables, cutoff, horizon_days=DEFAULT_HORIZON_DAYS, key="customer_id"):
+    """Point-in-time features at cutoff + churn labels over the following horizon."""
+    cutoff = resolve_as_of(cutoff)
+    labels = derive_churn_labels(tables["leases"], cutoff, horizon_days, key)
+
+    snapshot = build_point_in_time_snapshots(tables, [cutoff]).set_index(key)
+    customers = tables["customers"].drop_duplicates(key).set_index(key)
+    extra = [c for c in ["age", *CATEGORICAL_FEATURES] if c in customers.columns]
+    frame = snapshot.join(customers[extra])
+
+    frame = frame.loc[labels.index.intersection(frame.index)].rename_axis(key)
+    return frame, labels.loc[frame.index]
+
+
+def resolved_outcomes(tables, since, until, horizon_days=DEFAULT_HORIZON_DAYS, key="customer_id"):
+    """
+    Training rows for leases that ended in (since, until].
+
+    Each ended lease is labelled renewed (a later lease exists) or churned,
+    with point-in-time features at lease_end - horizon_days, the same
+    cutoff/horizon framing as build_training_frame.
+    """
+    since, until = resolve_as_of(since), resolve_as_of(until)
+    leases = tables["leases"]
+    end = pd.to_datetime(leases["lease_end"], errors="coerce")
+    ids = leases[key].to_numpy()
+
+    ended = ((end > since) & (end <= until)).to_numpy()
+    if not ended.any():
+        return pd.DataFrame(), pd.Series(dtype=np.int8, name="churned")
+
+    last_end = end.groupby(ids, observed=True).max()
+    outcomes = pd.DataFrame({key: ids[ended], "as_of": (end[ended] - pd.Timedelta(days=horizon_days)).to_numpy()})
+    outcomes["churned"] = (last_end.reindex(outcomes[key]).to_numpy() <= end[ended].to_numpy()).astype(np.int8)
+    outcomes = outcomes.drop_duplicates([key, "as_of"])
+
+    # snapshots only for the customers with a resolved outcome
+    customers = tables["customers"]
+    subset = {**tables, "customers": customers[customers[key].isin(outcomes[key])]}
+    snapshot = build_point_in_time_snapshots(subset, outcomes["as_of"].unique())
+    extra = [c for c in ["age", *CATEGORICAL_FEATURES] if c in customers.columns]
+
+    frame = outcomes.merge(snapshot, on=["as_of", key], how="inner")
+    frame = frame.merge(customers.drop_duplicates(key)[[key, *extra]], on=key, how="left")
+    frame = frame[frame["days_until_lease_end"] >= 0]  # lease in force at the cutoff
+    return frame.set_index(key), frame["churned"].rename("churned").set_axis(frame[key])
+
+
+def _lease_days(dates):
+    """Lease dates as datetimes; the MISSING_LEASE_DATE placeholder counts as missing."""
+    dates = pd.to_datetime(dates, errors="coerce")
+    return dates.mask(dates == MISSING_LEASE_DATE)
+
+
+def serving_frame(df, features, as_of=None):
+    """
+    Model inputs from a master / featured frame, defined like the training
+    snapshots (build_point_in_time_snapshots):
+        • master totals under their snapshot names (FEATURE_ALIASES)
+        • days_until_lease_end / customer_tenure_days recomputed at as_of
+          from the lease dates; no lease → NaN, never the placeholder
+
+    features: the model's input features (ChurnModel.input_features).
+    Raises ValueError when one of them is missing from the frame.
+    Snapshot frames (no lease date columns) pass through unchanged.
+    """
+    out = df.rename(columns={k: v for k, v in FEATURE_ALIASES.items() if v not in df.columns})
+
+    if "lease_end" in out.columns and "lease_start" in out.columns:
+        as_of = resolve_as_of(as_of)
+        out = out.assign(
+            days_until_lease_end=(_lease_days(out["lease_end"]) - as_of).dt.days,
+            customer_tenure_days=(as_of - _lease_days(out["lease_start"])).dt.days,
+        )
+
+    missing = [col for col in features if col not in out.columns]
+    if missing:
+        raise ValueError(f"Churn model inputs missing from the frame: {missing}")
+    return out
+
+
+def row_hashes(X):
+    """One uint64 per matrix row (NaN-safe), used to detect changed inputs."""
+    return pd.util.hash_pandas_object(pd.DataFrame(X), index=False).to_numpy()
+
+
+# --------------------------------------------------------
+# Model
+# --------------------------------------------------------
+def feature_matrix(df, numeric_features, categorical_features, categories):
+    """Feature matrix (float64, NaN = missing) in training column order."""
+    df = df.rename(columns={k: v for k, v in FEATURE_ALIASES.items() if v not in df.columns})
+    features = list(numeric_features) + list(categorical_features)
+    X = np.full((len(df), len(features)), np.nan)
+
+    for j, col in enumerate(numeric_features):
+        if col in df.columns:
+            X[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+
+    for j, col in enumerate(categorical_features, start=len(numeric_features)):
+        if col in df.columns and col in categories:
+            codes = pd.Categorical(df[col], categories=categories[col]).codes
+            X[:, j] = np.where(codes >= 0, codes, np.nan)
+    return X
+
+
+class ChurnModel:
+    """Gradient-boosted churn scorer with a fixed feature list."""
+
+    def __init__(self, numeric_features=NUMERIC_FEATURES, categorical_features=CATEGORICAL_FEATURES,
+                 window_days=DEFAULT_WINDOW_DAYS, **params):
+        self.numeric_features = list(numeric_features)
+        self.categorical_features = list(categorical_features)
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.window_days = window_days
+        self.categories_ = {}
+        # features with any value in the training frame (the estimator's columns)
+        self.input_numeric_ = None
+        self.input_categorical_ = None
+        self.estimator = None
+        self.window_ = None    # labelled rows the model was fit on (+ as_of, churned)
+        self.version_ = None   # new on every fit
+        self.horizon_days = DEFAULT_HORIZON_DAYS
+        self.trained_until = None  # outcomes up to this date are in the model
+
+    @property
+    def features(self):
+        return self.numeric_features + self.categorical_features
+
+    @property
+    def input_features(self):
+        """Estimator columns: observed numeric features, then observed categoricals."""
+        return self.input_numeric_ + self.input_categorical_
+
+    def has_input_layout(self):
+        return getattr(self, "input_numeric_", None) is not None
+
+    def _matrix(self, df):
+        return feature_matrix(df, self.input_numeric_, self.input_categorical_, self.categories_)
+
+    def serving_matrix(self, df, as_of=None):
+        """Feature matrix for a master / featured frame (see serving_frame)."""
+        return self._matrix(serving_frame(df, self.input_features, as_of))
+
+    def _window_rows(self, df, labels, cutoff=None):
+        rows = df[[col for col in self.features if col in df.columns]].copy()
+        rows["as_of"] = df["as_of"].to_numpy() if "as_of" in df.columns else pd.Timestamp(cutoff or pd.NaT)
+        rows["churned"] = np.asarray(labels)
+        return rows
+
+    def fit(self, df, labels, cutoff=None):
+        """
+        Fit from scratch. df's rows become the training window; cutoff
+        dates them when df has no as_of column (undated rows never age out).
+        """
+        self.window_ = self._window_rows(df, labels, cutoff)
+        self.version_ = uuid.uuid4().hex[:12]
+        observed = [col for col in self.features if col in df.columns and df[col].notna().any()]
+        self.input_numeric_ = [col for col in self.numeric_features if col in observed]
+        self.input_categorical_ = [col for col in self.categorical_features if col in observed]
+        self.categories_ = {
+            col: list(df[col].astype("string").value_counts().index[:MAX_CATEGORIES])
+            for col in self.input_categorical_
+        }
+
+        mask = [False] * len(self.input_numeric_) + [True] * len(self.input_categorical_)
+        self.estimator = HistGradientBoostingClassifier(categorical_features=mask, **self.params)
+        self.estimator.fit(self._matrix(df), np.asarray(labels))
+        return self
+
+    def has_window(self):
+        return getattr(self, "window_", None) is not None
+
+    def update(self, df, labels, key="customer_id"):
+        """
+        Add new labelled rows (with an as_of column) to the training window,
+        drop rows older than window_days before the newest cutoff and refit
+        on the whole window. With one class in the window the rows are kept
+        and the refit waits for a later update (version_ is unchanged).
+        """
+        if self.estimator is None:
+            return self.fit(df, labels)
+        if not self.has_window():
+            raise RuntimeError("ChurnModel has no training window (saved by an older version); retrain it.")
+
+        window = pd.concat([self.window_, self._window_rows(df, labels)]).rename_axis(key).reset_index()
+        window = window.drop_duplicates([key, "as_of"], keep="last")
+        oldest = window["as_of"].max() - pd.Timedelta(days=self.window_days)
+        window = window[window["as_of"].isna() | (window["as_of"] >= oldest)].set_index(key)
+
+        if window["churned"].nunique() < 2:
+            print(f"⚠ Churn model refit skipped: {len(window)} labelled rows, one class only.")
+            self.window_ = window
+            return self
+
+        trained_until = self.trained_until
+        self.fit(window, window["churned"])
+        self.trained_until = trained_until
+        return self
+
+    def needs_update(self, as_of=None):
+        return self.trained_until is not None and resolve_as_of(as_of) > self.trained_until
+
+    def update_from_outcomes(self, tables, as_of=None):
+        """
+        Fold lease outcomes resolved since trained_until into the model.
+        trained_until only moves when the model was refit (or nothing new
+        resolved), so skipped outcomes are resolved again next time.
+        Returns the number of new labelled rows.
+        """
+        as_of = resolve_as_of(as_of)
+        if not self.needs_update(as_of):
+            return 0
+
+        frame, labels = resolved_outcomes(tables, self.trained_until, as_of, self.horizon_days)
+        version = self.version_
+        if len(frame):
+            print(f"🎯 Refitting churn model with {len(frame)} new outcomes ({labels.mean():.0%} churned)...")
+            self.update(frame, labels)
+        if not len(frame) or self.version_ != version:
+            self.trained_until = as_of
+        return len(frame)
+
+    def predict_proba(self, df, as_of=None):
+        """Churn probability for every row of df (master / featured / snapshot frame), in one batch."""
+        if self.estimator is None:
+            raise RuntimeError("ChurnModel is not trained (call fit or ChurnModel.load).")
+        return self.estimator.predict_proba(self.serving_matrix(df, as_of))[:, 1]
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        joblib.dump(self, tmp)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        return joblib.load(path)
+
+
+class CachedChurnScorer:
+    """
+    ChurnModel wrapper that reuses the previous probability of every row
+    whose feature hash is unchanged, and only scores the rest.
+
+    previous: DataFrame indexed by customer_id with churn_prob and
+    feature_hash columns (see scores), or None to score everything.
+    """
+
+    def __init__(self, model, previous=None, key="customer_id"):
+        self.model = model
+        self.previous = previous
+        self.key = key
+        self.scores = pd.DataFrame(
+            {"churn_prob": pd.Series(dtype=np.float64), "feature_hash": pd.Series(dtype=np.uint64)},
+            index=pd.Index([], name=key),
+        )
+        self.rescored_ids = pd.Index([])
+
+    def predict_proba(self, df, as_of=None):
+        X = self.model.serving_matrix(df, as_of)
+        # a new model version changes every hash, so nothing stale is reused
+        version = getattr(self.model, "version_", None) or "0"
+        hashes = row_hashes(X) ^ np.uint64(int(version, 16))
+        ids = df[self.key].to_numpy()
+
+        same = np.zeros(len(df), dtype=bool)
+        prob = np.full(len(df), np.nan)
+        if self.previous is not None and len(self.previous):
+            pos = self.previous.index.get_indexer(ids)
+            hit = pos >= 0
+            same[hit] = self.previous["feature_hash"].to_numpy()[pos[hit]] == hashes[hit]
+            prob[same] = self.previous["churn_prob"].to_numpy()[pos[same]]
+
+        if (~same).any():
+            prob[~same] = self.model.estimator.predict_proba(X[~same])[:, 1]
+
+        # accumulate over calls: later scores win
+        scores = pd.DataFrame({"churn_prob": prob, "feature_hash": hashes}, index=pd.Index(ids, name=self.key))
+        self.scores = pd.concat([self.scores[~self.scores.index.isin(scores.index)], scores])
+        self.rescored_ids = self.rescored_ids.union(pd.Index(ids[~same]))
+        return prob
+
+
+# --------------------------------------------------------
+# Pipeline helpers
+# --------------------------------------------------------
+def train_churn_model(tables, as_of=None, horizon_days=DEFAULT_HORIZON_DAYS, **params):
+    """Train on the latest cutoff whose labels are fully observed by as_of."""
+    cutoff = resolve_as_of(as_of) - pd.Timedelta(days=horizon_days)
+    frame, labels = build_training_frame(tables, cutoff, horizon_days)
+    if labels.nunique() < 2:
+        raise ValueError(f"Cannot train churn model: only one label class at cutoff {cutoff.date()}.")
+    model = ChurnModel(**params).fit(frame, labels, cutoff=cutoff)
+    model.horizon_days = horizon_days
+    model.trained_until = resolve_as_of(as_of)
+    return model
+
+
+def load_or_train_churn_model(path, tables, as_of=None, retrain=False, export_dir=None):
+    """
+    Load the saved model and fold in outcomes resolved since its last
+    update, or train + save one when missing (or retrain=True).
+
+    export_dir: churn array export (see tree_export.churn_export_dir),
+    rewritten whenever the model changes so the dashboard scores with it.
+    """
+    changed = False
+    model = ChurnModel.load(path) if os.path.exists(path) and not retrain else None
+
+    if model is not None and not (model.has_window() and model.has_input_layout()):
+        print("⚠ Saved churn model is from an older version — retraining.")
+        model = None
+
+    if model is not None:
+        if model.needs_update(as_of):
+            version = model.version_
+            model.update_from_outcomes(tables, as_of)
+            model.save(path)
+            changed = model.version_ != version
+    else:
+        print("🎯 Training churn model...")
+        model = train_churn_model(tables, as_of)
+        model.save(path)
+        print(f"💾 Saved churn model → {path}")
+        changed = True
+
+    if export_dir and (changed or not os.path.exists(os.path.join(export_dir, "meta.json"))):
+        from src.models.tree_export import export_churn_model
+
+        if export_churn_model(model, export_dir):
+            print(f"💾 Exported churn arrays → {export_dir}")
+    return model
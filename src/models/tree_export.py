@@ -0,0 +1,322 @@
+"""
+Array-backed export of the churn tree ensemble.
+
+All trees of a trained ChurnModel are flattened into contiguous NumPy
+arrays (feature, threshold, children, leaf value, ...) saved as .npy
+files next to a small JSON header. ArrayChurnScorer memory-maps them at
+startup and walks every tree for one or a few rows in pure NumPy, so the
+dashboard can rescore a customer without loading scikit-learn, with the
+same output as ChurnModel.predict_proba. Lease timing features are
+recomputed from the record's lease dates at as_of, like serving_frame.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit  # same sigmoid as the batch predictor, bit for bit
+
+from src.features.churn_features import resolve_as_of
+
+EXPORT_VERSION = 2  # 2: only the model's input features (ChurnModel.input_features)
+EXPORT_DIRNAME = "churn_model_arrays"
+
+# The export reads private HGB internals (_predictors, _bin_mapper,
+# _preprocessor, _baseline_prediction); releases it was checked against.
+# Keep in step with the scikit-learn pin in requirements.txt.
+SUPPORTED_SKLEARN = ("1.9",)
+
+# model feature → lease date it is derived from (placeholder date = no lease)
+LEASE_TIMING_FEATURES = {"days_until_lease_end": "lease_end", "customer_tenure_days": "lease_start"}
+
+NODE_ARRAYS = (
+    "feature", "threshold", "left", "right", "missing_left",
+    "is_leaf", "is_categorical", "bitset", "value",
+)
+TABLE_ARRAYS = ("roots", "left_cat_bitsets", "known_cat_bitsets", "cat_feature_slot")
+
+
+# --------------------------------------------------------
+# Export
+# --------------------------------------------------------
+def churn_export_dir(featured_path):
+    """The export lives next to the featured CSV it scores (writers and dashboard)."""
+    return os.path.join(os.path.dirname(os.path.abspath(featured_path)), EXPORT_DIRNAME)
+
+
+def export_supported():
+    import sklearn
+
+    return ".".join(sklearn.__version__.split(".")[:2]) in SUPPORTED_SKLEARN
+
+
+def _input_layout(model):
+    """
+    Column order + category codes as the trees see them.
+
+    With categorical features HGB ordinal-encodes them internally and
+    moves them in front of the numeric columns; the export bakes both
+    steps in so the scorer can fill the tree input directly.
+    """
+    est = model.estimator
+    features = model.input_features
+    if est._preprocessor is None:
+        return {"columns": features, "categories": {}}
+
+    is_cat = np.asarray(est.is_categorical_)
+    order = np.concatenate([np.flatnonzero(is_cat), np.flatnonzero(~is_cat)])
+    encoder = est._preprocessor.named_transformers_["encoder"]
+
+    categories = {}
+    for col, seen in zip([features[i] for i in np.flatnonzero(is_cat)], encoder.categories_):
+        seen = [code for code in seen if not np.isnan(code)]
+        labels = model.categories_.get(col, [])
+        categories[col] = {labels[int(code)]: pos for pos, code in enumerate(seen)}
+
+    return {"columns": [features[i] for i in order], "categories": categories}
+
+
+def export_churn_model(model, out_dir):
+    """
+    Flatten model.estimator (binary HGB) into arrays under out_dir.
+
+    On an unsupported scikit-learn release nothing is exported and a
+    stale export is removed (returns None): scores then only come from
+    ChurnModel.predict_proba.
+    """
+    import sklearn
+
+    from src.features.churn_features import MISSING_LEASE_DATE
+    from src.models.churn_model import FEATURE_ALIASES
+
+    est = model.estimator
+    if est is None:
+        raise RuntimeError("ChurnModel is not trained.")
+
+    if not export_supported():
+        print(f"⚠ scikit-learn {sklearn.__version__} is not a supported release for the churn array "
+              f"export ({', '.join(SUPPORTED_SKLEARN)}); skipping it.")
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        return None
+
+    trees = [predictors[0] for predictors in est._predictors]
+    sizes = [len(tree.nodes) for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+    cat_offsets = np.concatenate(
+        [[0], np.cumsum([len(tree.raw_left_cat_bitsets) for tree in trees])[:-1]]
+    ).astype(np.int32)
+
+    nodes = np.concatenate([tree.nodes for tree in trees])
+    node_offset = np.repeat(offsets, sizes)
+    cat_offset = np.repeat(cat_offsets, sizes)
+
+    arrays = {
+        "feature": nodes["feature_idx"].astype(np.int32),
+        "threshold": nodes["num_threshold"].astype(np.float64),
+        "left": (nodes["left"] + node_offset).astype(np.int32),
+        "right": (nodes["right"] + node_offset).astype(np.int32),
+        "missing_left": nodes["missing_go_to_left"].astype(bool),
+        "is_leaf": nodes["is_leaf"].astype(bool),
+        "is_categorical": nodes["is_categorical"].astype(bool),
+        "bitset": (nodes["bitset_idx"] + cat_offset).astype(np.int32),
+        "value": nodes["value"].astype(np.float64),
+        "roots": offsets,
+        "left_cat_bitsets": np.concatenate(
+            [tree.raw_left_cat_bitsets for tree in trees] + [np.zeros((0, 8), np.uint32)]
+        ).astype(np.uint32),
+    }
+
+    known, f_idx_map = est._bin_mapper.make_known_categories_bitsets()
+    arrays["known_cat_bitsets"] = np.ascontiguousarray(known, dtype=np.uint32)
+    arrays["cat_feature_slot"] = np.ascontiguousarray(f_idx_map, dtype=np.int32)
+
+    meta = {
+        "version": EXPORT_VERSION,
+        "sklearn_version": sklearn.__version__,
+        "baseline": float(np.ravel(est._baseline_prediction)[0]),
+        "n_trees": len(trees),
+        "n_nodes": int(len(nodes)),
+        "max_depth": int(nodes["depth"].max()),
+        "aliases": FEATURE_ALIASES,
+        "missing_lease_date": MISSING_LEASE_DATE.strftime("%Y-%m-%d"),
+        **_input_layout(model),
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(arr))
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return out_dir
+
+
+# --------------------------------------------------------
+# Scorer
+# --------------------------------------------------------
+def _in_bitset(bitset, values):
+    """Membership of int values in one 8 x uint32 bitset."""
+    return ((bitset[values >> 5] >> (values & 31).astype(np.uint32)) & 1).astype(bool)
+
+
+def _is_missing(value):
+    try:
+        return value is None or bool(value != value)  # NaN / NaT
+    except TypeError:  # pd.NA
+        return True
+
+
+class ArrayChurnScorer:
+    """Pure-NumPy churn scorer over an exported (memory-mapped) ensemble."""
+
+    def __init__(self, arrays, meta):
+        if meta.get("version") != EXPORT_VERSION:
+            raise ValueError(f"Unsupported churn export version: {meta.get('version')}")
+        for name in NODE_ARRAYS + TABLE_ARRAYS:
+            # plain ndarray view: still backed by the mapping, without
+            # np.memmap's per-indexing Python overhead
+            setattr(self, name, np.asarray(arrays[name]))
+
+        self.baseline = meta["baseline"]
+        self.max_depth = meta["max_depth"]
+        self.columns = meta["columns"]
+        # label → encoded category, per categorical feature
+        self.category_codes = meta["categories"]
+        # feature → other column names carrying the same value
+        self.aliases = {}
+        for alias, name in meta.get("aliases", {}).items():
+            self.aliases.setdefault(name, []).append(alias)
+        # same serving rules as churn_model.serving_frame
+        self.missing_lease_date = meta.get("missing_lease_date")
+
+        # Leaves point at themselves, so every tree can be stepped a fixed
+        # max_depth times with no per-step bookkeeping.
+        nodes = np.arange(len(self.is_leaf), dtype=np.int32)
+        self.left = np.where(self.is_leaf, nodes, self.left)
+        self.right = np.where(self.is_leaf, nodes, self.right)
+
+        # Dense (split, category) → go-left table replacing both bitset
+        # lookups; unseen categories follow the node's missing direction.
+        cat_nodes = np.flatnonzero(self.is_categorical & ~self.is_leaf)
+        codes = np.arange(256, dtype=np.int64)
+        self.cat_left = np.zeros((len(self.left_cat_bitsets), 256), dtype=bool)
+        for nd in cat_nodes:
+            slot = self.bitset[nd]
+            in_left = _in_bitset(self.left_cat_bitsets[slot], codes)
+            known = _in_bitset(self.known_cat_bitsets[self.cat_feature_slot[self.feature[nd]]], codes)
+            self.cat_left[slot] = in_left | (~known & self.missing_left[nd])
+        self.has_categorical = len(cat_nodes) > 0
+
+        # One row per node so each tree step is a single gather:
+        # [feature, threshold, missing_left, is_categorical, left, right, bitset]
+        self.node_table = np.column_stack([
+            self.feature, self.threshold, self.missing_left, self.is_categorical,
+            self.left, self.right, self.bitset,
+        ]).astype(np.float64)
+
+    @classmethod
+    def load(cls, export_dir, mmap=True):
+        with open(os.path.join(export_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(export_dir, f"{name}.npy"), mmap_mode=mode)
+            for name in NODE_ARRAYS + TABLE_ARRAYS
+        }
+        return cls(arrays, meta)
+
+    # --------------------------------------------------------
+    # Inputs
+    # --------------------------------------------------------
+    def _lease_date(self, record, date_col):
+        """Parsed lease date; None when missing or the placeholder (no lease)."""
+        value = record.get(date_col)
+        if _is_missing(value) or str(value)[:10] == self.missing_lease_date:
+            return None
+        date = pd.to_datetime(value, errors="coerce")
+        return None if _is_missing(date) else date
+
+    def _value(self, record, col, as_of):
+        # records with lease dates: timing recomputed at as_of (stored values go stale)
+        if col in LEASE_TIMING_FEATURES and all(date_col in record for date_col in LEASE_TIMING_FEATURES.values()):
+            date = self._lease_date(record, LEASE_TIMING_FEATURES[col])
+            if date is None:
+                return None
+            return (date - as_of).days if col == "days_until_lease_end" else (as_of - date).days
+        value = record.get(col)
+        for alias in self.aliases.get(col, ()):
+            if value is not None:
+                break
+            value = record.get(alias)
+        return value
+
+    def record_inputs(self, record, as_of=None):
+        """Model input → value the scorer reads from one record."""
+        as_of = resolve_as_of(as_of)
+        return {col: self._value(record, col, as_of) for col in self.columns}
+
+    def records_matrix(self, records, as_of=None):
+        """Tree input matrix from dict-like rows (dicts, pandas Series)."""
+        as_of = resolve_as_of(as_of)
+        X = np.full((len(records), len(self.columns)), np.nan)
+        for i, record in enumerate(records):
+            for j, col in enumerate(self.columns):
+                value = self._value(record, col, as_of)
+                if col in self.category_codes:
+                    code = self.category_codes[col].get(value)
+                    if code is not None:
+                        X[i, j] = code
+                    continue
+                try:
+                    X[i, j] = float(value)
+                except (TypeError, ValueError):
+                    pass
+        return X
+
+    # --------------------------------------------------------
+    # Tree walk (all trees × all rows at once)
+    # --------------------------------------------------------
+    def raw_score(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        n, n_trees = len(X), len(self.roots)
+
+        n_cols = X.shape[1]
+        flat = X.ravel()
+        node = np.tile(self.roots, n).astype(np.intp)
+        row_offset = np.repeat(np.arange(n) * n_cols, n_trees)
+
+        for _ in range(self.max_depth):
+            step = self.node_table[node]
+            values = flat[row_offset + step[:, 0].astype(np.intp)]
+            missing = np.isnan(values)
+            go_left = np.where(missing, step[:, 2] > 0, values <= step[:, 1])
+
+            if self.has_categorical:
+                cat = np.flatnonzero((step[:, 3] > 0) & ~missing)
+                if cat.size:
+                    cat_values = values[cat]
+                    known = cat_values >= 0  # negative codes count as missing
+                    go_left[cat] = np.where(
+                        known,
+                        self.cat_left[step[cat, 6].astype(np.intp), np.where(known, cat_values, 0).astype(np.intp)],
+                        step[cat, 2] > 0,
+                    )
+
+            node = np.where(go_left, step[:, 4], step[:, 5]).astype(np.intp)
+
+        leaves = self.value[node].reshape(n, n_trees)
+        # trees are added one after another, like the batch predictor
+        total = np.concatenate([np.full((n, 1), self.baseline), leaves], axis=1)
+        return np.cumsum(total, axis=1)[:, -1]
+
+    def predict_proba(self, X):
+        """X: matrix from records_matrix (tree column order)."""
+        return expit(self.raw_score(X))
+
+    def score_records(self, records, as_of=None):
+        """Churn probability for a list of dict-like rows (as_of: None = today)."""
+        return self.predict_proba(self.records_matrix(records, as_of))
+
+    def score_record(self, record, as_of=None):
+        return float(self.score_records([record], as_of)[0])
@@ -0,0 +1,231 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions with a canned draft after a configurable
+latency, optionally failing a fraction of requests with HTTP 429, so
+concurrency, rate limiting and retries can be benchmarked without an API
+key or network access. "stream": true requests get server-sent events,
+one chunk per word, token_latency seconds apart (non-streamed requests
+wait for the same total generation time).
+
+    python -m src.utils.fake_openai_server --port 8089 --latency 0.5 --error-rate 0.05 --token-latency 0.02
+
+or in-process:
+
+    with FakeOpenAIServer(latency=0.3) as server:
+        client = OpenAI(base_url=server.base_url, api_key="fake")
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+def fake_completion(request, n):
+    """Canned chat.completion payload for a request body (n tags the draft)."""
+    messages = request.get("messages", [])
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    content = (
+        "Subject: Your lease renewal\n\n"
+        "Dear customer,\n\nThank you for driving with us. We have prepared a renewal "
+        f"offer tailored to you. Let us know a good time to talk.\n\n(fake draft #{n})"
+    )
+    prompt_tokens, completion_tokens = _tokens(prompt), _tokens(content)
+    return {
+        "id": f"chatcmpl-fake-{n}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def fake_chunks(completion, include_usage=False):
+    """Split a fake_completion payload into chat.completion.chunk payloads."""
+    content = completion["choices"][0]["message"]["content"]
+    pieces = re.findall(r"\S+\s*|\s+", content)
+    base = {key: completion[key] for key in ("id", "created", "model")}
+    base["object"] = "chat.completion.chunk"
+
+    chunks = [{**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}]
+    for piece in pieces:
+        chunks.append({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    if include_usage:
+        chunks.append({**base, "choices": [], "usage": completion["usage"]})
+    return chunks
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/1.0"
+
+    def log_message(self, format, *args):  # keep benchmark output clean
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks, token_latency):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, chunk in enumerate(chunks):
+            if i and chunk["choices"]:
+                time.sleep(token_latency)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client timed out and hung up
+
+    def do_POST(self):
+        fake = self.server.fake
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        request = self._read_json()
+        fake._enter()
+        try:
+            time.sleep(fake.latency * random.uniform(0.8, 1.2))
+            if fake.error_rate and random.random() < fake.error_rate:
+                fake._count("rate_limited")
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_error"}},
+                    {"retry-after": "1"},
+                )
+                return
+            completion = fake.completion(request)
+            chunks = fake_chunks(completion, bool((request.get("stream_options") or {}).get("include_usage")))
+            if request.get("stream"):
+                self._send_stream(chunks, fake.token_latency)
+            else:
+                time.sleep(fake.token_latency * (len(chunks) - 2))
+                self._send_json(200, completion)
+        finally:
+            fake._leave()
+
+
+class FakeOpenAIServer:
+    """
+    Threaded fake chat-completions server (port=0 picks a free port).
+    respond(request, n): payload builder (default fake_completion).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.5, error_rate=0.0, token_latency=0.0, respond=None):
+        self.latency = latency
+        self.respond = respond or fake_completion
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.thread = None
+
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "completed": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    # --------------------------------------------------------
+    # Stats
+    # --------------------------------------------------------
+    def _count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def _enter(self):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def _leave(self):
+        with self.lock:
+            self.stats["in_flight"] -= 1
+
+    # --------------------------------------------------------
+    # Responses
+    # --------------------------------------------------------
+    def completion(self, request):
+        with self.lock:
+            self.stats["completed"] += 1
+            n = self.stats["completed"]
+        return self.respond(request, n)
+
+    # --------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed words")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.error_rate, args.token_latency)
+    print(f"🧪 Fake OpenAI server on {server.base_url} (latency {args.latency}s, 429 rate {args.error_rate:.0%})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from src.data.load import TABLE_SCHEMAS
+
+
+def make_synthetic_tables(n_customers=10_000, seed=42, events_per_customer=None, real_schema=False):
+    """
+    Generate the seven cleaned tables with realistic shapes for
+    benchmarks and local runs (no real customer data).
+
+    events_per_customer: average rows per customer for each event table.
+    real_schema: keep only the columns of the real exports (TABLE_SCHEMAS);
+    e.g. complaints and call_center then have no dates.
+    """
+    rng = np.random.default_rng(seed)
+    rates = {
+        "leases": 1.3,
+        "payments": 12,
+        "service_history": 3,
+        "complaints": 0.5,
+        "call_center": 1.5,
+        "sales_interactions": 2,
+    }
+    rates.update(events_per_customer or {})
+
+    ids = pd.Index([f"CUST-{i:07d}" for i in range(n_customers)])
+    epoch = pd.Timestamp("2019-01-01")
+
+    def n_rows(table):
+        return int(n_customers * rates[table])
+
+    def pick_ids(m):
+        return ids.take(rng.integers(0, n_customers, m)).to_numpy()
+
+    def dates(m, span_days=2400):
+        return epoch + pd.to_timedelta(rng.integers(0, span_days, m), unit="D")
+
+    customers = pd.DataFrame({
+        "customer_id": ids.to_numpy(),
+        "name": rng.choice(["Ahmed Saleh", "Priya Singh", "Bilal Khan", "Sara Ali", "John Smith"], n_customers),
+        "nationality": rng.choice(["UAE", "Egypt", "Jordan", "India", "Pakistan", "UK"], n_customers),
+        "age": rng.integers(21, 70, n_customers),
+        "segment": rng.choice(["Premium", "Mass Market", "Retail", "Luxury"], n_customers),
+        "loyalty_tier": rng.choice(["Bronze", "Silver", "Gold", "Platinum"], n_customers),
+        "acquisition_source": rng.choice(["Web", "Walk-in", "Referral"], n_customers),
+    })
+
+    # every customer gets one lease, some get extra (renewals / history)
+    m = max(n_rows("leases"), n_customers)
+    lease_ids = np.concatenate([ids.to_numpy(), pick_ids(m - n_customers)])
+    start = dates(m, 2000)
+    leases = pd.DataFrame({
+        "customer_id": lease_ids,
+        "car_model": rng.choice(["mg zs", "audi q5", "skoda kodiaq", "xpeng g9"], m),
+        "lease_start": start,
+        "lease_end": start + pd.to_timedelta(rng.integers(365, 1460, m), unit="D"),
+        "monthly_payment": rng.uniform(800, 4500, m).round(2),
+    })
+
+    m = n_rows("payments")
+    missed = rng.random(m) < 0.05
+    payments = pd.DataFrame({
+        "customer_id": pick_ids(m),
+        "payment_date": dates(m),
+        "amount": np.where(missed, 0.0, rng.uniform(800, 4500, m).round(2)),
+        "missed_payment": missed.astype(np.int64),
+        "late_days": np.where(rng.random(m) < 0.15, rng.integers(1, 60, m), 0),
+    })
+
+    m = n_rows("service_history")
+    satisfaction = rng.integers(1, 6, m).astype(float)
+    satisfaction[rng.random(m) < 0.1] = np.nan
+    service = pd.DataFrame({
+        "customer_id": pick_ids(m),
+        "service_date": dates(m),
+        "service_type": rng.choice(["Oil Change", "Tires", "Inspection", "Repair"], m),
+        "amount_billed": rng.uniform(100, 3000, m).round(2),
+        "warranty_claim": (rng.random(m) < 0.1).astype(np.int64),
+        "satisfaction_score": satisfaction,
+    })
+
+    m = n_rows("complaints")
+    complaints = pd.DataFrame({
+        "ticket_id": np.arange(m),
+        "customer_id": pick_ids(m),
+        "complaint_date": dates(m),
+        "issue": rng.choice(["Delay", "Billing issue", "Service quality"], m),
+        "status": rng.choice(["Open", "Closed"], m),
+    })
+
+    m = n_rows("call_center")
+    call_center = pd.DataFrame({
+        "call_id": np.arange(m),
+        "customer_id": pick_ids(m),
+        "call_date": dates(m),
+        "call_duration_min": rng.uniform(1, 40, m).round(1),
+        "satisfaction_score": rng.integers(1, 6, m).astype(float),
+        "issue": rng.choice(["Billing", "Service", "Renewal"], m),
+        "resolution": rng.choice(["Resolved", "Escalated"], m),
+        "notes": rng.choice(["Customer asked about renewal price.", "Complained about delay."], m),
+    })
+
+    m = n_rows("sales_interactions")
+    sales = pd.DataFrame({
+        "customer_id": pick_ids(m),
+        "interaction_date": dates(m),
+        "salesperson": rng.choice(["Omar", "Sara", "Rahul"], m),
+        "interaction_type": rng.choice(["Call", "Visit", "Email"], m),
+        "status": rng.choice(["Completed", "Pending", "Cancelled"], m),
+    })
+
+    tables = {
+        "customers": customers,
+        "leases": leases,
+        "service_history": service,
+        "payments": payments,
+        "complaints": complaints,
+        "call_center": call_center,
+        "sales_interactions": sales,
+    }
+    if real_schema:
+        tables = {name: df[[c for c in df.columns if c in _schema_columns(name)]] for name, df in tables.items()}
+    return tables
+
+
+def _schema_columns(name):
+    schema = TABLE_SCHEMAS[name]
+    return set(schema["text"]) | set(schema["numeric"]) | set(schema["dates"])